@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+"""Benchmark of the URDF conversion on synthetic robots, writing a JSON report that can be compared across commits."""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+rootDirectory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, rootDirectory)  # benchmark the working tree rather than an installed version
+
+import urdf2webots.importer  # noqa: E402
+from syntheticURDF import generators  # noqa: E402
+from urdf2webots.stats import ConversionStats  # noqa: E402
+
+sizes = {
+    'small': 100,
+    'medium': 400,
+    'large': 2000
+}
+
+
+def convert(content, output):
+    """Convert a URDF content and return the duration of each phase in seconds.
+
+    The parse phase gathers everything happening before the dummy link removal, except the writing.
+    """
+    stats = ConversionStats()
+    with contextlib.redirect_stdout(io.StringIO()):
+        urdf2webots.importer.convertUrdfContent(input=content, output=output, stats=stats)
+    durations = {
+        'dummyLinkRemoval': stats.phases['dummyLinkRemoval']['time'],
+        'write': stats.phases['writing']['time'],
+        'total': stats.total
+    }
+    durations['parse'] = stats.total - durations['dummyLinkRemoval'] - durations['write']
+    for name, phase in stats.phases.items():
+        durations[name] = phase['selfTime']
+    return durations
+
+
+def measureModelMemory(content, output):
+    """Convert a URDF content while tracing the allocations and return the peak memory and the memory of the parsed model.
+
+    The model memory is the memory allocated by the parser and still in use once the links, joints and sensors are parsed,
+    i.e. when the dummy link removal starts.
+    """
+    modelMemory = []
+
+    def measure(phase, duration):
+        if phase == 'sensors' and not modelMemory:
+            snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, '*parserURDF.py')])
+            modelMemory.append(sum(statistic.size for statistic in snapshot.statistics('filename')))
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            urdf2webots.importer.convertUrdfContent(input=content, output=output, stats=ConversionStats(callback=measure))
+        return tracemalloc.get_traced_memory()[1], modelMemory[0] if modelMemory else 0
+    finally:
+        tracemalloc.stop()
+
+
+def getCommit():
+    """Return the current git commit of the working tree, None if it cannot be determined."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=rootDirectory,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(name, size, repeat, directory):
+    """Benchmark a scenario and return its results."""
+    content = generators[name](size)
+    output = os.path.join(directory, 'Benchmark.proto')
+    result = {
+        'scenario': name,
+        'size': size,
+        'urdfBytes': len(content),
+        'links': content.count('<link '),
+        'joints': content.count('<joint '),
+        'meshes': content.count('<mesh '),
+        'materials': content.count('<material '),
+        'sensors': content.count('<sensor ') + content.count('<plugin ')
+    }
+    try:
+        runs = [convert(content, output) for _ in range(repeat)]
+        # separate run, tracing the allocations slows the conversion down
+        result['peakMemory'], result['modelMemory'] = measureModelMemory(content, output)
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+        return result
+    result['outputBytes'] = os.path.getsize(output)
+    result['phases'] = {}
+    for phase in runs[0]:
+        durations = [run[phase] for run in runs]
+        result['phases'][phase] = {'min': min(durations), 'median': statistics.median(durations)}
+    return result
+
+
+def compare(report, reference):
+    """Print the relative change of the median durations and peak memory with respect to a previous report."""
+    previousResults = {(result['scenario'], result['size']): result for result in reference['results']}
+    for result in report['results']:
+        previous = previousResults.get((result['scenario'], result['size']))
+        if previous is None or 'error' in result or 'error' in previous:
+            continue
+        changes = []
+        for phase, durations in result['phases'].items():
+            if phase not in previous['phases']:
+                continue
+            previousMedian = previous['phases'][phase]['median']
+            if previousMedian > 0:
+                changes.append('%s %+.1f%%' % (phase, 100.0 * (durations['median'] / previousMedian - 1.0)))
+        if previous.get('peakMemory'):
+            changes.append('memory %+.1f%%' % (100.0 * (result['peakMemory'] / previous['peakMemory'] - 1.0)))
+        if previous.get('modelMemory'):
+            changes.append('model memory %+.1f%%' % (100.0 * (result['modelMemory'] / previous['modelMemory'] - 1.0)))
+        print('%-18s %6d: %s' % (result['scenario'], result['size'], ', '.join(changes)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the URDF conversion on synthetic robots.')
+    parser.add_argument('--scenarios', dest='scenarios', default=','.join(generators),
+                        help='Comma separated list of scenarios among: %s.' % ', '.join(generators))
+    parser.add_argument('--size', dest='sizes', default='medium',
+                        help='Comma separated list of robot sizes, either a number of links or one of: %s.' %
+                        ', '.join('%s (%d)' % item for item in sizes.items()))
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='Number of timed conversions per scenario.')
+    parser.add_argument('--output', dest='output', default='benchmark.json', help='Path of the JSON report.')
+    parser.add_argument('--compare', dest='compare', default=None,
+                        help='Path of a previous JSON report to compare the results with.')
+    args = parser.parse_args()
+
+    report = {
+        'commit': getCommit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': args.repeat,
+        'results': []
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes.split(','):
+            size = sizes[size] if size in sizes else int(size)
+            for name in args.scenarios.split(','):
+                result = benchmark(name, size, args.repeat, directory)
+                report['results'].append(result)
+                if 'error' in result:
+                    print('%-18s %6d: %s' % (name, size, result['error']))
+                else:
+                    print('%-18s %6d: %s, peak memory %.1f MB, model memory %.1f MB' % (
+                        name, size, ', '.join('%s %.3f s' % (phase, result['phases'][phase]['median'])
+                                              for phase in ['parse', 'dummyLinkRemoval', 'write', 'total']),
+                        result['peakMemory'] / 1e6, result['modelMemory'] / 1e6))
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            compare(report, json.load(file))
@@ -0,0 +1,155 @@
+"""Generators of synthetic URDF robots used to benchmark the converter."""
+
+
+def link(name, mass=1.0, visual='', collision=''):
+    """Return a link element."""
+    content = ''
+    if mass is not None:
+        content += ('    <inertial>\n'
+                    '      <origin xyz="0 0 0.05" rpy="0 0 0"/>\n'
+                    '      <mass value="%g"/>\n'
+                    '      <inertia ixx="0.01" ixy="0" ixz="0" iyy="0.01" iyz="0" izz="0.01"/>\n'
+                    '    </inertial>\n' % mass)
+    content += visual + collision
+    return '  <link name="%s">\n%s  </link>\n' % (name, content)
+
+
+def joint(name, parent, child, type='revolute', xyz='0 0 0.1', rpy='0 0 0'):
+    """Return a joint element."""
+    limit = ''
+    if type in ['revolute', 'prismatic']:
+        limit = '    <limit lower="-1.5" upper="1.5" effort="10" velocity="2"/>\n'
+    return ('  <joint name="%s" type="%s">\n'
+            '    <origin xyz="%s" rpy="%s"/>\n'
+            '    <parent link="%s"/>\n'
+            '    <child link="%s"/>\n'
+            '    <axis xyz="0 0 1"/>\n'
+            '%s'
+            '  </joint>\n' % (name, type, xyz, rpy, parent, child, limit))
+
+
+def boxVisual(material=''):
+    """Return a visual element with a box geometry."""
+    return ('    <visual>\n'
+            '      <origin xyz="0 0 0.05" rpy="0 0 0"/>\n'
+            '      <geometry><box size="0.05 0.05 0.1"/></geometry>\n'
+            '%s'
+            '    </visual>\n' % material)
+
+
+def meshVisual(filename, material=''):
+    """Return a visual element with a mesh geometry."""
+    return ('    <visual>\n'
+            '      <origin xyz="0 0 0" rpy="0 0 1.5708"/>\n'
+            '      <geometry><mesh filename="%s"/></geometry>\n'
+            '%s'
+            '    </visual>\n' % (filename, material))
+
+
+def meshCollision(filename):
+    """Return a collision element with a mesh geometry."""
+    return ('    <collision>\n'
+            '      <origin xyz="0 0 0" rpy="0 0 0"/>\n'
+            '      <geometry><mesh filename="%s"/></geometry>\n'
+            '    </collision>\n' % filename)
+
+
+def robot(name, content):
+    """Return a URDF document."""
+    return '<?xml version="1.0"?>\n<robot name="%s">\n%s</robot>\n' % (name, content)
+
+
+def deepChain(size):
+    """Serial chain of 'size' links, every fourth one being a dummy link connected by a fixed joint."""
+    content = link('base_link', visual=boxVisual())
+    for i in range(1, size):
+        dummy = i % 4 == 0
+        content += link('link%d' % i, mass=None if dummy else 1.0, visual='' if dummy else boxVisual())
+        content += joint('joint%d' % i, 'base_link' if i == 1 else 'link%d' % (i - 1), 'link%d' % i,
+                         type='fixed' if dummy else 'revolute')
+    return robot('deep_chain', content)
+
+
+def wideTree(size):
+    """Root link with 'size' direct children, each one with a dummy tip link."""
+    content = link('base_link', visual=boxVisual())
+    for i in range(size):
+        content += link('arm%d' % i, visual=boxVisual())
+        content += joint('arm_joint%d' % i, 'base_link', 'arm%d' % i, xyz='%g 0 0.1' % (0.01 * i))
+        content += link('tip%d' % i, mass=None)
+        content += joint('tip_joint%d' % i, 'arm%d' % i, 'tip%d' % i, type='fixed')
+    return robot('wide_tree', content)
+
+
+def manyMeshes(size, uniqueMeshes=100):
+    """Chain of 'size' links referencing 'uniqueMeshes' different mesh files in their visuals and collisions."""
+    content = ''
+    for i in range(size):
+        visual = meshVisual('meshes/visual%d.dae' % (i % uniqueMeshes))
+        collision = meshCollision('meshes/collision%d.stl' % (i % uniqueMeshes))
+        content += link('link%d' % i, visual=visual, collision=collision)
+        if i > 0:
+            content += joint('joint%d' % i, 'link%d' % (i - 1), 'link%d' % i)
+    return robot('many_meshes', content)
+
+
+def sharedMaterials(size, materials=50):
+    """Wide tree of 'size' links whose visuals refer to 'materials' top-level materials, and define inline ones."""
+    content = ''
+    for i in range(materials):
+        content += ('  <material name="material%d">\n'
+                    '    <color rgba="%g %g %g 1"/>\n'
+                    '  </material>\n' % (i, (i % 10) / 10.0, (i % 7) / 7.0, (i % 3) / 3.0))
+    content += link('base_link', visual=boxVisual())
+    for i in range(size):
+        if i % 5 == 0:
+            material = ('      <material name="inline%d">\n'
+                        '        <color rgba="0.2 0.4 0.6 1"/>\n'
+                        '      </material>\n' % i)
+        else:
+            material = '      <material name="material%d"/>\n' % (i % materials)
+        content += link('link%d' % i, visual=boxVisual(material))
+        content += joint('joint%d' % i, 'base_link', 'link%d' % i)
+    return robot('shared_materials', content)
+
+
+def manySensors(size):
+    """Chain of 'size' links, each one carrying a Gazebo camera, lidar, IMU or depth sensor."""
+    content = link('base_link', visual=boxVisual())
+    for i in range(1, size):
+        content += link('link%d' % i, visual=boxVisual())
+        content += joint('joint%d' % i, 'link%d' % (i - 1) if i > 1 else 'base_link', 'link%d' % i)
+    for i in range(1, size):
+        kind = i % 4
+        if kind == 0:
+            sensor = ('    <sensor type="camera" name="camera%d">\n'
+                      '      <camera><horizontal_fov>1.0</horizontal_fov>\n'
+                      '        <image><width>64</width><height>48</height></image></camera>\n'
+                      '      <noise><stddev>0.01</stddev></noise>\n'
+                      '    </sensor>\n' % i)
+        elif kind == 1:
+            sensor = ('    <sensor type="ray" name="lidar%d">\n'
+                      '      <ray><scan><horizontal><samples>360</samples><min_angle>-3.14</min_angle>'
+                      '<max_angle>3.14</max_angle></horizontal></scan>\n'
+                      '        <range><min>0.1</min><max>10</max><resolution>0.01</resolution></range></ray>\n'
+                      '    </sensor>\n' % i)
+        elif kind == 2:
+            sensor = ('    <plugin name="imu%d" filename="libgazebo_ros_imu.so">\n'
+                      '      <topicName>imu%d</topicName><gaussianNoise>0.001</gaussianNoise>\n'
+                      '    </plugin>\n' % (i, i))
+        else:
+            sensor = ('    <sensor type="depth" name="depth%d">\n'
+                      '      <camera><horizontal_fov>1.0</horizontal_fov><clip><near>0.05</near></clip></camera>\n'
+                      '      <range><min>0.1</min><max>5</max></range>\n'
+                      '    </sensor>\n' % i)
+        content += '  <gazebo reference="link%d">\n%s  </gazebo>\n' % (i, sensor)
+    return robot('many_sensors', content)
+
+
+generators = {
+    'deep_chain': deepChain,
+    'wide_tree': wideTree,
+    'many_meshes': manyMeshes,
+    'shared_materials': sharedMaterials,
+    'many_sensors': manySensors
+}
@@ -1,12 +1,33 @@
 """Test module of the urdf2webots script."""
+import concurrent.futures
+import contextlib
+import glob
 import io
+import json
+import math
 import os
 import pathlib
 import shutil
+import subprocess
 import sys
+import tempfile
+import threading
 import unittest
+import unittest.mock
+import urllib.error
+import urllib.request
 
-from urdf2webots.importer import convertUrdfContent, convertUrdfFile
+from PIL import Image
+
+from urdf2webots.emitter import Emitter
+from urdf2webots.importer import convertUrdfContent, convertUrdfFile, convertUrdfFiles, parseUrdfContent
+from urdf2webots.model import RobotModel
+from urdf2webots.packages import replacePackageUris
+from urdf2webots.parserURDF import Joint, Link, Material, Visual, getWorldPoses
+from urdf2webots.server import ConversionServer
+from urdf2webots.stats import ConversionStats
+from urdf2webots.template import compileRobotTemplate
+from urdf2webots.watch import Watcher
 
 rootDirectory = os.path.dirname(os.path.dirname(__file__))
 testDirectory = os.path.join(rootDirectory, 'tests')
@@ -127,6 +148,18 @@ class TestScript(unittest.TestCase):
                 self.assertTrue(fileCompare(expected.replace('expected', 'results'), expected),
                                 msg='Expected result mismatch when exporting "%s"' % paths['input'])
 
+    def testInputFileOutputProtoStreamParser(self):
+        """Test that the streaming parser produces the same PROTO files as the DOM parser."""
+        print('Start tests with input "URDF file", output "PROTO file" and the streaming parser...')
+        for paths in modelPathsProto:
+            command = ('%s %s --input=%s --output=%s %s --parser=stream' %
+                       (sys.executable, urdf2webotsPath, paths['input'], paths['output'], paths['arguments']))
+            retcode = os.system(command)
+            self.assertEqual(retcode, 0, msg='Error when exporting "%s"' % (paths['input']))
+            for expected in paths['expected']:
+                self.assertTrue(fileCompare(expected.replace('expected', 'results'), expected),
+                                msg='Expected result mismatch when exporting "%s"' % paths['input'])
+
     def testInputContentOutputProto(self):
         """Test that urdf2webots produces an expected PROTO file using URDF content as input."""
         print('Start tests with input "URDF content" and output "PROTO file"...')
@@ -146,6 +179,31 @@ class TestScript(unittest.TestCase):
                 self.assertTrue(fileCompare(expected.replace('expected', 'results'), expected),
                                 msg='Expected result mismatch when exporting input to "%s"' % paths['output'])
 
+    def testPipeConversions(self):
+        """Test that the URDF documents piped in stdin are converted one after the other into framed results."""
+        print('Start tests with the conversion of URDF documents piped in stdin...')
+        document = ('<robot name="piped">\n<link name="base"><inertial><mass value="%d"/></inertial>'
+                    '<visual><geometry><box size="1 1 1"/></geometry></visual></link>\n</robot>\n')
+        lengthPrefixed = (document % 2).encode()
+        stdin = (document % 1).encode() + b'%d\n' % len(lengthPrefixed) + lengthPrefixed
+        stdin += b'<robot name="broken"><link>\n</robot>\n'
+        with tempfile.TemporaryDirectory() as directory:
+            process = subprocess.run([sys.executable, urdf2webotsPath, '--pipe', '--robot-name=piped'],
+                                     input=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=directory,
+                                     env=dict(os.environ, PYTHONPATH=os.path.abspath(rootDirectory)))
+        self.assertEqual(process.returncode, 1)  # one of the conversions failed
+        frames = []
+        stdout = process.stdout
+        while stdout:
+            header, stdout = stdout.split(b'\n', 1)
+            status, length = header.split()
+            frames.append((status.decode(), stdout[:int(length)].decode()))
+            stdout = stdout[int(length):]
+        self.assertEqual([status for status, _ in frames], ['ok', 'ok', 'error'])
+        self.assertIn('name "piped"', frames[0][1])
+        self.assertIn('mass 1', frames[0][1])
+        self.assertIn('mass 2', frames[1][1])
+
     def testInputFileOutputRobotString(self):
         """Test that urdf2webots produces an expected Robot node string using URDF file as input."""
         print('Start tests with input "URDF file" and output "Robot node strings"...')
@@ -159,6 +217,623 @@ class TestScript(unittest.TestCase):
                 self.assertTrue(fileCompare(expected.replace('expected', 'results'), expected),
                                 msg='Expected result mismatch when exporting "%s"' % paths['input'])
 
+    def testRobotTemplate(self):
+        """Test that the instances of a Robot node template are identical to the conversions with the same arguments."""
+        print('Start tests with the instances of a Robot node template...')
+        for paths in modelPathsRobotString:
+            content = pathlib.Path(paths['input']).read_text()
+            template = compileRobotTemplate(content, urdfPath=paths['input'])
+            self.assertEqual(template.getJointCount(), 7)
+            self.assertEqual(template.instantiate(paths['robotName'], paths['translation'], paths['rotation']),
+                             convertUrdfContent(content, robotName=paths['robotName'], initTranslation=paths['translation'],
+                                                initRotation=paths['rotation'], urdfPath=paths['input']))
+            self.assertEqual(template.instantiate('second', [1, 2, 3], initPos=[0.1, -0.2, 0.3]),
+                             convertUrdfContent(content, robotName='second', initTranslation='1 2 3',
+                                                initPos='[0.1, -0.2, 0.3]', urdfPath=paths['input']))
+
+    def testRobotModel(self):
+        """Test that writing a parsed, serialized or cached robot model gives the same result as a complete conversion."""
+        print('Start tests with parsed robot models...')
+        content = pathlib.Path(humanFilePath).read_text()
+        with tempfile.TemporaryDirectory() as directory:
+            protoFile = os.path.join(directory, 'Human.proto')
+            data = parseUrdfContent(content, output=protoFile, urdfPath=humanFilePath).toBytes()
+            self.assertFalse(os.path.exists(protoFile))
+            convertUrdfContent(RobotModel.fromBytes(data), output=protoFile, toolSlot='pelvis', linkToDef=True,
+                               initTranslation='0 0 1', targetVersion='R2023b')
+            with open(protoFile, 'r') as f:
+                proto = f.read()
+            convertUrdfFile(input=humanFilePath, output=protoFile, toolSlot='pelvis', linkToDef=True,
+                            initTranslation='0 0 1', targetVersion='R2023b')
+            with open(protoFile, 'r') as f:
+                self.assertEqual(proto, f.read())
+            with self.assertRaises(SystemExit):  # the COLLADA meshes would not be CadShape nodes
+                convertUrdfContent(RobotModel.fromBytes(data), output=protoFile, targetVersion='R2021a')
+            with self.assertRaises(ValueError):
+                RobotModel.fromBytes(data[:-1])
+
+            # the mesh URLs and the reduced meshes follow the output of the model
+            data = parseUrdfContent(content, output=protoFile, urdfPath=humanFilePath, targetVersion='R2022a',
+                                    meshTriangleBudget=20).toBytes()
+            movedFile = os.path.join(directory, 'protos', 'Moved.proto')
+            convertUrdfContent(RobotModel.fromBytes(data), output=movedFile, targetVersion='R2022a')
+            with open(movedFile, 'r') as f:
+                proto = f.read()
+            shutil.rmtree(os.path.join(directory, 'protos'))
+            convertUrdfFile(input=humanFilePath, output=movedFile, targetVersion='R2022a', meshTriangleBudget=20)
+            with open(movedFile, 'r') as f:
+                self.assertEqual(proto, f.read())
+            self.assertIn('"Moved_meshes/', proto)
+            for name in os.listdir(os.path.join(directory, 'Human_meshes')):
+                self.assertTrue(os.path.isfile(os.path.join(directory, 'protos', 'Moved_meshes', name)))
+
+            paths = modelPathsRobotString[0]
+            cacheDir = os.path.join(directory, 'cache')
+            for robotName, translation, modelHit, mode in [(paths['robotName'], paths['translation'], False, None),
+                                                           (paths['robotName'], '1 2 3', True, None),
+                                                           ('other', '1 2 3', True, None),
+                                                           (paths['robotName'], '3 2 1', False, 0o777)]:
+                if mode is not None:  # the models of a directory that other users can modify are not unpickled
+                    self.assertEqual(os.stat(os.path.join(cacheDir, 'models')).st_mode & 0o777, 0o700)
+                    os.chmod(os.path.join(cacheDir, 'models'), mode)
+                log = io.StringIO()
+                with contextlib.redirect_stdout(log):
+                    robotString = convertUrdfFile(input=paths['input'], robotName=robotName, initTranslation=translation,
+                                                  initRotation=paths['rotation'], cacheDir=cacheDir)
+                self.assertEqual('Robot model found in the cache.' in log.getvalue(), modelHit)
+                self.assertEqual(robotString, convertUrdfFile(input=paths['input'], robotName=robotName,
+                                                              initTranslation=translation, initRotation=paths['rotation']))
+
+    def testInputFileOutputRobotStringStreamParser(self):
+        """Test that the streaming parser produces the same Robot node strings as the DOM parser."""
+        print('Start tests with input "URDF file", output "Robot node strings" and the streaming parser...')
+        for paths in modelPathsRobotString:
+            robot_string = convertUrdfFile(input=paths['input'], robotName=paths['robotName'],
+                                           initTranslation=paths['translation'], initRotation=paths['rotation'],
+                                           parser='stream')
+            with open(paths['output'], 'w') as f:
+                f.write(robot_string)
+            for expected in paths['expected']:
+                self.assertTrue(fileCompare(expected.replace('expected', 'results'), expected),
+                                msg='Expected result mismatch when exporting "%s"' % paths['input'])
+
+    def testBatchConversion(self):
+        """Test that a batch conversion produces the expected files and reports failing jobs without aborting."""
+        print('Start tests with a batch of "URDF files"...')
+        jobs = [{'input': humanFilePath, 'output': os.path.join(resultDirectory, 'Human.proto')},
+                {'input': os.path.join(sourceDirectory, 'missing.urdf')}]
+        for paths in modelPathsRobotString:
+            jobs.append({'input': paths['input'], 'robotName': paths['robotName'], 'initTranslation': paths['translation'],
+                         'initRotation': paths['rotation']})
+        reports = convertUrdfFiles(jobs, workers=2)
+        self.assertEqual(len(reports), len(jobs))
+        self.assertTrue(reports[0]['success'], msg=reports[0]['error'])
+        self.assertFalse(reports[1]['success'])
+        self.assertIn('missing.urdf', reports[1]['error'])
+        self.assertTrue(fileCompare(os.path.join(resultDirectory, 'Human.proto'),
+                                    os.path.join(expectedDirectory, 'Human.proto')))
+        for paths, report in zip(modelPathsRobotString, reports[2:]):
+            self.assertTrue(report['success'], msg=report['error'])
+            with open(paths['output'], 'w') as f:
+                f.write(report['robotString'])
+            for expected in paths['expected']:
+                self.assertTrue(fileCompare(expected.replace('expected', 'results'), expected),
+                                msg='Expected result mismatch when exporting "%s"' % paths['input'])
+
+    def testConcurrentConversions(self):
+        """Test that conversions running concurrently in threads don't share any state."""
+        print('Start tests with concurrent conversions of "URDF files" into "Robot node strings"...')
+        for paths in modelPathsRobotString:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                futures = [executor.submit(convertUrdfFile, input=paths['input'], robotName=paths['robotName'],
+                                           initTranslation=paths['translation'], initRotation=paths['rotation'])
+                           for _ in range(8)]
+                robotStrings = [future.result() for future in futures]
+            for robotString in robotStrings:
+                self.assertEqual(robotString, robotStrings[0])
+            with open(paths['output'], 'w') as f:
+                f.write(robotStrings[0])
+            for expected in paths['expected']:
+                self.assertTrue(fileCompare(expected.replace('expected', 'results'), expected),
+                                msg='Expected result mismatch when exporting "%s"' % paths['input'])
+
+    def testConversionCache(self):
+        """Test that a cached conversion is returned as long as its inputs don't change."""
+        print('Start tests with a conversion cache...')
+        paths = modelPathsRobotString[0]
+        with tempfile.TemporaryDirectory() as cacheDir:
+            def convert(**arguments):
+                log = io.StringIO()
+                stdout = sys.stdout
+                sys.stdout = log
+                try:
+                    robotString = convertUrdfFile(input=paths['input'], robotName=paths['robotName'],
+                                                  initTranslation=paths['translation'], initRotation=paths['rotation'],
+                                                  cacheDir=cacheDir, **arguments)
+                finally:
+                    sys.stdout = stdout
+                return robotString, 'Conversion found in the cache.' in log.getvalue()
+
+            robotString, hit = convert()
+            self.assertFalse(hit)
+            cachedRobotString, hit = convert()
+            self.assertTrue(hit)
+            self.assertEqual(cachedRobotString, robotString)
+            boxRobotString, hit = convert(boxCollision=True)
+            self.assertFalse(hit)
+            self.assertEqual(len(glob.glob(os.path.join(cacheDir, '*.json'))), 2)
+            self.assertEqual(len(os.listdir(os.path.join(cacheDir, 'models'))), 1)  # the writing options share a model
+            # the least recently used entries, of both types, are evicted once the cache is full
+            convert(normal=True, cacheMaxSize=1)
+            self.assertEqual(glob.glob(os.path.join(cacheDir, '*.json')), [])
+            self.assertEqual(os.listdir(os.path.join(cacheDir, 'models')), [])
+
+            # the reduced meshes and textures stored in the cache are evicted too
+            with tempfile.TemporaryDirectory() as directory:
+                Image.new('RGB', (64, 64), (255, 0, 0)).save(os.path.join(directory, 'red.png'))
+                mesh = os.path.join(os.path.dirname(os.path.dirname(humanFilePath)), 'meshes', 'obj', 'Femur L.obj')
+                content = ('<robot name="reduced"><link name="base"><visual><geometry><mesh filename="%s"/></geometry>'
+                           '</visual><visual><geometry><box size="1 1 1"/></geometry><material name="red">'
+                           '<texture filename="red.png"/></material></visual></link></robot>' % mesh)
+                arguments = {'input': content, 'output': os.path.join(directory, 'Reduced.proto'),
+                             'urdfPath': os.path.join(directory, 'r.urdf'), 'targetVersion': 'R2022a',
+                             'meshTriangleBudget': 20, 'textureMaxSize': 16, 'cacheDir': cacheDir}
+                convertUrdfContent(**arguments)
+                self.assertEqual(len(os.listdir(os.path.join(cacheDir, 'meshes'))), 1)
+                self.assertEqual(len(os.listdir(os.path.join(cacheDir, 'textures'))), 1)
+                convertUrdfContent(normal=True, cacheMaxSize=1, **arguments)
+                self.assertEqual(os.listdir(os.path.join(cacheDir, 'meshes')), [])
+                self.assertEqual(os.listdir(os.path.join(cacheDir, 'textures')), [])
+
+            with open(paths['output'], 'w') as f:
+                f.write(cachedRobotString)
+            for expected in paths['expected']:
+                self.assertTrue(fileCompare(expected.replace('expected', 'results'), expected),
+                                msg='Expected result mismatch when exporting "%s"' % paths['input'])
+
+    def testWatchIncrementalUpdate(self):
+        """Test that updating a PROTO file from a modified URDF file gives the same result as a complete conversion."""
+        print('Start tests with incremental updates of a "PROTO file"...')
+        with tempfile.TemporaryDirectory() as directory:
+            shutil.copytree(os.path.dirname(os.path.dirname(humanFilePath)), os.path.join(directory, 'human'))
+            urdfFile = os.path.join(directory, 'human', 'urdf', 'human.urdf')
+            protoFile = os.path.join(directory, 'Human.proto')
+            watcher = Watcher()
+            convertUrdfFile(input=urdfFile, output=protoFile, watcher=watcher)
+            self.assertFalse(watcher.incremental)
+
+            with open(urdfFile, 'r') as f:
+                content = f.read()
+            with open(urdfFile, 'w') as f:
+                f.write(content.replace('upper="3.141592741"', 'upper="3.0"', 3))
+            convertUrdfFile(input=urdfFile, output=protoFile, watcher=watcher)
+            self.assertTrue(watcher.incremental, msg=watcher.getReport())
+            self.assertEqual(watcher.changedNodes, ['joint_calcn_l', 'joint_calcn_r', 'joint_femur_l'])
+            self.assertEqual(watcher.updatedJoints, ['joint_femur_l', 'joint_calcn_r'])
+            with open(protoFile, 'r') as f:
+                updatedContent = f.read()
+
+            convertUrdfFile(input=urdfFile, output=protoFile)
+            with open(protoFile, 'r') as f:
+                self.assertEqual(updatedContent, f.read())
+
+    def testConversionStats(self):
+        """Test that the phases of a conversion are measured and profiled."""
+        print('Start tests with the conversion statistics...')
+        phases = []
+        stats = ConversionStats(profile=True, callback=lambda name, duration: phases.append(name))
+        convertUrdfFile(input=humanFilePath, output=os.path.join(resultDirectory, 'Human.proto'), stats=stats)
+        for phase in ['xmlParsing', 'links', 'joints', 'dummyLinkRemoval', 'writing']:
+            self.assertIn(phase, stats.phases)
+            self.assertIn(phase, phases)
+        self.assertEqual(stats.phases['links']['calls'], 1)
+        self.assertGreater(stats.counts['links'], 0)
+        self.assertGreaterEqual(stats.total, sum(phase['selfTime'] for phase in stats.phases.values()))
+        self.assertEqual(stats.outputFile, os.path.join(resultDirectory, 'Human.proto'))
+        report = stats.getReport()
+        self.assertTrue(report['functions'])
+        self.assertTrue(fileCompare(os.path.join(resultDirectory, 'Human.proto'),
+                                    os.path.join(expectedDirectory, 'Human.proto')))
+
+    def testPackageUriReplacement(self):
+        """Test that each package is resolved once and that all its URIs are replaced."""
+        print('Start tests with the replacement of "package://" URIs...')
+        lookups = []
+
+        def getPackagePath(packageName):
+            lookups.append(packageName)
+            return {'ur': '/opt/ur', 'ur_description': '/opt/description'}.get(packageName)
+
+        content = ('<mesh filename="package://ur_description/meshes/base.dae"/>\n'
+                   '<mesh filename="package://ur/meshes/link.stl"/>\n' * 1000 +
+                   '<mesh filename="package://unknown/meshes/link.stl"/>\n')
+        self.assertEqual(replacePackageUris(content, getPackagePath),
+                         ('<mesh filename="/opt/description/ur_description/meshes/base.dae"/>\n'
+                          '<mesh filename="/opt/ur/ur/meshes/link.stl"/>\n' * 1000 +
+                          '<mesh filename="package://unknown/meshes/link.stl"/>\n'))
+        self.assertEqual(sorted(lookups), ['unknown', 'ur', 'ur_description'])
+
+    def testTiffTextureTranslation(self):
+        """Test that TIFF textures are converted into PNG images and that the converted images are cached."""
+        print('Start tests with the translation of TIFF textures...')
+        content = ('<robot name="textured"><link name="base_link"><visual><geometry><box size="1 1 1"/></geometry>'
+                   '<material name="checker"><texture filename="materials/checker.tiff"/></material></visual></link>'
+                   '</robot>')
+        workingDirectory = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as cacheDir:
+            os.chdir(directory)
+            try:
+                os.mkdir('materials')
+                Image.new('RGB', (4, 4), (255, 0, 0)).save(os.path.join('materials', 'checker.tiff'))
+                convertUrdfContent(input=content, output='Textured.proto', cacheDir=cacheDir)
+                with open('Textured.proto', 'r') as f:
+                    self.assertIn('"Textured_textures/checker.png"', f.read())
+                with Image.open(os.path.join('Textured_textures', 'checker.png')) as image:
+                    self.assertEqual(image.getpixel((0, 0)), (255, 0, 0))
+
+                # the second conversion copies the cached image without decoding the TIFF file
+                os.remove(os.path.join('Textured_textures', 'checker.png'))
+                with unittest.mock.patch('PIL.Image.open', side_effect=IOError):
+                    convertUrdfContent(input=content, output='Textured.proto', cacheDir=cacheDir)
+                with open('Textured.proto', 'r') as f:
+                    self.assertIn('"Textured_textures/checker.png"', f.read())
+                self.assertTrue(os.path.isfile(os.path.join('Textured_textures', 'checker.png')))
+                # the converted images share the size limit of the cache
+                convertUrdfContent(input=content, output='Textured.proto', cacheDir=cacheDir, cacheMaxSize=1)
+                self.assertEqual(os.listdir(os.path.join(cacheDir, 'textures')), [])
+
+                # an image that cannot be decoded only loses its texture
+                shutil.rmtree('Textured_textures')
+                with unittest.mock.patch('PIL.Image.open', side_effect=Image.DecompressionBombError):
+                    convertUrdfContent(input=content, output='Textured.proto')
+                with open('Textured.proto', 'r') as f:
+                    self.assertNotIn('checker', f.read())
+            finally:
+                os.chdir(workingDirectory)
+
+    def testTextureReduction(self):
+        """Test that the textures are resized to powers of two, re-encoded, deduplicated and cached."""
+        print('Start tests with the reduction of textures...')
+        content = '<robot name="textured">'
+        for link, texture in [('base', 'large.png'), ('arm', 'copy.png'), ('hand', 'transparent.png')]:
+            content += ('<link name="%s"><inertial><mass value="1"/></inertial><visual><geometry><box size="1 1 1"/>'
+                        '</geometry><material name="%s"><texture filename="materials/%s"/></material></visual></link>'
+                        % (link, texture, texture))
+        content += ('<joint name="shoulder" type="revolute"><parent link="base"/><child link="arm"/></joint>'
+                    '<joint name="wrist" type="revolute"><parent link="arm"/><child link="hand"/></joint></robot>')
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, 'materials'))
+            Image.new('RGB', (1000, 600), (255, 0, 0)).save(os.path.join(directory, 'materials', 'large.png'))
+            shutil.copyfile(os.path.join(directory, 'materials', 'large.png'), os.path.join(directory, 'materials', 'copy.png'))
+            Image.new('RGBA', (300, 300), (0, 0, 255, 128)).save(os.path.join(directory, 'materials', 'transparent.png'))
+            cacheDirectory = os.path.join(directory, 'cache')
+            arguments = {'input': content, 'output': os.path.join(directory, 'Textured.proto'),
+                         'urdfPath': os.path.join(directory, 'r.urdf'), 'textureMaxSize': 512, 'cacheDir': cacheDirectory}
+            stats = ConversionStats()
+            convertUrdfContent(stats=stats, **arguments)
+            self.assertEqual(stats.counts['reducedTextures'], 2)
+            textures = sorted(os.listdir(os.path.join(directory, 'Textured_textures')))
+            self.assertEqual(len(textures), 2)
+            self.assertRegex(textures[0], r'^large_[0-9a-f]{8}\.jpg$')
+            self.assertRegex(textures[1], r'^transparent_[0-9a-f]{8}\.png$')
+            with open(os.path.join(directory, 'Textured.proto'), 'r') as f:
+                proto = f.read()
+            self.assertEqual(proto.count('url "Textured_textures/%s"' % textures[0]), 2)
+            self.assertEqual(proto.count('url "Textured_textures/%s"' % textures[1]), 1)
+            with Image.open(os.path.join(directory, 'Textured_textures', textures[0])) as image:
+                self.assertEqual(image.size, (512, 512))
+            with Image.open(os.path.join(directory, 'Textured_textures', textures[1])) as image:
+                self.assertEqual(image.size, (256, 256))
+                self.assertEqual(image.mode, 'RGBA')
+
+            # a conversion found in the cache restores the reduced textures
+            shutil.rmtree(os.path.join(directory, 'Textured_textures'))
+            stats = ConversionStats()
+            convertUrdfContent(stats=stats, **arguments)
+            self.assertEqual(stats.counts['cacheHits'], 1)
+            self.assertEqual(sorted(os.listdir(os.path.join(directory, 'Textured_textures'))), textures)
+            # a texture reduced again is copied from the cache, which marks it as recently used
+            cachedTextures = glob.glob(os.path.join(cacheDirectory, 'textures', '*'))
+            self.assertEqual(len(cachedTextures), 2)
+            for cachedTexture in cachedTextures:
+                os.utime(cachedTexture, (0, 0))
+            shutil.rmtree(os.path.join(cacheDirectory, 'models'))
+            convertUrdfContent(normal=True, **arguments)
+            for cachedTexture in cachedTextures:
+                self.assertGreater(os.path.getmtime(cachedTexture), 0)
+
+    def testMeshDeduplication(self):
+        """Test that the mesh nodes are shared by content rather than by file name."""
+        print('Start tests with the deduplication of meshes...')
+        with tempfile.TemporaryDirectory() as directory:
+            visuals = ''
+            for filename, content in [('a/link.stl', 'solid a'), ('b/link.stl', 'solid b'), ('c/copy.stl', 'solid a'),
+                                      ('b/link.stl', 'solid b')]:
+                os.makedirs(os.path.join(directory, os.path.dirname(filename)), exist_ok=True)
+                with open(os.path.join(directory, filename), 'w') as f:
+                    f.write(content)
+                visuals += '<visual><geometry><mesh filename="%s"/></geometry></visual>' % filename
+            robotString = convertUrdfContent(input='<robot name="meshes"><link name="base">%s</link></robot>' % visuals,
+                                             robotName='Meshes', urdfPath=os.path.join(directory, 'robot.urdf'))
+        self.assertEqual(robotString.count('DEF link Mesh'), 1)
+        self.assertEqual(robotString.count('DEF link_2 Mesh'), 1)
+        self.assertEqual(robotString.count('USE link\n'), 1)
+        self.assertEqual(robotString.count('USE link_2\n'), 1)
+
+        # the identical COLLADA files of different directories reference different textures
+        with tempfile.TemporaryDirectory() as directory:
+            visuals = ''
+            for package in ['red', 'blue', 'blue']:
+                os.makedirs(os.path.join(directory, package), exist_ok=True)
+                with open(os.path.join(directory, package, 'part.dae'), 'w') as f:
+                    f.write('<COLLADA><library_images><image id="skin"><init_from>skin.png</init_from></image>'
+                            '</library_images></COLLADA>')
+                Image.new('RGB', (2, 2), package).save(os.path.join(directory, package, 'skin.png'))
+                visuals += '<visual><geometry><mesh filename="%s/part.dae"/></geometry></visual>' % package
+            robotString = convertUrdfContent(input='<robot name="parts"><link name="base">%s</link></robot>' % visuals,
+                                             robotName='Parts', urdfPath=os.path.join(directory, 'robot.urdf'))
+        self.assertEqual(robotString.count('DEF part_visual CadShape'), 1)
+        self.assertEqual(robotString.count('DEF part_visual_2 CadShape'), 1)
+        self.assertIn('red/part.dae', robotString)
+        self.assertIn('blue/part.dae', robotString)
+        self.assertEqual(robotString.count('USE part_visual_2\n'), 1)
+
+    def testCollisionFitting(self):
+        """Test that the collision meshes are replaced by the primitives fitting them within the tolerance."""
+        print('Start tests with the fitting of collision primitives...')
+        corners = [(x, y, z) for x in (-0.1, 0.1) for y in (-0.2, 0.2) for z in (0.0, 0.6)]
+        faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+        stl = 'solid box\n'
+        for a, b, c, d in faces:
+            for triangle in [(a, b, c), (a, c, d)]:
+                stl += 'facet normal 0 0 0\nouter loop\n'
+                stl += ''.join('vertex %g %g %g\n' % corners[i] for i in triangle)
+                stl += 'endloop\nendfacet\n'
+        stl += 'endsolid box\n'
+        obj = ''.join('v %g %g %g\n' % corner for corner in corners)
+        obj += ''.join('f %d %d %d %d\n' % tuple(i + 1 for i in face) for face in faces)
+        content = '<robot name="fitted">'
+        for name, filename in [('base', 'box.stl'), ('arm', 'box.obj')]:
+            content += ('<link name="%s"><inertial><mass value="1"/></inertial><collision>'
+                        '<origin xyz="1 0 0" rpy="0 0 1.5708"/><geometry><mesh filename="%s"/></geometry>'
+                        '</collision></link>' % (name, filename))
+        content += '<joint name="joint" type="revolute"><parent link="base"/><child link="arm"/></joint></robot>'
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'box.stl'), 'w') as f:
+                f.write(stl)
+            with open(os.path.join(directory, 'box.obj'), 'w') as f:
+                f.write(obj)
+            stats = ConversionStats()
+            robotString = convertUrdfContent(input=content, robotName='Fitted', urdfPath=os.path.join(directory, 'r.urdf'),
+                                             collisionTolerance=0.1, linkCollisionTolerances={'arm': -1.0}, stats=stats)
+        self.assertEqual(stats.counts['fittedCollisions'], 1)
+        self.assertEqual(robotString.count('Mesh {'), 1)
+        self.assertIn('box.obj', robotString)
+        self.assertIn('size 0.200000 0.400000 0.600000', robotString)
+        self.assertRegex(robotString, r'translation 1\.000000 -?0\.000000 0\.300000')
+
+    def testMeshReduction(self):
+        """Test that the visual meshes are reduced to the triangle budget and cached, the collision meshes being kept."""
+        print('Start tests with the reduction of visual meshes...')
+        rings, segments = 20, 40
+        points = [[(math.sin(math.pi * i / rings) * math.cos(2 * math.pi * j / segments),
+                    math.sin(math.pi * i / rings) * math.sin(2 * math.pi * j / segments),
+                    math.cos(math.pi * i / rings)) for j in range(segments)] for i in range(rings + 1)]
+        stl = 'solid sphere\n'
+        for i in range(rings):
+            for j in range(segments):
+                a, b = points[i][j], points[i][(j + 1) % segments]
+                c, d = points[i + 1][j], points[i + 1][(j + 1) % segments]
+                for triangle in [(a, c, d), (a, d, b)]:
+                    stl += 'facet normal 0 0 0\nouter loop\n'
+                    stl += ''.join('vertex %.9f %.9f %.9f\n' % vertex for vertex in triangle)
+                    stl += 'endloop\nendfacet\n'
+        stl += 'endsolid sphere\n'
+        content = ('<robot name="reduced"><link name="base"><inertial><mass value="1"/></inertial>'
+                   '<visual><geometry><mesh filename="sphere.stl"/></geometry></visual>'
+                   '<collision><geometry><mesh filename="sphere.stl"/></geometry></collision></link></robot>')
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'sphere.stl'), 'w') as f:
+                f.write(stl)
+            cacheDirectory = os.path.join(directory, 'cache')
+            stats = ConversionStats()
+            convertUrdfContent(input=content, output=os.path.join(directory, 'Reduced.proto'),
+                               urdfPath=os.path.join(directory, 'r.urdf'), meshTriangleBudget=200, cacheDir=cacheDirectory,
+                               stats=stats)
+            with open(os.path.join(directory, 'Reduced.proto')) as f:
+                proto = f.read()
+            self.assertEqual(stats.counts['reducedMeshes'], 1)
+            self.assertEqual(proto.count('"sphere.stl"'), 1)  # the collision mesh
+            reducedMeshes = os.listdir(os.path.join(directory, 'Reduced_meshes'))
+            self.assertEqual(len(reducedMeshes), 1)
+            self.assertRegex(reducedMeshes[0], r'^sphere_[0-9a-f]{8}_200\.stl$')
+            self.assertIn('url "Reduced_meshes/%s"' % reducedMeshes[0], proto)
+            reducedFile = os.path.join(directory, 'Reduced_meshes', reducedMeshes[0])
+            with open(reducedFile, 'rb') as f:
+                f.seek(80)
+                triangles = int.from_bytes(f.read(4), 'little')
+            self.assertTrue(150 <= triangles <= 200)
+            self.assertEqual(len(os.listdir(os.path.join(cacheDirectory, 'meshes'))), 1)
+            # a conversion found in the cache restores the reduced meshes
+            os.remove(reducedFile)
+            stats = ConversionStats()
+            convertUrdfContent(input=content, output=os.path.join(directory, 'Reduced.proto'),
+                               urdfPath=os.path.join(directory, 'r.urdf'), meshTriangleBudget=200, cacheDir=cacheDirectory,
+                               stats=stats)
+            self.assertEqual(stats.counts['cacheHits'], 1)
+            self.assertTrue(os.path.isfile(reducedFile))
+            # a mesh reduced again is copied from the cache, which marks it as recently used
+            cachedMesh = os.path.join(cacheDirectory, 'meshes', os.listdir(os.path.join(cacheDirectory, 'meshes'))[0])
+            os.utime(cachedMesh, (0, 0))
+            shutil.rmtree(os.path.join(cacheDirectory, 'models'))
+            convertUrdfContent(input=content, output=os.path.join(directory, 'Reduced.proto'),
+                               urdfPath=os.path.join(directory, 'r.urdf'), meshTriangleBudget=200, cacheDir=cacheDirectory,
+                               normal=True)
+            self.assertGreater(os.path.getmtime(cachedMesh), 0)
+
+    def testFixedLinkMerging(self):
+        """Test that the links attached by a fixed joint are merged into their parent with combined inertia."""
+        print('Start tests with the merging of fixed links...')
+        content = ('<robot name="merged">'
+                   '<link name="base"><inertial><mass value="1"/>'
+                   '<inertia ixx="0.1" ixy="0" ixz="0" iyy="0.1" iyz="0" izz="0.1"/></inertial></link>'
+                   '<link name="bracket"><inertial><mass value="2"/>'
+                   '<inertia ixx="0.2" ixy="0" ixz="0" iyy="0.2" iyz="0" izz="0.2"/></inertial>'
+                   '<visual><origin xyz="0.1 0 0"/><geometry><box size="0.1 0.1 0.1"/></geometry></visual></link>'
+                   '<link name="arm"><inertial><mass value="1"/></inertial></link>'
+                   '<joint name="fixed" type="fixed"><origin xyz="0 0 0.3" rpy="0 0 1.5708"/>'
+                   '<parent link="base"/><child link="bracket"/></joint>'
+                   '<joint name="hinge" type="revolute"><origin xyz="0.5 0 0"/><parent link="bracket"/><child link="arm"/>'
+                   '</joint></robot>')
+        robotString = convertUrdfContent(input=content, robotName='Merged', mergeFixedLinks=True)
+        self.assertEqual(robotString.count('Solid {'), 1)
+        self.assertIn('mass 3.000000', robotString)
+        self.assertIn('centerOfMass [ 0.000000 0.000000 0.200000 ]', robotString)
+        self.assertIn('3.600000e-01 3.600000e-01 3.000000e-01', robotString)
+        # the shape and the child joint of the bracket are moved into the frame of the base
+        self.assertRegex(robotString, r'translation -?0\.00000\d 0\.100000 0\.300000')
+        self.assertRegex(robotString, r'anchor -?0\.00000\d 0\.500000 0\.300000')
+
+    def testEmitter(self):
+        """Test that the emitter writes its output in blocks and keeps track of its position."""
+        print('Start tests with the buffered emitter...')
+        file = io.StringIO()
+        emitter = Emitter(file, blockSize=10)
+        positions = []
+        for i in range(100):
+            positions.append(emitter.tell())
+            emitter.write('line %d\n' % i)
+            emitter.checkpoint()
+        emitter.write('end\n')
+        self.assertGreater(len(file.getvalue()), 0)
+        self.assertLess(len(file.getvalue()), emitter.tell())
+        emitter.flush()
+        expected = ''.join('line %d\n' % i for i in range(100)) + 'end\n'
+        self.assertEqual(file.getvalue(), expected)
+        self.assertEqual(positions, [expected.index('line %d\n' % i) for i in range(100)])
+
+    def testDeepChain(self):
+        """Test that a kinematic chain deeper than the Python recursion limit is converted."""
+        print('Start tests with a deep kinematic chain...')
+        depth = sys.getrecursionlimit() + 100
+        links = ''.join('<link name="l%d"><inertial><mass value="1"/></inertial></link>' % i for i in range(depth + 1))
+        joints = ''.join('<joint name="j%d" type="revolute"><parent link="l%d"/><child link="l%d"/>'
+                         '<axis xyz="0 0 1"/><limit effort="1" velocity="1" lower="-1" upper="1"/></joint>' % (i, i, i + 1)
+                         for i in range(depth))
+        robotString = convertUrdfContent(input='<robot name="deep">%s%s</robot>' % (links, joints), robotName='Deep')
+        self.assertEqual(robotString.count('HingeJoint {'), depth)
+        self.assertIn('name "solid%d"' % (depth - 1), robotString)
+        self.assertEqual(robotString.count('{'), robotString.count('}'))
+
+    def testWorldPoses(self):
+        """Test that the world poses of the links compose the origins of the joints."""
+        print('Start tests with the world poses of the links...')
+        links = []
+        for name in ['base', 'arm', 'hand', 'wheel']:
+            links.append(Link())
+            links[-1].name = name
+        joints = []
+        for parent, child, position, rotation in [('base', 'arm', [0.0, 0.0, 1.0], [0.0, 0.0, 1.0, math.pi / 2]),
+                                                  ('arm', 'hand', [1.0, 0.0, 0.0], [1.0, 0.0, 0.0, math.pi / 2]),
+                                                  ('base', 'wheel', [0.0, -1.0, 0.0], [0.0, 0.0, 1.0, 0.0])]:
+            joints.append(Joint())
+            joints[-1].parent = parent
+            joints[-1].child = child
+            joints[-1].position = position
+            joints[-1].rotation = rotation
+        poses = getWorldPoses(links, joints)
+        self.assertEqual(sorted(poses), ['arm', 'base', 'hand', 'wheel'])
+        for name, position, rotation in [('base', [0, 0, 0], [1, 0, 0, 0]), ('arm', [0, 0, 1], [0, 0, 1, math.pi / 2]),
+                                         ('hand', [0, 1, 1], [0.57735, 0.57735, 0.57735, 2 * math.pi / 3]),
+                                         ('wheel', [0, -1, 0], [1, 0, 0, 0])]:
+            for value, expected in zip(poses[name][0] + poses[name][1], position + rotation):
+                self.assertAlmostEqual(value, expected, places=5)
+
+    def testDataModel(self):
+        """Test that the geometries and material colors are only allocated when they are used."""
+        print('Start tests with the data model...')
+        visual = Visual()
+        self.assertIsNone(visual.geometry.type)
+        self.assertIsNone(visual.material.colors)
+        self.assertEqual(visual.material.getColor('diffuse').red, 0.5)
+        self.assertIsNone(visual.material.colors)
+        visual.material.diffuse.red = 1.0
+        self.assertEqual(visual.material.getColor('diffuse').red, 1.0)
+        self.assertEqual(Material().getColor('diffuse').red, 0.5)
+        visual.geometry.cylinder.radius = 2.0
+        self.assertEqual(visual.geometry.type, 'cylinder')
+        self.assertEqual(visual.geometry.box.x, 0.0)
+        self.assertEqual(visual.geometry.cylinder.radius, 2.0)
+        self.assertEqual(visual.geometry.type, 'cylinder')
+        with self.assertRaises(AttributeError):
+            visual.unknown = None
+
+    def testLazyImports(self):
+        """Test that the slow optional modules are not imported by a conversion which doesn't need them."""
+        print('Start tests with the imports of a simple conversion...')
+        code = ('import urdf2webots.importer; urdf2webots.importer.convertUrdfContent(input=\'<robot name="r"><link name="a"/>'
+                '<link name="b"><inertial><mass value="1"/></inertial></link><joint name="j" type="fixed">'
+                '<origin xyz="0 0 1" rpy="0 0 1"/><parent link="a"/><child link="b"/></joint></robot>\', robotName="R")')
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=os.path.abspath(rootDirectory),
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        modules = set(line.split('|')[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:'))
+        self.assertIn('urdf2webots.parserURDF', modules)
+        for module in ['numpy', 'PIL', 'rospkg', 'ament_index_python', 'concurrent.futures', 'pstats']:
+            self.assertNotIn(module, modules)
+
+    def testConversionServer(self):
+        """Test that the conversion server converts the posted URDF contents and reports its throughput."""
+        print('Start tests with the conversion server...')
+        content = ('<robot name="served"><link name="base"><inertial><mass value="1"/></inertial></link><link name="arm">'
+                   '<inertial><mass value="1"/></inertial></link><joint name="j" type="revolute"><parent link="base"/>'
+                   '<child link="arm"/><limit effort="1" velocity="1" lower="-1" upper="1"/></joint></robot>')
+        server = ConversionServer('127.0.0.1:0', workers=2)
+        thread = threading.Thread(target=server.serveForever)
+        thread.start()
+        try:
+            url = 'http://' + server.getAddress()
+
+            def post(request):
+                data = json.dumps(request).encode()
+                with urllib.request.urlopen(urllib.request.Request(url + '/convert', data=data,
+                                                                   headers={'Content-Type': 'application/json'})) as response:
+                    return json.load(response)
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                reports = list(executor.map(post, [{'input': content, 'robotName': 'Served'}] * 6))
+            expected = convertUrdfContent(input=content, robotName='Served')
+            for report in reports:
+                self.assertTrue(report['success'], report['error'])
+                self.assertEqual(report['robotString'], expected)
+            report = post({'input': content, 'robotName': 'Served', 'unknown': True})
+            self.assertFalse(report['success'])
+            self.assertIn('unknown', report['error'])
+            # the requests can neither choose where the files are written nor be posted as a form by a web page
+            report = post({'input': content, 'output': os.path.join(resultDirectory, 'Served.proto')})
+            self.assertIn('output', report['error'])
+            self.assertFalse(post({'input': content, 'robotName': '../Served'})['success'])
+            self.assertEqual(post({'input': content})['robotString'], convertUrdfContent(input=content, robotName='robot'))
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(urllib.request.Request(url + '/convert', data=json.dumps({'input': content}).encode(),
+                                                              headers={'Content-Type': 'text/plain'}))
+            self.assertEqual(error.exception.code, 415)
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(urllib.request.Request(url + '/convert', data=b'not json',
+                                                              headers={'Content-Type': 'application/json'}))
+            with urllib.request.urlopen(url + '/health') as response:
+                self.assertEqual(json.load(response)['status'], 'ok')
+            with urllib.request.urlopen(url + '/stats') as response:
+                stats = json.load(response)
+            self.assertEqual(stats['requests'], 10)
+            self.assertEqual(stats['succeeded'], 7)
+            self.assertEqual(stats['failed'], 3)
+            self.assertEqual(stats['inFlight'], 0)
+            self.assertGreater(stats['throughput'], 0.0)
+        finally:
+            server.shutdown()
+            thread.join()
+
     def tearDown(self):
         # undo url changes
         for root, dirs, files in os.walk(expectedDirectory):
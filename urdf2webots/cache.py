@@ -0,0 +1,238 @@
+"""On-disk cache of the conversion results, addressed by the content of their inputs."""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024  # bytes
+
+# bump to invalidate all the entries if their format changes
+CACHE_FORMAT = 1
+
+# subdirectories of the cache directory holding the meshes and textures generated by the conversions, with the extensions
+# of their files, which share the size limit of the cache with its entries
+GENERATED_FILE_TYPES = [('textures', ('.png', '.jpg')), ('meshes', ('.stl',))]
+
+# content hashes of the referenced files, indexed by (path, size, modification time)
+fileHashes = {}
+
+converterHash = None
+
+
+def getDefaultCacheDirectory():
+    """Return the default cache directory of the current user, used when --cache-dir is given without a directory."""
+    cacheHome = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cacheHome, 'urdf2webots')
+
+
+def makePrivateDirectory(directory):
+    """Create a directory, if missing, that only the current user can access."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+
+
+def isPrivate(path):
+    """Return True if a file or directory belongs to the current user and no other user can modify it."""
+    if not hasattr(os, 'getuid'):
+        return True  # no POSIX owner on Windows, the cache directory is protected by the permissions of the user profile
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+def copyCachedFile(cachedFile, destination):
+    """Copy a generated file of the cache, marking it as the most recently used one."""
+    shutil.copyfile(cachedFile, destination)
+    try:
+        os.utime(cachedFile)
+    except OSError:
+        pass
+
+
+def hashFile(path):
+    """Return the SHA-256 of a file content, None if the file cannot be read."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    index = (path, stat.st_size, stat.st_mtime_ns)
+    if index not in fileHashes:
+        sha = hashlib.sha256()
+        try:
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(1024 * 1024), b''):
+                    sha.update(block)
+        except OSError:
+            return None
+        fileHashes[index] = sha.hexdigest()
+    return fileHashes[index]
+
+
+def getConverterHash():
+    """Return a hash of the converter sources, so that upgrading urdf2webots invalidates the cached results."""
+    global converterHash
+    if converterHash is None:
+        sha = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py'):
+                sha.update(name.encode())
+                sha.update((hashFile(os.path.join(directory, name)) or '').encode())
+        converterHash = sha.hexdigest()
+    return converterHash
+
+
+class ConversionCache():
+    """
+    Directory of conversion results whose least recently used entries are removed once it exceeds 'maxSize' bytes.
+
+    The entries of the other types stored in a subdirectory of the cache directory, like the ModelCache ones, and the
+    generated meshes and textures of GENERATED_FILE_TYPES share this size limit.
+    """
+
+    filenamePattern = re.compile(r'filename\s*=\s*"([^"]*)"')
+    packagePattern = re.compile(r'package://([^/"]*)')
+    subdirectory = ''
+    extension = '.json'
+    binary = False
+
+    def __init__(self, directory, maxSize=DEFAULT_MAX_SIZE):
+        """Initialization, 'directory' being the cache directory."""
+        self.root = directory
+        self.directory = os.path.join(directory, self.subdirectory) if self.subdirectory else directory
+        self.maxSize = maxSize
+
+    def getKey(self, lines, options, resolveFilename, getPackagePath):
+        """
+        Return the key of a conversion, None if it cannot be cached.
+        'lines' iterates over the URDF content, 'options' contains all the parameters having an effect on the result,
+        'getPackagePath' returns the directory of a ROS package and 'resolveFilename' the local path of a referenced file.
+        """
+        sha = hashlib.sha256()
+        filenames = set()
+        packageNames = set()
+        for line in lines:
+            sha.update(line.encode())
+            if 'filename' in line:
+                filenames.update(self.filenamePattern.findall(line))
+            if 'package://' in line:
+                packageNames.update(self.packagePattern.findall(line))
+        for filename in filenames:
+            # converted TIFF textures are written next to the result, they are not part of a cache entry
+            if filename.lower().endswith(('.tif', '.tiff')):
+                return None
+        sha.update(json.dumps({
+            'format': CACHE_FORMAT,
+            'converter': getConverterHash(),
+            'options': options,
+            'packages': {name: getPackagePath(name) for name in sorted(packageNames)},
+            'files': {filename: self.getFileKey(resolveFilename(filename)) for filename in sorted(filenames)}
+        }, sort_keys=True).encode())
+        return sha.hexdigest()
+
+    def getFileKey(self, path):
+        """Return the part of the key of a conversion identifying a referenced file."""
+        return hashFile(path)
+
+    def getEntryPath(self, key):
+        """Return the path of an entry."""
+        return os.path.join(self.directory, key + self.extension)
+
+    def readEntry(self, file):
+        """Return the entry read from a file."""
+        return json.load(file)
+
+    def writeEntry(self, file, entry):
+        """Write an entry in a file."""
+        json.dump(entry, file)
+
+    def load(self, key):
+        """Return the entry stored with 'key', None if there is none."""
+        path = self.getEntryPath(key)
+        try:
+            with open(path, 'rb' if self.binary else 'r') as file:
+                entry = self.readEntry(file)
+            os.utime(path)  # most recently used
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def store(self, key, entry):
+        """Store an entry and evict the least recently used ones if the cache is too large."""
+        try:
+            makePrivateDirectory(self.root)
+            makePrivateDirectory(self.directory)
+            # write a temporary file first so that concurrent conversions never read a partial entry
+            descriptor, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'wb' if self.binary else 'w') as file:
+                self.writeEntry(file, entry)
+            os.replace(temporaryPath, self.getEntryPath(key))
+        except OSError as e:
+            print('Could not store the conversion in the cache: %s' % e)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries and generated files until the size of the cache is below its limit."""
+        entries = []
+        size = 0
+        fileTypes = [(entryType.subdirectory, (entryType.extension,)) for entryType in [ConversionCache, ModelCache]]
+        for subdirectory, extensions in fileTypes + GENERATED_FILE_TYPES:
+            directory = os.path.join(self.root, subdirectory) if subdirectory else self.root
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if not name.endswith(extensions):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                size += stat.st_size
+        entries.sort()
+        for mtime, entrySize, path in entries:
+            if size <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= entrySize
+
+
+class ModelCache(ConversionCache):
+    """Serialized robot models, whose entries are the bytes of RobotModel.toBytes(), in the "models" subdirectory."""
+
+    subdirectory = 'models'
+    extension = '.model'
+    binary = True
+
+    def getFileKey(self, path):
+        """Return the part of the key of a model identifying a referenced file, the model referencing it by its path."""
+        return [os.path.abspath(path), hashFile(path)]
+
+    def readEntry(self, file):
+        """Return the entry read from a file."""
+        return file.read()
+
+    def load(self, key):
+        """Return the entry stored with 'key', None if there is none or if another user could have written it."""
+        # loading a model unpickles it, which can run any code
+        for path in [self.root, self.directory]:
+            if os.path.exists(path) and not isPrivate(path):
+                print('The robot models of "%s" are ignored: other users can modify this directory.' % self.root)
+                return None
+        if not isPrivate(self.getEntryPath(key)):
+            return None
+        return super().load(key)
+
+    def writeEntry(self, file, entry):
+        """Write an entry in a file."""
+        file.write(entry)
@@ -0,0 +1,44 @@
+"""State of a URDF conversion."""
+from urdf2webots.stats import ConversionStats
+from urdf2webots.textures import TextureTranslator
+
+
+class ConversionContext():
+    """Options and state of a single conversion, passed through the parser and the writer.
+
+    Each conversion uses its own context so that several conversions can run one after the other or concurrently in the
+    same process without sharing any state.
+    """
+
+    def __init__(self, robotName='', isProto=True, toolSlot=None, initPos=None, linkToDef=False, jointToDef=False,
+                 targetVersion='R2025a', stats=None, textureCacheDirectory=None, textureMaxSize=None, textureFormat=None):
+        """Initialization."""
+        self.robotName = robotName
+        self.isProto = isProto
+        self.toolSlot = toolSlot
+        self.initPos = list(initPos) if initPos is not None else None  # consumed joint after joint by the writer
+        self.linkToDef = linkToDef
+        self.jointToDef = jointToDef
+        self.targetVersion = targetVersion
+        self.stats = stats if stats is not None else ConversionStats()
+        self.textures = TextureTranslator(textureCacheDirectory, maxSize=textureMaxSize, imageFormat=textureFormat)
+        self.staticBase = False
+        self.indexSolid = 0
+        self.namedMaterial = {}
+        self.materialReferences = None  # (visual, material name) pairs, recorded only when set to a list
+        self.geometryReference = {}  # getMeshKey() -> geometry of the mesh nodes
+        self.geometryNames = set()
+        self.origins = None  # (item, RPY angles) pairs converted by convertOrigins(), recorded only when set to a list
+        self.imus = []
+        self.p3ds = []
+        self.cameras = []
+        self.rangeFinders = []
+        self.lidars = []
+        self.spans = None  # joint name -> (start, end, level) in the output, recorded only when set to a dict
+        self.definitions = None  # DEF name -> offset in the output, recorded along with the spans
+        self.templateSlots = None  # slots of a Robot node template, recorded only when set to a list
+        self.templateJoints = 0  # number of hinge joints recorded in the template slots
+
+    def getSensorList(self):
+        """Return all the sensors parsed from the <gazebo> elements."""
+        return self.imus + self.p3ds + self.cameras + self.rangeFinders + self.lidars
@@ -0,0 +1,78 @@
+"""Buffered output of the PROTO files and Robot node strings."""
+
+INDENT = '  '
+
+
+class Indentation(dict):
+    """Indentation strings indexed by level, each one being computed once."""
+
+    def __missing__(self, level):
+        """Compute the indentation of a new level."""
+        indentation = INDENT * level
+        self[level] = indentation
+        return indentation
+
+
+indents = Indentation()
+
+
+class Emitter():
+    """
+    Collect the output of the writer in memory and write it to a file in large blocks.
+
+    It provides the write() and tell() methods of the text files used by the writer, write() only appending a chunk to a
+    list. The chunks are joined into blocks by checkpoint(), which the writer calls after each link, and the blocks are
+    written in the file once they exceed blockSize characters. Without file, the whole output is kept in memory and
+    returned by getvalue().
+    """
+
+    def __init__(self, file=None, blockSize=1024 * 1024):
+        """Initialization."""
+        self.file = file
+        self.blockSize = blockSize
+        self.chunks = []
+        self.write = self.chunks.append
+        self.blocks = []
+        self.blocksSize = 0  # number of characters in the blocks
+        self.flushedSize = 0  # number of characters already written in the file
+
+    def collect(self):
+        """Join the chunks written since the last call into a block."""
+        if self.chunks:
+            block = ''.join(self.chunks)
+            self.chunks.clear()  # the list is kept, write() is bound to it
+            self.blocks.append(block)
+            self.blocksSize += len(block)
+
+    def checkpoint(self):
+        """Collect the chunks and write the blocks in the file if they are large enough."""
+        self.collect()
+        if self.file is not None and self.blocksSize >= self.blockSize:
+            self.flush()
+
+    def tell(self):
+        """Return the number of characters of the output."""
+        self.collect()
+        return self.flushedSize + self.blocksSize
+
+    def flush(self):
+        """Write the whole output collected so far in the file."""
+        self.collect()
+        if self.file is not None and self.blocks:
+            self.file.write(''.join(self.blocks))
+            self.flushedSize += self.blocksSize
+            self.blocks = []
+            self.blocksSize = 0
+
+    def getvalue(self):
+        """Return the output which has not been written in the file, i.e. the whole output if there is no file."""
+        self.collect()
+        value = ''.join(self.blocks)
+        self.blocks = [value]
+        return value
+
+    def close(self):
+        """Write the remaining output and close the file."""
+        self.flush()
+        if self.file is not None:
+            self.file.close()
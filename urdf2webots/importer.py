@@ -6,29 +6,29 @@
 import sys
 import errno
 import argparse
+import contextlib
+import io
+import json
 import os
-import re
-import tempfile
+import time
 from xml.dom import minidom
 
+import urdf2webots.cache
+import urdf2webots.emitter
+import urdf2webots.model
+import urdf2webots.packages
 import urdf2webots.parserURDF
+import urdf2webots.stats
+import urdf2webots.streamURDF
+import urdf2webots.textures
+import urdf2webots.watch
 import urdf2webots.writeRobot
+from urdf2webots.context import ConversionContext
 
 # Check version of Python
 if sys.version_info < (3, 7):
     sys.exit('urdf2webots requires Python 3.7 or higher.')
 
-try:
-    import rospkg
-except ImportError:
-    pass
-
-try:
-    from ament_index_python import PackageNotFoundError
-    from ament_index_python.packages import get_package_share_directory
-except ImportError:
-    pass
-
 
 def convertLUtoUN(s):
     """Capitalize a string."""
@@ -58,19 +58,66 @@ def mkdirSafe(directory):
             print('Directory "' + directory + '" already exists!')
 
 
+def parseInitPos(initPos):
+    """Return the list of initial joint positions given as a string, e.g. "[1.0, 2, -0.4]", or as a list."""
+    if not isinstance(initPos, str):
+        return [float(position) for position in initPos]
+    try:
+        initPos = initPos.replace(",", ' ').replace("[", '').replace("]", '').replace("(", '').replace(")", '')
+        return list(map(float, initPos.split()))
+    except Exception as e:
+        sys.exit(e, '\n--init-pos argument is not valid. Your list has to be inside of quotation marks. '
+                 'Example: --init-pos="1.0, 2, -0.4"')
+
+
+def restoreGeneratedFiles(generatedFiles):
+    """Copy the missing meshes and textures of a cached conversion from the cache, return False if one cannot be restored."""
+    for file, cachedFile in generatedFiles:
+        if os.path.isfile(file):
+            continue
+        try:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            urdf2webots.cache.copyCachedFile(cachedFile, file)
+        except (OSError, TypeError):  # no cached copy
+            return False
+    return True
+
+
+def getPackagePath(packageName, urdfDirectory):
+    """Return the directory containing the "packageName" ROS package, None if it cannot be determined."""
+    directory = urdfDirectory
+    while packageName != os.path.split(directory)[1] and os.path.split(directory)[1]:
+        directory = os.path.dirname(directory)
+    if not os.path.split(directory)[1]:
+        # not an ancestor of the URDF directory, look it up in the ROS environment
+        packageDirectory = urdf2webots.packages.packageIndex.find(packageName)
+        if packageDirectory is not None:
+            directory = packageDirectory
+    if os.path.split(directory)[1]:
+        packagePath = os.path.split(directory)[0]
+        return packagePath.replace("\\", "/")
+    sys.stderr.write('Can\'t determine package root path.\n')
+    return None
+
+
 def convertUrdfFile(input=None, output=None, robotName=None, normal=False, boxCollision=False,
                     toolSlot=None, initTranslation='0 0 0', initRotation='0 0 1 0',
-                    initPos=None, linkToDef=False, jointToDef=False, relativePathPrefix=None, targetVersion='R2025a'):
+                    initPos=None, linkToDef=False, jointToDef=False, relativePathPrefix=None, targetVersion='R2025a',
+                    parser='dom', cacheDir=None, cacheMaxSize=None, collisionTolerance=None, linkCollisionTolerances=None,
+                    mergeFixedLinks=False, meshTriangleBudget=None, robotTriangleBudget=None, textureMaxSize=None,
+                    textureFormat=None, watcher=None, stats=None):
     """Convert a URDF file into a Webots PROTO file or Robot node string."""
     urdfContent = None
+    urdfPath = None
     if not input:
         print('''"--input" not specified, a URDF content will be read in the in stdin.\n
             The "</robot>" tag will stop the reading.''')
-        urdfContent = ""
+        lines = []  # joined once, appending to a string copies it at each line
         for line in sys.stdin:
-            urdfContent += line
+            lines.append(line)
             if "</robot>" == line.strip():
                 break
+        urdfContent = ''.join(lines)
         print("URDF lecture is finished!")
     else:
         if not os.path.isfile(input):
@@ -78,52 +125,363 @@ def convertUrdfFile(input=None, output=None, robotName=None, normal=False, boxCo
         if not input.endswith('.urdf'):
             sys.exit('"%s" is not a URDF file.' % input)
 
+        # Set urdfPath for replacing "package://(.*)" occurences later
+        urdfPath = os.path.abspath(input)
+
+        if parser == 'stream':
+            # the streaming parser reads the file itself, chunk by chunk
+            with open(input, 'r') as file:
+                return convertUrdfContent(file, output, robotName, normal, boxCollision, toolSlot, initTranslation,
+                                          initRotation, initPos, linkToDef, jointToDef, relativePathPrefix, targetVersion,
+                                          parser, urdfPath, cacheDir=cacheDir, cacheMaxSize=cacheMaxSize,
+                                          collisionTolerance=collisionTolerance,
+                                          linkCollisionTolerances=linkCollisionTolerances,
+                                          mergeFixedLinks=mergeFixedLinks, meshTriangleBudget=meshTriangleBudget,
+                                          robotTriangleBudget=robotTriangleBudget, textureMaxSize=textureMaxSize,
+                                          textureFormat=textureFormat, watcher=watcher, stats=stats)
+
         with open(input, 'r') as file:
             urdfContent = file.read()
         if urdfContent is None:
             sys.exit('Could not read the URDF file.')
 
-        # Set urdfPath for replacing "package://(.*)" occurences later
-        convertUrdfFile.urdfPath = os.path.abspath(input)
-
     return convertUrdfContent(urdfContent, output, robotName, normal, boxCollision, toolSlot, initTranslation, initRotation,
-                              initPos, linkToDef, jointToDef, relativePathPrefix, targetVersion)
+                              initPos, linkToDef, jointToDef, relativePathPrefix, targetVersion, parser, urdfPath,
+                              cacheDir=cacheDir, cacheMaxSize=cacheMaxSize, collisionTolerance=collisionTolerance,
+                              linkCollisionTolerances=linkCollisionTolerances, mergeFixedLinks=mergeFixedLinks,
+                              meshTriangleBudget=meshTriangleBudget, robotTriangleBudget=robotTriangleBudget,
+                              textureMaxSize=textureMaxSize, textureFormat=textureFormat, watcher=watcher, stats=stats)
+
+
+def convertUrdfJob(job):
+    """Run one job of a batch conversion and report its outcome instead of raising."""
+    report = {'input': job.get('input'), 'output': job.get('output'), 'success': False, 'time': 0.0, 'error': None}
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        if not job.get('input'):
+            raise ValueError('the "input" of a batch job is mandatory')
+        with contextlib.redirect_stdout(log):
+            robotString = convertUrdfFile(**job)
+        if robotString is not None:
+            report['robotString'] = robotString
+        report['success'] = True
+    except SystemExit as e:
+        report['error'] = str(e.code)
+    except Exception as e:
+        report['error'] = '%s: %s' % (type(e).__name__, e)
+    report['time'] = time.perf_counter() - start
+    report['log'] = log.getvalue()
+    return report
+
+
+def convertUrdfFiles(jobs, workers=None):
+    """
+    Convert several URDF files in parallel using a pool of processes.
+    Each job is either the path of a URDF file or a dictionary of convertUrdfFile() arguments containing at least "input".
+    Returns one report per job, in the same order, with the "input", "output", "success", "time" (in seconds), "error",
+    "log" (what the conversion printed) and, for Robot node strings, "robotString" entries.
+    A failing job doesn't prevent the other ones from being converted.
+    """
+    jobs = [{'input': job} if isinstance(job, str) else dict(job) for job in jobs]
+    if workers == 1:
+        return [convertUrdfJob(job) for job in jobs]
+    import concurrent.futures
+    reports = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convertUrdfJob, job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                reports.append(future.result())
+            except Exception as e:  # the worker process died
+                reports.append({'input': job.get('input'), 'output': job.get('output'), 'success': False, 'time': 0.0,
+                                'error': '%s: %s' % (type(e).__name__, e), 'log': ''})
+    return reports
+
+
+def convertUrdfBatch(manifest, workers=None, reportFile=None, cacheDir=None, cacheMaxSize=None):
+    """
+    Convert the URDF files listed in a JSON manifest and print a summary, return True if all the conversions succeeded.
+    The manifest contains either a list of jobs or an object with a "jobs" list and optional "defaults" arguments
+    shared by all the jobs (see convertUrdfFiles()). The cache arguments apply to the jobs not setting them.
+    """
+    with open(manifest, 'r') as file:
+        content = json.load(file)
+    if isinstance(content, list):
+        content = {'jobs': content}
+    defaults = dict({'cacheDir': cacheDir, 'cacheMaxSize': cacheMaxSize}, **content.get('defaults', {}))
+    jobs = []
+    for job in content.get('jobs', []):
+        if isinstance(job, str):
+            job = {'input': job}
+        jobs.append(dict(defaults, **job))
+
+    start = time.perf_counter()
+    reports = convertUrdfFiles(jobs, workers)
+    failures = 0
+    for report in reports:
+        if report['success']:
+            print('[OK]     %s (%.3f s)' % (report['input'], report['time']))
+        else:
+            failures += 1
+            print('[FAILED] %s (%.3f s): %s' % (report['input'], report['time'], report['error']))
+    print('%d/%d conversions succeeded in %.3f s' % (len(reports) - failures, len(reports), time.perf_counter() - start))
+    if reportFile:
+        with open(reportFile, 'w') as file:
+            json.dump(reports, file, indent=2)
+    return failures == 0
+
+
+def watchUrdfFile(input, interval=0.5, **arguments):
+    """
+    Convert a URDF file into a Webots PROTO file and update it each time the URDF file is saved, until interrupted.
+    Only the subtrees of the PROTO file containing the links and joints that changed are written again.
+    The other arguments are the ones of convertUrdfFile().
+    """
+    if not input:
+        sys.exit('--watch requires the --input argument.')
+    if arguments.get('robotName'):
+        sys.exit('--watch is only available for PROTO conversions.')
+    watcher = urdf2webots.watch.Watcher()
+    convertUrdfFile(input, watcher=watcher, **arguments)
+    modificationTime = os.stat(input).st_mtime_ns
+    print('Watching "%s" for changes, press Ctrl+C to stop.' % input)
+    try:
+        while True:
+            time.sleep(interval)
+            try:
+                newModificationTime = os.stat(input).st_mtime_ns
+            except OSError:  # the file is being replaced
+                continue
+            if newModificationTime == modificationTime:
+                continue
+            modificationTime = newModificationTime
+            try:
+                convertUrdfFile(input, watcher=watcher, **arguments)
+            except SystemExit as e:
+                print('Conversion failed: %s' % e.code)
+                continue
+            except Exception as e:  # the file may be saved while being edited
+                print('Conversion failed: %s: %s' % (type(e).__name__, e))
+                continue
+            print(watcher.getReport())
+    except KeyboardInterrupt:
+        pass
+
+
+def readUrdfDocuments(stream):
+    """
+    Yield the URDF documents of a binary stream as soon as they are complete.
+    A document either ends with a line ending with "</robot>" or is preceded by a line giving its length in bytes.
+    """
+    lines = []
+    while True:
+        line = stream.readline()
+        if not line:
+            break
+        if not lines:
+            header = line.strip()
+            if not header:
+                continue
+            if header.isdigit():
+                yield stream.read(int(header)).decode()
+                continue
+        lines.append(line)
+        if line.rstrip().endswith(b'</robot>'):
+            yield b''.join(lines).decode()
+            lines = []
+    if lines:
+        yield b''.join(lines).decode()  # incomplete, its conversion reports the error
+
+
+def writeFrame(stream, status, content):
+    """Write a "<status> <length in bytes>" line followed by the content."""
+    data = content.encode()
+    stream.write(b'%s %d\n' % (status.encode(), len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def convertUrdfPipe(inputStream=None, outputStream=None, **arguments):
+    """
+    Convert the URDF documents of a binary stream, stdin by default, one after the other as they arrive, see
+    readUrdfDocuments(), and write each result in a binary stream, stdout by default, see writeFrame().
+    The status of a result is "ok", its content being the PROTO file or the Robot node string, or "error", its content
+    being the error message. The log of the conversions is written in stderr. The other arguments are the ones of
+    convertUrdfContent(). Return the number of failed conversions.
+    """
+    inputStream = inputStream if inputStream is not None else sys.stdin.buffer
+    outputStream = outputStream if outputStream is not None else sys.stdout.buffer
+    failures = 0
+    for content in readUrdfDocuments(inputStream):
+        stats = urdf2webots.stats.ConversionStats()
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                result = convertUrdfContent(content, stats=stats, **arguments)
+            if result is None:
+                with open(stats.outputFile, 'r') as file:
+                    result = file.read()
+            writeFrame(outputStream, 'ok', result)
+            continue
+        except SystemExit as e:
+            error = str(e.code)
+        except Exception as e:
+            error = '%s: %s' % (type(e).__name__, e)
+        failures += 1
+        writeFrame(outputStream, 'error', error)
+    return failures
+
+
+def parseRobotModel(context, robot, robotParser, urdfPath, urdfDirectory, outputDirectory, meshDirectory,
+                    textureDirectory, collisionTolerance=None, linkCollisionTolerances=None, meshTriangleBudget=None,
+                    robotTriangleBudget=None, cacheDir=None):
+    """
+    Return the model.RobotModel of a <robot> element, 'robotParser' being the streamURDF.RobotParser it comes from if any.
+    The mesh URLs are made relative to 'outputDirectory' and the reduced meshes and textures are written in 'meshDirectory'
+    and 'textureDirectory', which is also the directory of the context textures.
+    """
+    stats = context.stats
+    context.origins = []
+    if robotParser is not None:
+        with stats.phase('xmlParsing'):
+            linkList, jointList, gazeboElements = robotParser.parse(urdfDirectory, outputDirectory)
+    else:
+        linkElementList = []
+        jointElementList = []
+        gazeboElements = []
+        with stats.phase('materials'):
+            for child in robot.childNodes:
+                if child.localName == 'link':
+                    linkElementList.append(child)
+                elif child.localName == 'joint':
+                    jointElementList.append(child)
+                elif child.localName == 'material':
+                    urdf2webots.parserURDF.getMaterial(context, child)
+                elif child.localName == 'gazebo':
+                    gazeboElements.append(child)
+
+        linkList = []
+        jointList = []
+        with stats.phase('links'):
+            for link in linkElementList:
+                linkList.append(urdf2webots.parserURDF.getLink(context, link, urdfDirectory, outputDirectory))
+        with stats.phase('joints'):
+            for joint in jointElementList:
+                jointList.append(urdf2webots.parserURDF.getJoint(joint, context))
+
+    with stats.phase('origins'):
+        urdf2webots.parserURDF.convertOrigins(context)
+    with stats.phase('textureConversion'):
+        context.textures.wait()
+    if context.textures.isReducing():
+        stats.count('reducedTextures', len(context.textures.files))
+
+    if collisionTolerance is not None or linkCollisionTolerances:
+        with stats.phase('collisionFitting'):
+            fits = urdf2webots.parserURDF.fitCollisionPrimitives(linkList, outputDirectory, collisionTolerance,
+                                                                 linkCollisionTolerances)
+        stats.count('fittedCollisions', sum(fit['replaced'] for fit in fits))
+
+    generatedFiles = [list(files) for files in context.textures.files]  # (file, cached file) pairs restored from the cache
+    if meshTriangleBudget is not None or robotTriangleBudget is not None:
+        with stats.phase('meshReduction'):
+            reductions = urdf2webots.parserURDF.reduceVisualMeshes(
+                context, linkList, outputDirectory, meshDirectory, meshTriangleBudget, robotTriangleBudget,
+                os.path.join(cacheDir, 'meshes') if cacheDir else None)
+        reducedMeshes = [[entry['file'], entry['cachedFile']] for entry in reductions if entry['file'] is not None]
+        stats.count('reducedMeshes', len(reducedMeshes))
+        generatedFiles += reducedMeshes
+
+    rootLink = urdf2webots.parserURDF.Link()
+    childList = set(joint.child for joint in jointList)
+    for link in linkList:
+        if urdf2webots.parserURDF.isRootLink(link.name, childList):
+            # We want to skip links between the robot and the static environment.
+            rootLink = link
+            previousRootLink = link
+            while rootLink in ['base_link', 'base_footprint']:
+                directJoints = []
+                for joint in jointList:
+                    if joint.parent == rootLink.name:
+                        directJoints.append(joint)
+                if len(directJoints) == 1:
+                    for childLink in linkList:
+                        if childLink.name == directJoints[0].child:
+                            previousRootLink = rootLink
+                            rootLink = childLink
+                else:
+                    rootLink = previousRootLink
+                    break
+
+            print('Root link: ' + rootLink.name)
+            break
 
+    with stats.phase('sensors'):
+        for gazeboElement in gazeboElements:
+            urdf2webots.parserURDF.parseGazeboElement(context, gazeboElement, rootLink.name, linkList)
 
-convertUrdfFile.urdfPath = None
+    return urdf2webots.model.RobotModel(robot.getAttribute('name'), urdfPath, outputDirectory, meshDirectory,
+                                        textureDirectory, context.targetVersion >= 'R2022b', rootLink, linkList, jointList,
+                                        context, generatedFiles)
 
 
+@urdf2webots.stats.instrumented
 def convertUrdfContent(input, output=None, robotName=None, normal=False, boxCollision=False,
                        toolSlot=None, initTranslation='0 0 0', initRotation='0 0 1 0',
-                       initPos=None, linkToDef=False, jointToDef=False, relativePathPrefix=None, targetVersion='R2025a'):
+                       initPos=None, linkToDef=False, jointToDef=False, relativePathPrefix=None, targetVersion='R2025a',
+                       parser='dom', urdfPath=None, cacheDir=None, cacheMaxSize=None, collisionTolerance=None,
+                       linkCollisionTolerances=None, mergeFixedLinks=False, meshTriangleBudget=None, robotTriangleBudget=None,
+                       textureMaxSize=None, textureFormat=None, watcher=None, stats=None, templateSlots=None, parseOnly=False):
     """
-    Convert a URDF content string into a Webots PROTO file or Robot node string.
+    Convert a URDF content string or a model.RobotModel into a Webots PROTO file or Robot node string.
     The current working directory will be used for relative paths in your URDF file.
     To use the location of your URDF file for relative paths, please use the convertUrdfFile() function.
+    With parser='stream', the content is parsed incrementally instead of being loaded as a whole in a DOM,
+    it can then also be given as a file object.
+    If set, urdfPath is the path of the URDF file the content comes from, its directory is then used for relative paths.
+    If cacheDir is set, the result is stored in this directory and returned from it as long as neither the URDF content,
+    the arguments nor the referenced mesh and texture files change. The least recently used results are removed once the
+    cache exceeds cacheMaxSize bytes. The PNG images converted from TIFF textures, the reduced meshes and the reduced
+    textures are also kept in this directory, within the same size limit.
+    If collisionTolerance is set, the collision meshes are replaced by a box, cylinder, sphere or capsule whenever the
+    volume of the primitive doesn't exceed the one of the mesh by more than this ratio. linkCollisionTolerances maps link
+    names to the tolerance used for their collisions instead.
+    If mergeFixedLinks is set, the links attached by a fixed joint are merged into their parent link, their masses and
+    inertia being combined.
+    If meshTriangleBudget or robotTriangleBudget is set, the visual STL and OBJ meshes are reduced to at most this number
+    of triangles per mesh or for the whole robot, the reduced copies being written in the "<robot>_meshes" directory.
+    If textureMaxSize or textureFormat is set, all the textures are resized to powers of two of at most textureMaxSize pixels
+    and re-encoded as PNG or JPEG images ('png', 'jpeg' or 'auto' for JPEG unless transparent) in the "<robot>_textures"
+    directory, the identical images being written once.
+    A watch.Watcher can be given to update the PROTO file of its previous conversion instead of writing it completely.
+    A stats.ConversionStats given as stats keyword argument records the duration, calls and items of each phase.
+    If templateSlots is a list, the values set by each instance of a Robot node template are recorded in it and replaced
+    by markers in the returned string, see template.compileRobotTemplate().
+    If parseOnly is set, the content is only parsed and its model.RobotModel returned, see parseUrdfContent(). The parsed
+    models are also cached in cacheDir, so that the options only applied when writing the robot, like the output, robot
+    name, target version, tool slot, DEF names, translation, rotation or initial joint positions, don't parse the URDF content
+    again.
     """
-    # Retrieve urdfPath if this function has been called from convertUrdfFile()
-    # And set urdfDirectory accordingly
-    urdfPath = None
-    if convertUrdfFile.urdfPath is not None:
-        urdfPath = convertUrdfFile.urdfPath
+    if isinstance(input, urdf2webots.model.RobotModel) and urdfPath is None:
+        urdfPath = input.urdfPath
+    # Set urdfDirectory according to the location of the URDF content
+    if urdfPath is not None:
         urdfDirectory = os.path.dirname(urdfPath)
-        convertUrdfFile.urdfPath = None
     elif relativePathPrefix is not None:
         urdfDirectory = relativePathPrefix
     else:
         urdfDirectory = os.getcwd()
 
+    if parser not in ['dom', 'stream']:
+        sys.exit('--parser argument is not valid. It has to be "dom" or "stream".')
+    if textureFormat is not None and textureFormat not in urdf2webots.textures.TEXTURE_FORMATS:
+        sys.exit('--texture-format argument is not valid. It has to be "auto", "png" or "jpeg".')
     if not isinstance(initTranslation, str) or len(initTranslation.split()) != 3:
         sys.exit('--translation argument is not valid. It has to be of Type = str and contain 3 values.')
     if not isinstance(initRotation, str) or len(initRotation.split()) != 4:
         sys.exit('--rotation argument is not valid. It has to be of Type = str and contain 4 values.')
     if initPos is not None:
-        try:
-            initPos = initPos.replace(",", ' ').replace("[", '').replace("]", '').replace("(", '').replace(")", '')
-            initPos = list(map(float, initPos.split()))
-        except Exception as e:
-            sys.exit(e, '\n--init-pos argument is not valid. Your list has to be inside of quotation marks. '
-                     'Example: --init-pos="1.0, 2, -0.4"')
+        initPos = parseInitPos(initPos)
 
     if robotName:
         if robotName == '':
@@ -132,166 +490,270 @@ def convertUrdfContent(input, output=None, robotName=None, normal=False, boxColl
     else:
         isProto = True
 
-    urdf2webots.writeRobot.isProto = isProto
-    urdf2webots.writeRobot.initPos = initPos
+    textureCacheDirectory = os.path.join(cacheDir, 'textures') if cacheDir else None
     if isProto:
-        urdf2webots.writeRobot.toolSlot = toolSlot
-        urdf2webots.writeRobot.linkToDef = linkToDef
-        urdf2webots.writeRobot.jointToDef = jointToDef
+        context = ConversionContext(isProto=True, toolSlot=toolSlot, initPos=initPos, linkToDef=linkToDef,
+                                    jointToDef=jointToDef, targetVersion=targetVersion, stats=stats,
+                                    textureCacheDirectory=textureCacheDirectory, textureMaxSize=textureMaxSize,
+                                    textureFormat=textureFormat)
     else:
-        urdf2webots.writeRobot.toolSlot = None
-        urdf2webots.writeRobot.linkToDef = False
-        urdf2webots.writeRobot.jointToDef = False
-
-    # Required resets in case of multiple conversions
-    urdf2webots.writeRobot.indexSolid = 0
-    urdf2webots.writeRobot.staticBase = False
-    urdf2webots.writeRobot.targetVersion = targetVersion
-    urdf2webots.parserURDF.Material.namedMaterial.clear()
-    urdf2webots.parserURDF.Geometry.reference.clear()
-    urdf2webots.parserURDF.targetVersion = targetVersion
-
-    # Replace "package://(.*)" occurences
-    for match in re.finditer('"package://(.*?)"', input):
-        packageName = match.group(1).split('/')[0]
-        directory = urdfDirectory
-        while packageName != os.path.split(directory)[1] and os.path.split(directory)[1]:
-            directory = os.path.dirname(directory)
-        if not os.path.split(directory)[1]:
-            if 'ROS_VERSION' in os.environ:
-                if os.environ['ROS_VERSION'] == '1':
-                    try:
-                        rospack = rospkg.RosPack()
-                        directory = rospack.get_path(packageName)
-                    except rospkg.common.ResourceNotFound:
-                        sys.stderr.write('Package "%s" not found.\n' % packageName)
-                    except NameError:
-                        sys.stderr.write('Impossible to find location of "%s" package, installing "rospkg" might help.\n'
-                                         % packageName)
-                else:
-                    try:
-                        directory = get_package_share_directory(packageName)
-                    except PackageNotFoundError:
-                        sys.stderr.write('Package "%s" not found.\n' % packageName)
-            else:
-                sys.stderr.write('ROS not sourced, package "%s" will not be found.\n' % packageName)
-        if os.path.split(directory)[1]:
-            packagePath = os.path.split(directory)[0]
-            packagePath = packagePath.replace("\\", "/")
-            input = input.replace('package://' + packageName, packagePath + '/' + packageName)
+        context = ConversionContext(isProto=False, initPos=initPos, targetVersion=targetVersion, stats=stats,
+                                    textureCacheDirectory=textureCacheDirectory, textureMaxSize=textureMaxSize,
+                                    textureFormat=textureFormat)
+    stats = context.stats
+
+    packagePaths = {}
+
+    def getConversionPackagePath(packageName):
+        if packageName not in packagePaths:
+            with stats.phase('packageLookup'):
+                packagePaths[packageName] = getPackagePath(packageName, urdfDirectory)
+            stats.count('packages')
+        return packagePaths[packageName]
+
+    def resolveUri(uri):
+        packageName = uri[len('package://'):].split('/')[0]
+        packagePath = getConversionPackagePath(packageName)
+        if packagePath is None:
+            return uri
+        return uri.replace('package://' + packageName, packagePath + '/' + packageName)
+
+    def resolveFilename(filename):
+        if filename.startswith('package://'):
+            return resolveUri(filename)
+        return os.path.join(urdfDirectory, filename)
+
+    isModel = isinstance(input, urdf2webots.model.RobotModel)
+    if isModel and input.cadShapes != (targetVersion >= 'R2022b'):
+        sys.exit('The robot model was parsed for a target version %s R2022b.' % ('since' if input.cadShapes else 'before'))
+    isSeekable = not isModel and (isinstance(input, str) or input.seekable())
+
+    cache = None
+    cacheKey = None
+    if cacheDir and not parseOnly and not isModel and watcher is None and templateSlots is None and isSeekable:
+        cache = urdf2webots.cache.ConversionCache(cacheDir, cacheMaxSize or urdf2webots.cache.DEFAULT_MAX_SIZE)
+        options = {
+            'output': os.path.abspath(output) if output else None,
+            'robotName': robotName,
+            'normal': normal,
+            'boxCollision': boxCollision,
+            'toolSlot': toolSlot,
+            'initTranslation': initTranslation,
+            'initRotation': initRotation,
+            'initPos': initPos,
+            'linkToDef': linkToDef,
+            'jointToDef': jointToDef,
+            'targetVersion': targetVersion,
+            'collisionTolerance': collisionTolerance,
+            'linkCollisionTolerances': linkCollisionTolerances or None,
+            'mergeFixedLinks': mergeFixedLinks,
+            'meshTriangleBudget': meshTriangleBudget,
+            'robotTriangleBudget': robotTriangleBudget,
+            'textureMaxSize': textureMaxSize,
+            'textureFormat': textureFormat,
+            'urdfPath': urdfPath,
+            'urdfDirectory': os.path.abspath(urdfDirectory),
+            'workingDirectory': os.getcwd()
+        }
+
+        with stats.phase('cacheLookup'):
+            cacheKey = cache.getKey([input] if isinstance(input, str) else input, options, resolveFilename,
+                                    getConversionPackagePath)
+            if not isinstance(input, str):
+                input.seek(0)
+            entry = cache.load(cacheKey) if cacheKey is not None else None
+            if entry is not None and not restoreGeneratedFiles(entry.get('generatedFiles', [])):
+                entry = None
+        if entry is not None:
+            print('Conversion found in the cache.')
+            stats.count('cacheHits')
+            if not isProto:
+                return entry['robotString']
+            stats.outputFile = entry['outputFile']
+            mkdirSafe(entry['outputFile'].replace('.proto', '') + '_textures')
+            with open(entry['outputFile'], 'w') as protoFile:
+                protoFile.write(entry['proto'])
+            return
+
+    # the parsed model is cached separately, so that the options only used by the writer don't parse the URDF again
+    model = input.copy() if isModel else None
+    modelCache = None
+    modelKey = None
+    if cacheDir and watcher is None and isSeekable:
+        modelCache = urdf2webots.cache.ModelCache(cacheDir, cacheMaxSize or urdf2webots.cache.DEFAULT_MAX_SIZE)
+        # only the options changing the parsed model, the output paths being set when writing it, see RobotModel.relocate()
+        options = {
+            'cadShapes': targetVersion >= 'R2022b',
+            'collisionTolerance': collisionTolerance,
+            'linkCollisionTolerances': linkCollisionTolerances or None,
+            'meshTriangleBudget': meshTriangleBudget,
+            'robotTriangleBudget': robotTriangleBudget,
+            'textureMaxSize': textureMaxSize,
+            'textureFormat': textureFormat
+        }
+        with stats.phase('modelCacheLookup'):
+            modelKey = modelCache.getKey([input] if isinstance(input, str) else input, options, resolveFilename,
+                                         getConversionPackagePath)
+            if not isinstance(input, str):
+                input.seek(0)
+            data = modelCache.load(modelKey) if modelKey is not None else None
+            if data is not None:
+                try:
+                    model = urdf2webots.model.RobotModel.fromBytes(data)
+                except ValueError:
+                    model = None
+
+    def getRobotElement():
+        """Return the <robot> element of the URDF content and the streamURDF.RobotParser parsing it, if any."""
+        robotParser = None
+        if parser == 'stream':
+            # "package://(.*)" occurences are replaced attribute by attribute while parsing
+            with stats.phase('xmlParsing'):
+                robotParser = urdf2webots.streamURDF.RobotParser(context,
+                                                                 io.StringIO(input) if isinstance(input, str) else input,
+                                                                 resolveUri)
+                robot = robotParser.getRobotElement()
         else:
-            sys.stderr.write('Can\'t determine package root path.\n')
-
-    # Convert the content into Webots robot
-    domFile = minidom.parseString(input)
-    for child in domFile.childNodes:
-        if child.localName == 'robot':
-            if isProto:
-                if output:
-                    if os.path.splitext(os.path.basename(output))[1] == '.proto':
-                        robotName = os.path.splitext(os.path.basename(output))[0]
-                        outputFile = output
-                    else:
-                        # treat output as directory and construct filename
-                        robotName = convertLUtoUN(urdf2webots.parserURDF.getRobotName(child))  # capitalize
-                        outputFile = os.path.join(output, robotName + '.proto')
-                else:
-                    robotName = convertLUtoUN(urdf2webots.parserURDF.getRobotName(child))  # capitalize
-                    outputFile = output if output else robotName + '.proto'
-
-                mkdirSafe(outputFile.replace('.proto', '') + '_textures')  # make a dir called 'x_textures'
-
-                protoFile = open(outputFile, 'w')
-                urdf2webots.writeRobot.header(protoFile, urdfPath, robotName)
-                outputDirectory = os.path.dirname(os.path.abspath(outputFile))
-            else:
-                tmp_robot_file = tempfile.NamedTemporaryFile(mode="w+", prefix='tempRobotURDFStringWebots')
-                outputDirectory = os.getcwd()
-
-            urdf2webots.writeRobot.robotName = robotName
-            urdf2webots.parserURDF.robotName = robotName  # pass robotName
-
-            robot = child
-            linkElementList = []
-            jointElementList = []
-            for child in robot.childNodes:
-                if child.localName == 'link':
-                    linkElementList.append(child)
-                elif child.localName == 'joint':
-                    jointElementList.append(child)
-                elif child.localName == 'material':
-                    if not child.hasAttribute('name') \
-                       or child.getAttribute('name') not in urdf2webots.parserURDF.Material.namedMaterial:
-                        material = urdf2webots.parserURDF.Material()
-                        material.parseFromMaterialNode(child)
+            # Replace "package://(.*)" occurences
+            with stats.phase('packageResolution'):
+                content = urdf2webots.packages.replacePackageUris(input, getConversionPackagePath)
+
+            with stats.phase('xmlParsing'):
+                domFile = minidom.parseString(content)
+            robot = None
+            for child in domFile.childNodes:
+                if child.localName == 'robot':
+                    robot = child
+                    break
+        if robot is None:
+            sys.exit('Could not parse the URDF file.\n')
+        return robot, robotParser
 
-            linkList = []
-            jointList = []
-            parentList = []
-            childList = []
-            rootLink = urdf2webots.parserURDF.Link()
+    if model is None:
+        robot, robotParser = getRobotElement()
 
-            for link in linkElementList:
-                linkList.append(urdf2webots.parserURDF.getLink(link, urdfDirectory, outputDirectory))
-            for joint in jointElementList:
-                jointList.append(urdf2webots.parserURDF.getJoint(joint))
-
-            for joint in jointList:
-                parentList.append(joint.parent)
-                childList.append(joint.child)
-            parentList.sort()
-            childList.sort()
-            for link in linkList:
-                if urdf2webots.parserURDF.isRootLink(link.name, childList):
-                    # We want to skip links between the robot and the static environment.
-                    rootLink = link
-                    previousRootLink = link
-                    while rootLink in ['base_link', 'base_footprint']:
-                        directJoints = []
-                        for joint in jointList:
-                            if joint.parent == rootLink.name:
-                                directJoints.append(joint)
-                        if len(directJoints) == 1:
-                            for childLink in linkList:
-                                if childLink.name == directJoints[0].child:
-                                    previousRootLink = rootLink
-                                    rootLink = childLink
-                        else:
-                            rootLink = previousRootLink
-                            break
-
-                    print('Root link: ' + rootLink.name)
-                    break
+    # Convert the content into Webots robot
+    if isProto:
+        if output and os.path.splitext(os.path.basename(output))[1] == '.proto':
+            robotName = os.path.splitext(os.path.basename(output))[0]
+            outputFile = output
+        else:
+            # capitalize the name of the robot
+            robotName = convertLUtoUN(urdf2webots.parserURDF.getRobotName(robot) if model is None else model.robotName)
+            # treat output as directory and construct filename
+            outputFile = os.path.join(output, robotName + '.proto') if output else robotName + '.proto'
+
+        mkdirSafe(outputFile.replace('.proto', '') + '_textures')  # make a dir called 'x_textures'
+        outputDirectory = os.path.dirname(os.path.abspath(outputFile))
+        stats.outputFile = outputFile
+        meshDirectory = os.path.abspath(os.path.splitext(outputFile)[0] + '_meshes')
+        textureDirectory = os.path.abspath(outputFile.replace('.proto', '') + '_textures')
+    else:
+        outputDirectory = os.getcwd()
+        meshDirectory = os.path.join(outputDirectory, robotName + '_meshes')
+        textureDirectory = os.path.join(outputDirectory, robotName + '_textures')
+
+    context.robotName = robotName
+    context.templateSlots = templateSlots
+    context.textures.setOutput(textureDirectory, outputDirectory)
+
+    if model is not None and not model.relocate(outputDirectory, meshDirectory, textureDirectory):
+        if isModel:
+            sys.exit('The reduced meshes and textures of the robot model cannot be found.')
+        model = None  # the generated files of the cached model were removed
+        robot, robotParser = getRobotElement()
+    elif model is not None and not isModel:
+        print('Robot model found in the cache.')
+        stats.count('modelCacheHits')
+    if model is None:
+        model = parseRobotModel(context, robot, robotParser, urdfPath, urdfDirectory, outputDirectory, meshDirectory,
+                                textureDirectory, collisionTolerance, linkCollisionTolerances, meshTriangleBudget,
+                                robotTriangleBudget, cacheDir)
+        if modelKey is not None:
+            with stats.phase('modelCacheStore'):
+                modelCache.store(modelKey, model.toBytes())
+        elif cacheDir:
+            # the model isn't cached, with TIFF textures for example, but its generated files may have been stored
+            urdf2webots.cache.ConversionCache(cacheDir, cacheMaxSize or urdf2webots.cache.DEFAULT_MAX_SIZE).evict()
+    else:
+        model.setContext(context)
+    if parseOnly:
+        return model
+    linkList = model.links
+    jointList = model.joints
+    rootLink = model.rootLink
+    generatedFiles = model.generatedFiles
+
+    sensorList = context.getSensorList()
+    print('There are %d links, %d joints and %d sensors' % (len(linkList), len(jointList), len(sensorList)))
+    stats.count('links', len(linkList))
+    stats.count('joints', len(jointList))
+    stats.count('sensors', len(sensorList))
+    stats.count('materials', len(context.namedMaterial))
+    stats.count('meshes', len(context.geometryReference))
+
+    with stats.phase('dummyLinkRemoval'):
+        context.staticBase = urdf2webots.parserURDF.removeDummyLinksAndStaticBaseFlag(linkList, jointList, sensorList,
+                                                                                      toolSlot)
+    stats.count('dummyLinks', stats.counts['links'] - len(linkList))
+    if mergeFixedLinks:
+        with stats.phase('linkMerging'):
+            mergedLinks = urdf2webots.parserURDF.mergeFixedLinks(linkList, jointList, sensorList, toolSlot)
+        print('%d links merged into their parent' % mergedLinks)
+        stats.count('mergedLinks', mergedLinks)
+    tree = urdf2webots.parserURDF.KinematicTree(linkList, jointList, sensorList)
+
+    if watcher is not None and isProto:
+        options = {'boxCollision': boxCollision, 'normal': normal, 'toolSlot': toolSlot, 'linkToDef': linkToDef,
+                   'jointToDef': jointToDef, 'targetVersion': targetVersion, 'initTranslation': initTranslation,
+                   'initRotation': initRotation, 'urdfPath': urdfPath}
+        with stats.phase('incrementalUpdate'):
+            updated = watcher.update(context, rootLink, tree, outputFile, options)
+        if updated:
+            return
+        context.spans = {}
+        context.definitions = {}
 
-            for child in robot.childNodes:
-                if child.localName == 'gazebo':
-                    urdf2webots.parserURDF.parseGazeboElement(child, rootLink.name, linkList)
-
-            sensorList = (urdf2webots.parserURDF.IMU.list +
-                          urdf2webots.parserURDF.P3D.list +
-                          urdf2webots.parserURDF.Camera.list +
-                          urdf2webots.parserURDF.RangeFinder.list +
-                          urdf2webots.parserURDF.Lidar.list)
-            print('There are %d links, %d joints and %d sensors' % (len(linkList), len(jointList), len(sensorList)))
-
-            urdf2webots.writeRobot.staticBase = urdf2webots.parserURDF.removeDummyLinksAndStaticBaseFlag(linkList, jointList,
-                                                                                                         sensorList, toolSlot)
-
-            if isProto:
-                urdf2webots.writeRobot.declaration(protoFile, robotName, initTranslation, initRotation)
-                urdf2webots.writeRobot.URDFLink(protoFile, rootLink, 1, parentList, childList, linkList, jointList,
-                                                sensorList, boxCollision=boxCollision, normal=normal, robot=True)
-                protoFile.write('}\n')
-                protoFile.close()
-                return
-            else:
-                urdf2webots.writeRobot.URDFLink(tmp_robot_file, rootLink, 0, parentList, childList, linkList, jointList,
-                                                sensorList, boxCollision=boxCollision, normal=normal, robot=True,
-                                                initTranslation=initTranslation, initRotation=initRotation)
-
-                tmp_robot_file.seek(0)
-                return (tmp_robot_file.read())
-    sys.exit('Could not parse the URDF file.\n')
+    if isProto:
+        # the PROTO file is kept in memory to be updated incrementally by the watcher
+        protoFile = urdf2webots.emitter.Emitter(open(outputFile, 'w') if watcher is None else None)
+        urdf2webots.writeRobot.header(context, protoFile, urdfPath, robotName)
+        with stats.phase('writing'):
+            urdf2webots.writeRobot.declaration(context, protoFile, robotName, initTranslation, initRotation)
+            urdf2webots.writeRobot.URDFLink(context, protoFile, rootLink, 1, tree, boxCollision=boxCollision, normal=normal,
+                                            robot=True)
+            protoFile.write('}\n')
+            if watcher is not None:
+                watcher.record(context, protoFile.getvalue(), outputFile)
+                with open(outputFile, 'w') as file:
+                    file.write(watcher.output)
+            protoFile.close()
+        if cacheKey is not None:
+            with stats.phase('cacheStore'):
+                with open(outputFile, 'r') as protoFile:
+                    cache.store(cacheKey, {'outputFile': outputFile, 'proto': protoFile.read(),
+                                           'generatedFiles': generatedFiles})
+        return
+    else:
+        robotFile = urdf2webots.emitter.Emitter()
+        with stats.phase('writing'):
+            urdf2webots.writeRobot.URDFLink(context, robotFile, rootLink, 0, tree, boxCollision=boxCollision,
+                                            normal=normal, robot=True, initTranslation=initTranslation,
+                                            initRotation=initRotation)
+            robotString = robotFile.getvalue()
+        if cacheKey is not None:
+            with stats.phase('cacheStore'):
+                cache.store(cacheKey, {'robotString': robotString, 'generatedFiles': generatedFiles})
+        return robotString
+
+
+def parseUrdfContent(input, **arguments):
+    """
+    Return the model.RobotModel of a URDF content, which can be serialized and given later as the input of
+    convertUrdfContent() with a target version in the same range, R2022b and later or before, and any writing option.
+    The other arguments are the ones of convertUrdfContent().
+    """
+    return convertUrdfContent(input, parseOnly=True, **arguments)
 
 
 if __name__ == '__main__':
@@ -329,8 +791,114 @@ if __name__ == '__main__':
     parser.add_argument('--target', dest='targetVersion', default='R2025a',
                         choices=['R2025a', 'R2023b', 'R2023a', 'R2022b', 'R2022a', 'R2021b', 'R2021a', 'R2020b', 'R2020a'],
                         help='Sets the Webots version the PROTO will target (will adapt which nodes will be used).')
+    parser.add_argument('--batch', dest='batch', default=None,
+                        help='Converts all the URDF files listed in a JSON manifest in parallel instead of a single one. '
+                        'The manifest contains a list of jobs, each one being a URDF path or an object with the Python '
+                        'arguments of the conversion, or an object with such a "jobs" list and "defaults" arguments.')
+    parser.add_argument('--workers', dest='workers', type=int, default=None,
+                        help='Sets the number of processes used by --batch and --serve (defaults to the number of CPUs).')
+    parser.add_argument('--batch-report', dest='batchReport', default=None,
+                        help='Writes the success, timing and errors of each --batch job in this JSON file.')
+    parser.add_argument('--parser', dest='parser', default='dom', choices=['dom', 'stream'],
+                        help='Selects how the URDF is parsed: "dom" loads the whole document in memory while "stream" '
+                        'parses it incrementally, which uses much less memory for very large URDF files.')
+    parser.add_argument('--cache-dir', dest='cacheDir', nargs='?', default=os.environ.get('URDF2WEBOTS_CACHE_DIR') or None,
+                        const=urdf2webots.cache.getDefaultCacheDirectory(), metavar='DIRECTORY',
+                        help='If set, caches the conversions in this directory (~/.cache/urdf2webots if no directory is '
+                        'given). The cache is disabled by default, unless the URDF2WEBOTS_CACHE_DIR environment variable '
+                        'sets its directory.')
+    parser.add_argument('--cache-size', dest='cacheSize', type=int, default=512,
+                        help='Sets the maximum size of the cache in MB, the least recently used conversions are removed '
+                        'beyond it.')
+    parser.add_argument('--no-cache', dest='noCache', action='store_true', default=False,
+                        help='If set, the conversion is neither read from nor stored in the cache, even if '
+                        'URDF2WEBOTS_CACHE_DIR is set.')
+    parser.add_argument('--watch', dest='watch', action='store_true', default=False,
+                        help='If set, keeps running and updates the PROTO file each time the URDF file is saved, only the '
+                        'subtrees of the links and joints that changed are written again.')
+    parser.add_argument('--serve', dest='serve', default=None, metavar='ADDRESS',
+                        help='Runs a conversion server instead of converting a file, listening on ADDRESS, either '
+                        '"host:port" or "unix:path" for a Unix domain socket. The URDF contents posted as JSON to /convert '
+                        'are converted into Robot node strings in a pool of --workers processes, their meshes and textures '
+                        'being written in the --output directory, /health and /stats report the state and throughput of '
+                        'the server.')
+    parser.add_argument('--pipe', dest='pipe', action='store_true', default=False,
+                        help='If set, keeps converting the URDF documents read from stdin as they arrive, each one ending '
+                        'with a "</robot>" line or preceded by a line giving its length in bytes. Each result is written '
+                        'in stdout after a "ok <length>" or "error <length>" line, the log being written in stderr.')
+    parser.add_argument('--profile', dest='profile', action='store_true', default=False,
+                        help='If set, measures the duration, calls and items of each phase of the conversion, runs it in '
+                        'cProfile and writes the results in a "_profile.json" file next to the PROTO file.')
+    parser.add_argument('--merge-fixed-links', dest='mergeFixedLinks', action='store_true', default=False,
+                        help='If set, merges the links attached by a fixed joint into their parent link, combining their '
+                        'masses and inertia, to reduce the number of Solid nodes.')
+    parser.add_argument('--fit-collision', dest='collisionTolerance', type=float, default=None,
+                        help='If set, replaces each collision mesh by the box, cylinder, sphere or capsule enclosing it '
+                        'with the smallest volume, as long as its volume exceeds the one of the mesh by at most this '
+                        'ratio (e.g. 0.2 for 20%%).')
+    parser.add_argument('--fit-collision-link', dest='linkCollisionTolerances', action='append', default=[],
+                        metavar='LINK:TOLERANCE', help='Sets the --fit-collision tolerance of the collisions of a link, '
+                        'can be repeated.')
+    parser.add_argument('--mesh-budget', dest='meshTriangleBudget', type=int, default=None, metavar='TRIANGLES',
+                        help='If set, reduces the visual STL and OBJ meshes having more triangles by quadric edge '
+                        'collapse, the reduced copies being written in the "<robot>_meshes" directory.')
+    parser.add_argument('--robot-mesh-budget', dest='robotTriangleBudget', type=int, default=None, metavar='TRIANGLES',
+                        help='If set, reduces the visual STL and OBJ meshes so that the whole robot renders at most this '
+                        'number of triangles, each mesh being reduced in proportion to its triangles.')
+    parser.add_argument('--texture-max-size', dest='textureMaxSize', type=int, default=None, metavar='PIXELS',
+                        help='If set, resizes the textures to powers of two of at most this number of pixels per side and '
+                        're-encodes them in the "<robot>_textures" directory, the identical images being written once.')
+    parser.add_argument('--texture-format', dest='textureFormat', default=None,
+                        choices=urdf2webots.textures.TEXTURE_FORMATS, help='If set, re-encodes the textures in this format, '
+                        '"auto" choosing JPEG unless the image has transparency.')
 
     args = parser.parse_args()
+    cacheDir = None if args.noCache else args.cacheDir
+    linkCollisionTolerances = {}
+    for linkTolerance in args.linkCollisionTolerances:
+        link, _, tolerance = linkTolerance.rpartition(':')
+        try:
+            linkCollisionTolerances[link] = float(tolerance)
+        except ValueError:
+            sys.exit('--fit-collision-link argument is not valid. It has to be of the form "link_name:tolerance".')
+    if cacheDir:
+        urdf2webots.packages.packageIndex.setFile(os.path.join(cacheDir, 'packages', 'index.json'))
+    if args.watch:
+        watchUrdfFile(args.input, output=args.output, robotName=args.robotName, normal=args.normal,
+                      boxCollision=args.boxCollision, toolSlot=args.toolSlot, initTranslation=args.initTranslation,
+                      initRotation=args.initRotation, initPos=args.initPos, linkToDef=args.linkToDef,
+                      jointToDef=args.jointToDef, targetVersion=args.targetVersion, parser=args.parser,
+                      collisionTolerance=args.collisionTolerance, linkCollisionTolerances=linkCollisionTolerances,
+                      mergeFixedLinks=args.mergeFixedLinks, meshTriangleBudget=args.meshTriangleBudget,
+                      robotTriangleBudget=args.robotTriangleBudget, textureMaxSize=args.textureMaxSize,
+                      textureFormat=args.textureFormat)
+        sys.exit(0)
+    if args.serve:
+        import urdf2webots.server  # the HTTP modules are only needed by the server
+        urdf2webots.server.serve(args.serve, args.workers, cacheDir, args.cacheSize * 1024 * 1024, args.output or None)
+        sys.exit(0)
+    if args.pipe:
+        sys.exit(0 if convertUrdfPipe(
+            output=args.output, robotName=args.robotName, normal=args.normal, boxCollision=args.boxCollision,
+            toolSlot=args.toolSlot, initTranslation=args.initTranslation, initRotation=args.initRotation,
+            initPos=args.initPos, linkToDef=args.linkToDef, jointToDef=args.jointToDef,
+            relativePathPrefix=args.relativePathPrefix, targetVersion=args.targetVersion, parser=args.parser,
+            cacheDir=cacheDir, cacheMaxSize=args.cacheSize * 1024 * 1024, collisionTolerance=args.collisionTolerance,
+            linkCollisionTolerances=linkCollisionTolerances, mergeFixedLinks=args.mergeFixedLinks,
+            meshTriangleBudget=args.meshTriangleBudget, robotTriangleBudget=args.robotTriangleBudget,
+            textureMaxSize=args.textureMaxSize, textureFormat=args.textureFormat) == 0 else 1)
+    if args.batch:
+        sys.exit(0 if convertUrdfBatch(args.batch, args.workers, args.batchReport, cacheDir, args.cacheSize * 1024 * 1024)
+                 else 1)
+    stats = urdf2webots.stats.ConversionStats(profile=True) if args.profile else None
     convertUrdfFile(args.input, args.output, args.robotName, args.normal, args.boxCollision, args.toolSlot,
                     args.initTranslation, args.initRotation, args.initPos, args.linkToDef, args.jointToDef,
-                    args.relativePathPrefix, args.targetVersion)
+                    args.relativePathPrefix, args.targetVersion, args.parser,
+                    cacheDir=cacheDir, cacheMaxSize=args.cacheSize * 1024 * 1024, collisionTolerance=args.collisionTolerance,
+                    linkCollisionTolerances=linkCollisionTolerances, mergeFixedLinks=args.mergeFixedLinks,
+                    meshTriangleBudget=args.meshTriangleBudget, robotTriangleBudget=args.robotTriangleBudget,
+                    textureMaxSize=args.textureMaxSize, textureFormat=args.textureFormat, stats=stats)
+    if stats is not None:
+        profileFile = (os.path.splitext(stats.outputFile)[0] if stats.outputFile else args.robotName) + '_profile.json'
+        stats.write(profileFile)
+        print('Profile written in "%s".' % profileFile)
@@ -1,10 +1,10 @@
 """Import modules."""
 import math
-import numpy
 
 
 def vectorNorm(data, axis=None, out=None):
     """Calculate norm of a vector."""
+    import numpy
     data = numpy.array(data, dtype=numpy.float64, copy=True)
     if out is None:
         if data.ndim == 1:
@@ -59,6 +59,42 @@ def convertRPYtoEulerAxis(rpy):
     return rotationFromQuaternion(convertRPYtoQuaternions(rpy))
 
 
+def convertRPYtoQuaternionsBatch(rpy):
+    """Convert an Nx3 array of RPY angles to an Nx4 array of quaternions."""
+    import numpy
+    rpy = numpy.asarray(rpy, dtype=numpy.float64).reshape(-1, 3)
+    c = numpy.cos(rpy * 0.5)
+    s = numpy.sin(rpy * 0.5)
+    cr, cp, cy = c[:, 0], c[:, 1], c[:, 2]
+    sr, sp, sy = s[:, 0], s[:, 1], s[:, 2]
+    q = numpy.empty((len(rpy), 4))
+    q[:, 0] = cy * cp * cr + sy * sp * sr
+    q[:, 1] = cy * cp * sr - sy * sp * cr
+    q[:, 2] = sy * cp * sr + cy * sp * cr
+    q[:, 3] = sy * cp * cr - cy * sp * sr
+    return q
+
+
+def rotationsFromQuaternions(q):
+    """Convert an Nx4 array of quaternions to an Nx4 array of euler-axes-angles (vrml)."""
+    import numpy
+    q = numpy.asarray(q, dtype=numpy.float64).reshape(-1, 4)
+    v = numpy.empty((len(q), 4))
+    v[:, 3] = 2.0 * numpy.arccos(numpy.clip(q[:, 0], -1.0, 1.0))
+    n = numpy.sqrt(q[:, 1] * q[:, 1] + q[:, 2] * q[:, 2] + q[:, 3] * q[:, 3])
+    # if the angle is close to zero then the direction of the axis is not important
+    small = v[:, 3] < 0.0001
+    n[small] = 1.0
+    v[:, :3] = q[:, 1:] / n[:, numpy.newaxis]
+    v[small, :3] = [0.0, 0.0, 1.0]
+    return v
+
+
+def convertRPYtoEulerAxisBatch(rpy):
+    """Convert an Nx3 array of RPY angles to an Nx4 array of Euler angles."""
+    return rotationsFromQuaternions(convertRPYtoQuaternionsBatch(rpy))
+
+
 def multiplyMatrix(mat1, mat2):
     """Multiply two matrices."""
     matrix = []
@@ -95,24 +131,75 @@ def matrixFromRotation(rotation):
     return matrix
 
 
+def matricesFromRotations(rotations):
+    """Get the Nx3x3 matrices associated to an Nx4 array of VRML rotations."""
+    import numpy
+    rotations = numpy.asarray(rotations, dtype=numpy.float64).reshape(-1, 4)
+    x, y, z, angle = rotations.T
+    c = numpy.cos(angle)
+    s = numpy.sin(angle)
+    t1 = 1.0 - c
+    t2 = x * z * t1
+    t3 = x * y * t1
+    t4 = y * z * t1
+    matrices = numpy.empty((len(rotations), 3, 3))
+    matrices[:, 0, 0] = x * x * t1 + c
+    matrices[:, 0, 1] = t3 - z * s
+    matrices[:, 0, 2] = t2 + y * s
+    matrices[:, 1, 0] = t3 + z * s
+    matrices[:, 1, 1] = y * y * t1 + c
+    matrices[:, 1, 2] = t4 - x * s
+    matrices[:, 2, 0] = t2 - y * s
+    matrices[:, 2, 1] = t4 + x * s
+    matrices[:, 2, 2] = z * z * t1 + c
+    return matrices
+
+
+def rotationsFromMatrices(matrices):
+    """Get the Nx4 array of VRML rotations of an Nx3x3 array of rotation matrices, see rotationFromMatrix()."""
+    import numpy
+    R = numpy.asarray(matrices, dtype=numpy.float64).reshape(-1, 3, 3)
+    epsilon = 1e-4
+    rotations = numpy.zeros((len(R), 4))
+    rotations[:, 0] = 1.0
+    angles = numpy.arccos(numpy.clip((numpy.trace(R, axis1=1, axis2=2) - 1.0) / 2.0, -1.0, 1.0))
+    axes = numpy.stack([R[:, 2, 1] - R[:, 1, 2], R[:, 0, 2] - R[:, 2, 0], R[:, 1, 0] - R[:, 0, 1]], axis=1)
+    # close to pi, the axis is found on the diagonal of 0.5 * (R + I) and its signs from the off-diagonal elements
+    nearPi = numpy.pi - angles < epsilon
+    sign = numpy.sign(axes[nearPi])
+    diagonal = numpy.diagonal(R[nearPi], axis1=1, axis2=2)
+    axes[nearPi] = numpy.sqrt(numpy.maximum(0.5 * (diagonal + 1.0), 0.0)) * numpy.where(sign == 0, 1, sign)
+    valid = angles >= epsilon
+    rotations[valid, :3] = axes[valid] / numpy.linalg.norm(axes[valid], axis=1)[:, numpy.newaxis]
+    rotations[valid, 3] = angles[valid]
+    return rotations
+
+
+def rotateVectors(vectors, rotations):
+    """Rotate an Nx3 array of vectors by an Nx4 array of VRML rotations."""
+    import numpy
+    vectors = numpy.asarray(vectors, dtype=numpy.float64).reshape(-1, 3)
+    return numpy.einsum('nij,nj->ni', matricesFromRotations(rotations), vectors)
+
+
 def rotationFromMatrix(R):
-    R = numpy.array(R).reshape(3, 3)
+    """Get the VRML rotation of a 3x3 matrix, given as a list of 9 values or as 3 rows."""
+    if len(R) == 3:
+        R = [value for row in R for value in row]
     # code from here (slightly modified):
     # https://rock-learning.github.io/pytransform3d/_modules/pytransform3d/rotations.html#axis_angle_from_matrix
-    angle = numpy.arccos((numpy.trace(R) - 1.0) / 2.0)
+    angle = math.acos(min(max((R[0] + R[4] + R[8] - 1.0) / 2.0, -1.0), 1.0))
     epsilon = 1e-4
     if angle < epsilon:
-        return numpy.array([1.0, 0.0, 0.0, 0.0])
-    a = numpy.empty(4)
+        return [1.0, 0.0, 0.0, 0.0]
 
     # We can usually determine the rotation axis by inverting Rodrigues'
     # formula. Subtracting opposing off-diagonal elements gives us
     # 2 * sin(angle) * e,
     # where e is the normalized rotation axis.
-    axis_unnormalized = numpy.array(
-        [R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]])
+    axis = [R[7] - R[5], R[2] - R[6], R[3] - R[1]]
 
-    if numpy.pi - angle < epsilon:
+    if math.pi - angle < epsilon:
         # The threshold is a result from this discussion:
         # https://github.com/rock-learning/pytransform3d/issues/43
         # The standard formula becomes numerically unstable, however,
@@ -121,18 +208,13 @@ def rotationFromMatrix(R):
         # squared values of the rotation axis on the diagonal of this matrix.
         # We can still use the original formula to reconstruct the signs of
         # the rotation axis correctly.
-        sign = numpy.sign(axis_unnormalized)
-        a[:3] = numpy.sqrt(0.5 * (numpy.diag(R) + 1.0)) * numpy.where(sign == 0, 1, sign)
-        # print('test', abs(angle - numpy.pi), numpy.diag(R), numpy.sqrt(0.5 * (numpy.diag(R) + 1.0)), axis_unnormalized)
-    else:
-        a[:3] = axis_unnormalized
-        # The norm of axis_unnormalized is 2.0 * numpy.sin(angle), that is, we
-        # could normalize with a[:3] = a[:3] / (2.0 * numpy.sin(angle)),
-        # but the following is much more precise for angles close to 0 or pi:
-    a[:3] /= numpy.linalg.norm(a[:3])
-
-    a[3] = angle
-    return a
+        axis = [math.copysign(math.sqrt(max(0.5 * (R[4 * i] + 1.0), 0.0)), axis[i]) if axis[i] != 0.0 else
+                math.sqrt(max(0.5 * (R[4 * i] + 1.0), 0.0)) for i in range(3)]
+    # The norm of the unnormalized axis is 2.0 * sin(angle), that is, we
+    # could normalize with axis / (2.0 * sin(angle)),
+    # but the following is much more precise for angles close to 0 or pi:
+    norm = math.sqrt(axis[0] * axis[0] + axis[1] * axis[1] + axis[2] * axis[2])
+    return [axis[0] / norm, axis[1] / norm, axis[2] / norm, angle]
 
 
 def rotateVector(vector, rotation):
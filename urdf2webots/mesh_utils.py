@@ -0,0 +1,418 @@
+"""Read the triangles of mesh files, approximate them by primitive shapes and reduce their number of triangles."""
+import math
+import os
+import re
+import shutil
+import struct
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy
+
+import urdf2webots.cache
+
+asciiStlVertexPattern = re.compile(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)')
+
+BOUNDARY_WEIGHT = 1000.0  # weight of the quadrics keeping the boundary edges of the meshes in place
+
+
+def readStl(path):
+    """Return the vertices and triangles of a binary or ASCII STL file."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) >= 84:
+        count = struct.unpack('<I', data[80:84])[0]
+        if len(data) == 84 + 50 * count:
+            dtype = numpy.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+            vertices = numpy.frombuffer(data, dtype=dtype, count=count, offset=84)['vertices'].reshape(-1, 3)
+            return vertices.astype(numpy.float64), numpy.arange(3 * count).reshape(-1, 3)
+    vertices = numpy.array(asciiStlVertexPattern.findall(data), dtype=numpy.float64).reshape(-1, 3)
+    vertices = vertices[:len(vertices) - len(vertices) % 3]
+    return vertices, numpy.arange(len(vertices)).reshape(-1, 3)
+
+
+def readObj(path):
+    """Return the vertices and triangles of an OBJ file, the polygons being triangulated as fans."""
+    vertices = []
+    triangles = []
+    with open(path, 'r', errors='replace') as file:
+        for line in file:
+            values = line.split()
+            if not values:
+                continue
+            if values[0] == 'v':
+                vertices.append([float(value) for value in values[1:4]])
+            elif values[0] == 'f':
+                indices = []
+                for value in values[1:]:
+                    index = int(value.split('/')[0])
+                    indices.append(index - 1 if index > 0 else len(vertices) + index)
+                for i in range(1, len(indices) - 1):
+                    triangles.append([indices[0], indices[i], indices[i + 1]])
+    return numpy.array(vertices, dtype=numpy.float64).reshape(-1, 3), numpy.array(triangles, dtype=numpy.int64).reshape(-1, 3)
+
+
+def getLocalName(element):
+    """Return the tag of an XML element without its namespace."""
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def getChildren(element, name):
+    """Return the children of an XML element having a tag, whatever its namespace."""
+    return [child for child in element if getLocalName(child) == name]
+
+
+def getColladaTransform(node):
+    """Return the 4x4 matrix of the transformations of a COLLADA node."""
+    transform = numpy.identity(4)
+    for child in node:
+        name = getLocalName(child)
+        values = [float(value) for value in child.text.split()] if child.text else []
+        matrix = numpy.identity(4)
+        if name == 'matrix' and len(values) == 16:
+            matrix = numpy.array(values).reshape(4, 4)
+        elif name == 'translate' and len(values) == 3:
+            matrix[:3, 3] = values
+        elif name == 'scale' and len(values) == 3:
+            matrix[:3, :3] = numpy.diag(values)
+        elif name == 'rotate' and len(values) == 4:
+            axis = numpy.array(values[:3])
+            norm = numpy.linalg.norm(axis)
+            if norm > 0:
+                x, y, z = axis / norm
+                angle = math.radians(values[3])
+                c = math.cos(angle)
+                s = math.sin(angle)
+                t = 1.0 - c
+                matrix[:3, :3] = [[t * x * x + c, t * x * y - s * z, t * x * z + s * y],
+                                  [t * x * y + s * z, t * y * y + c, t * y * z - s * x],
+                                  [t * x * z - s * y, t * y * z + s * x, t * z * z + c]]
+        else:
+            continue
+        transform = transform @ matrix
+    return transform
+
+
+def readColladaGeometry(geometry):
+    """Return the vertices and triangles of a COLLADA geometry element."""
+    vertices = numpy.zeros((0, 3))
+    triangles = []
+    for mesh in getChildren(geometry, 'mesh'):
+        sources = {}
+        for source in getChildren(mesh, 'source'):
+            floatArrays = getChildren(source, 'float_array')
+            if floatArrays and floatArrays[0].text:
+                sources[source.get('id')] = numpy.array(floatArrays[0].text.split(), dtype=numpy.float64)
+        positions = {}
+        for vertexElement in getChildren(mesh, 'vertices'):
+            for input in getChildren(vertexElement, 'input'):
+                if input.get('semantic') == 'POSITION' and input.get('source', '').lstrip('#') in sources:
+                    positions[vertexElement.get('id')] = sources[input.get('source').lstrip('#')].reshape(-1, 3)
+        for primitive in mesh:
+            name = getLocalName(primitive)
+            if name not in ['triangles', 'polylist', 'polygons']:
+                continue
+            inputs = getChildren(primitive, 'input')
+            stride = max([int(input.get('offset', 0)) for input in inputs] + [0]) + 1
+            vertexInputs = [input for input in inputs if input.get('semantic') == 'VERTEX']
+            if not vertexInputs or vertexInputs[0].get('source', '').lstrip('#') not in positions:
+                continue
+            offset = int(vertexInputs[0].get('offset', 0))
+            firstIndex = len(vertices)
+            vertices = numpy.concatenate([vertices, positions[vertexInputs[0].get('source').lstrip('#')]])
+            polygons = []
+            for p in getChildren(primitive, 'p'):
+                indices = [int(value) for value in (p.text or '').split()][offset::stride]
+                if name == 'triangles':
+                    polygons.extend(indices[i:i + 3] for i in range(0, len(indices) - 2, 3))
+                elif name == 'polygons':
+                    polygons.append(indices)
+                else:
+                    vcount = getChildren(primitive, 'vcount')
+                    counts = [int(value) for value in vcount[0].text.split()] if vcount and vcount[0].text else []
+                    start = 0
+                    for count in counts:
+                        polygons.append(indices[start:start + count])
+                        start += count
+            for polygon in polygons:
+                for i in range(1, len(polygon) - 1):
+                    triangles.append([firstIndex + polygon[0], firstIndex + polygon[i], firstIndex + polygon[i + 1]])
+    return vertices, numpy.array(triangles, dtype=numpy.int64).reshape(-1, 3)
+
+
+def readCollada(path):
+    """Return the vertices and triangles of a COLLADA file, transformed by its scene nodes and unit."""
+    root = ET.parse(path).getroot()
+    geometries = {}
+    for library in getChildren(root, 'library_geometries'):
+        for geometry in getChildren(library, 'geometry'):
+            geometries[geometry.get('id')] = readColladaGeometry(geometry)
+    instances = []
+
+    def addInstances(node, transform):
+        transform = transform @ getColladaTransform(node)
+        for child in node:
+            if getLocalName(child) == 'instance_geometry' and child.get('url', '').lstrip('#') in geometries:
+                instances.append((geometries[child.get('url').lstrip('#')], transform))
+            elif getLocalName(child) == 'node':
+                addInstances(child, transform)
+
+    for library in getChildren(root, 'library_visual_scenes'):
+        for scene in getChildren(library, 'visual_scene'):
+            for node in getChildren(scene, 'node'):
+                addInstances(node, numpy.identity(4))
+    if not instances:
+        instances = [(geometry, numpy.identity(4)) for geometry in geometries.values()]
+
+    scale = 1.0
+    for asset in getChildren(root, 'asset'):
+        for unit in getChildren(asset, 'unit'):
+            scale = float(unit.get('meter', 1.0))
+    allVertices = []
+    allTriangles = []
+    count = 0
+    for (vertices, triangles), transform in instances:
+        allVertices.append((vertices @ transform[:3, :3].T + transform[:3, 3]) * scale)
+        allTriangles.append(triangles + count)
+        count += len(vertices)
+    if not allVertices:
+        return numpy.zeros((0, 3)), numpy.zeros((0, 3), dtype=numpy.int64)
+    return numpy.concatenate(allVertices), numpy.concatenate(allTriangles)
+
+
+def readMesh(path):
+    """Return the vertices and triangles of an STL, OBJ or COLLADA file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.stl':
+        return readStl(path)
+    if extension == '.obj':
+        return readObj(path)
+    if extension == '.dae':
+        return readCollada(path)
+    raise ValueError('unsupported mesh format "%s"' % extension)
+
+
+def computeVolume(vertices, triangles):
+    """Return the volume enclosed by a closed triangle mesh."""
+    a = vertices[triangles[:, 0]]
+    b = vertices[triangles[:, 1]]
+    c = vertices[triangles[:, 2]]
+    return abs(numpy.einsum('ij,ij->', a, numpy.cross(b, c))) / 6.0
+
+
+def fitPrimitive(vertices, triangles):
+    """
+    Return the box, cylinder, sphere or capsule enclosing a mesh with the smallest volume.
+
+    The primitives are fitted in the frame of the mesh and in the frame of the principal axes of its vertices. The result
+    is a dictionary with the 'type' and dimensions of the primitive, its 'center' and 'rotation' matrix in the frame of the
+    mesh, the Z axis of the cylinders and capsules being their axis, and its relative volume 'error' with respect to the
+    mesh. None is returned if the mesh doesn't enclose a volume.
+    """
+    if len(triangles) == 0:
+        return None
+    points = numpy.unique(vertices[numpy.unique(triangles)], axis=0)
+    volume = computeVolume(vertices, triangles)
+    if volume <= 0.0:
+        return None
+    mean = points.mean(axis=0)
+    frames = [numpy.identity(3)]
+    if len(points) > 3:
+        principalAxes = numpy.linalg.eigh(numpy.cov((points - mean).T))[1]
+        if numpy.linalg.det(principalAxes) < 0:
+            principalAxes[:, 2] = -principalAxes[:, 2]
+        frames.append(principalAxes)
+
+    candidates = []
+    for rotation in frames:
+        local = (points - mean) @ rotation
+        minimum = local.min(axis=0)
+        maximum = local.max(axis=0)
+        middle = (minimum + maximum) / 2.0
+        center = mean + rotation @ middle
+        size = maximum - minimum
+        candidates.append({'type': 'box', 'size': size.tolist(), 'center': center, 'rotation': rotation,
+                           'volume': float(numpy.prod(size))})
+        radius = float(numpy.linalg.norm(local - middle, axis=1).max())
+        candidates.append({'type': 'sphere', 'radius': radius, 'center': center, 'rotation': rotation,
+                           'volume': 4.0 / 3.0 * math.pi * radius ** 3})
+        # the axis of the cylinders and capsules is moved to Z by a cyclic permutation, keeping the rotation proper
+        for axis, (a, b) in enumerate([(1, 2), (2, 0), (0, 1)]):
+            axisRotation = rotation[:, [a, b, axis]]
+            distances = numpy.hypot(local[:, a] - middle[a], local[:, b] - middle[b])
+            radius = float(distances.max())
+            height = float(size[axis])
+            candidates.append({'type': 'cylinder', 'radius': radius, 'height': height, 'center': center,
+                               'rotation': axisRotation, 'volume': math.pi * radius ** 2 * height})
+            capHeights = numpy.sqrt(numpy.maximum(radius ** 2 - distances ** 2, 0.0))
+            height = 2.0 * max(float((numpy.abs(local[:, axis] - middle[axis]) - capHeights).max()), 0.0)
+            candidates.append({'type': 'capsule', 'radius': radius, 'height': height, 'center': center,
+                               'rotation': axisRotation, 'volume': math.pi * radius ** 2 * (height + 4.0 / 3.0 * radius)})
+
+    best = min(candidates, key=lambda candidate: candidate['volume'])
+    if best['volume'] < volume * (1.0 - 1e-6):
+        return None  # the mesh is not closed, its volume is meaningless
+    best['error'] = best['volume'] / volume - 1.0
+    return best
+
+
+def writeStl(path, vertices, triangles):
+    """Write the triangles of a mesh in a binary STL file."""
+    corners = vertices[triangles]
+    normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = numpy.linalg.norm(normals, axis=1)
+    normals[lengths > 0] /= lengths[lengths > 0, numpy.newaxis]
+    dtype = numpy.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+    data = numpy.zeros(len(triangles), dtype=dtype)
+    data['normal'] = normals
+    data['vertices'] = corners
+    with open(path, 'wb') as file:
+        file.write(b'urdf2webots reduced mesh'.ljust(80, b' '))
+        file.write(struct.pack('<I', len(triangles)))
+        file.write(data.tobytes())
+
+
+def weldVertices(vertices, triangles):
+    """Merge the identical vertices of a mesh, such as the corners of the STL triangles, and remove the flat triangles."""
+    vertices, inverse = numpy.unique(vertices, axis=0, return_inverse=True)
+    triangles = inverse.reshape(-1)[triangles]
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 2] != triangles[:, 0])
+    return vertices, triangles[keep]
+
+
+def getEdges(triangles):
+    """Return the edges of the triangles, three per triangle in the order of their corners."""
+    return numpy.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+
+
+def getEdgeKeys(edges, vertexCount):
+    """Return an integer identifying each edge whatever the order of its vertices."""
+    return numpy.minimum(edges[:, 0], edges[:, 1]) * vertexCount + numpy.maximum(edges[:, 0], edges[:, 1])
+
+
+def computeQuadrics(vertices, triangles):
+    """
+    Return the error quadric of each vertex, a flattened 4x4 matrix summing the squared distances to the planes of its
+    triangles weighted by their area, and to the planes orthogonal to its boundary edges so that the borders are kept.
+    """
+    corners = vertices[triangles]
+    normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    doubleAreas = numpy.linalg.norm(normals, axis=1)
+    valid = doubleAreas > 0
+    normals[valid] /= doubleAreas[valid, numpy.newaxis]
+    planes = numpy.concatenate([normals, -numpy.einsum('ij,ij->i', normals, corners[:, 0])[:, numpy.newaxis]], axis=1)
+    faceQuadrics = (planes[:, :, numpy.newaxis] * planes[:, numpy.newaxis, :]).reshape(-1, 16) * doubleAreas[:, numpy.newaxis]
+    quadrics = numpy.zeros((len(vertices), 16))
+    for corner in range(3):
+        numpy.add.at(quadrics, triangles[:, corner], faceQuadrics)
+
+    # the edges used by a single triangle are on the boundary
+    edges = getEdges(triangles)
+    faces = numpy.tile(numpy.arange(len(triangles)), 3)
+    _, inverse, counts = numpy.unique(getEdgeKeys(edges, len(vertices)), return_inverse=True, return_counts=True)
+    boundary = counts[inverse] == 1
+    if numpy.any(boundary):
+        edges = edges[boundary]
+        directions = vertices[edges[:, 1]] - vertices[edges[:, 0]]
+        lengths = numpy.linalg.norm(directions, axis=1)
+        borderNormals = numpy.cross(directions, normals[faces[boundary]])
+        borderLengths = numpy.linalg.norm(borderNormals, axis=1)
+        valid = borderLengths > 0
+        borderNormals[valid] /= borderLengths[valid, numpy.newaxis]
+        planes = numpy.concatenate([borderNormals, -numpy.einsum('ij,ij->i', borderNormals, vertices[edges[:, 0]])
+                                    [:, numpy.newaxis]], axis=1)
+        borderQuadrics = ((planes[:, :, numpy.newaxis] * planes[:, numpy.newaxis, :]).reshape(-1, 16) *
+                          (BOUNDARY_WEIGHT * lengths ** 2)[:, numpy.newaxis])
+        for end in range(2):
+            numpy.add.at(quadrics, edges[:, end], borderQuadrics)
+    return quadrics
+
+
+def decimateMesh(vertices, triangles, targetCount):
+    """
+    Reduce a mesh to about 'targetCount' triangles by quadric edge collapse and return its vertices and triangles.
+
+    The edges are collapsed in batches: each pass computes the quadric error of collapsing every edge to one of its ends or
+    to its middle, then collapses the cheapest edges which are the cheapest edge of both their vertices, so that the
+    collapses of a batch are independent. The collapses turning a triangle over are postponed to the next pass.
+    """
+    vertices, triangles = weldVertices(vertices, triangles)
+    while len(triangles) > targetCount:
+        quadrics = computeQuadrics(vertices, triangles)
+        keys = numpy.unique(getEdgeKeys(getEdges(triangles), len(vertices)))
+        edges = numpy.stack([keys // len(vertices), keys % len(vertices)], axis=1)
+        edgeQuadrics = (quadrics[edges[:, 0]] + quadrics[edges[:, 1]]).reshape(-1, 4, 4)
+        candidates = numpy.stack([vertices[edges[:, 0]], vertices[edges[:, 1]],
+                                  (vertices[edges[:, 0]] + vertices[edges[:, 1]]) / 2.0], axis=1)
+        homogeneous = numpy.concatenate([candidates, numpy.ones(candidates.shape[:2] + (1,))], axis=2)
+        costs = numpy.einsum('eci,eij,ecj->ec', homogeneous, edgeQuadrics, homogeneous)
+        best = numpy.argmin(costs, axis=1)
+        cost = costs[numpy.arange(len(edges)), best]
+        positions = candidates[numpy.arange(len(edges)), best]
+
+        # each vertex takes part in its cheapest collapse only, ties being broken by the edge order
+        ranks = numpy.empty(len(edges), dtype=numpy.int64)
+        ranks[numpy.argsort(cost, kind='stable')] = numpy.arange(len(edges))
+        vertexRanks = numpy.full(len(vertices), len(edges), dtype=numpy.int64)
+        numpy.minimum.at(vertexRanks, edges[:, 0], ranks)
+        numpy.minimum.at(vertexRanks, edges[:, 1], ranks)
+        selected = numpy.nonzero((vertexRanks[edges[:, 0]] == ranks) & (vertexRanks[edges[:, 1]] == ranks))[0]
+        # a collapse removes two triangles inside the mesh
+        needed = max(1, (len(triangles) - targetCount + 1) // 2)
+        selected = selected[numpy.argsort(cost[selected], kind='stable')[:needed]]
+
+        for attempt in range(2):
+            remap = numpy.arange(len(vertices))
+            remap[edges[selected, 1]] = edges[selected, 0]
+            moved = vertices.copy()
+            moved[edges[selected, 0]] = positions[selected]
+            newTriangles = remap[triangles]
+            kept = ((newTriangles[:, 0] != newTriangles[:, 1]) & (newTriangles[:, 1] != newTriangles[:, 2]) &
+                    (newTriangles[:, 2] != newTriangles[:, 0]))
+            before = vertices[triangles]
+            after = moved[newTriangles]
+            oldNormals = numpy.cross(before[:, 1] - before[:, 0], before[:, 2] - before[:, 0])
+            newNormals = numpy.cross(after[:, 1] - after[:, 0], after[:, 2] - after[:, 0])
+            flipped = kept & (numpy.einsum('ij,ij->i', oldNormals, newNormals) < 0)
+            if attempt == 1 or not numpy.any(flipped):
+                break
+            touched = numpy.zeros(len(vertices), dtype=bool)
+            touched[newTriangles[flipped].reshape(-1)] = True
+            selected = selected[~touched[edges[selected, 0]]]
+        if len(selected) == 0 or numpy.any(flipped):
+            break
+        vertices = moved
+        triangles = newTriangles[kept]
+
+    used, inverse = numpy.unique(triangles, return_inverse=True)
+    return vertices[used], inverse.reshape(-1, 3)
+
+
+def getStlTriangleCount(path):
+    """Return the number of triangles of a binary STL file."""
+    with open(path, 'rb') as file:
+        file.seek(80)
+        return struct.unpack('<I', file.read(4))[0]
+
+
+def writeReducedMesh(vertices, triangles, targetCount, destination, cachedFile=None):
+    """
+    Write a mesh reduced to about 'targetCount' triangles in a binary STL file and return its number of triangles.
+    If cachedFile is set, it is copied instead if it exists, and marked as recently used, otherwise the reduced mesh is
+    stored there too.
+    """
+    if cachedFile is not None and os.path.isfile(cachedFile):
+        urdf2webots.cache.copyCachedFile(cachedFile, destination)
+        return getStlTriangleCount(destination)
+    vertices, triangles = decimateMesh(vertices, triangles, targetCount)
+    writeStl(destination, vertices, triangles)
+    if cachedFile is not None:
+        try:
+            os.makedirs(os.path.dirname(cachedFile), exist_ok=True)
+            descriptor, temporaryPath = tempfile.mkstemp(dir=os.path.dirname(cachedFile), suffix='.tmp')
+            os.close(descriptor)
+            shutil.copyfile(destination, temporaryPath)
+            os.replace(temporaryPath, cachedFile)
+        except OSError:
+            pass
+    return len(triangles)
@@ -0,0 +1,156 @@
+"""Serializable intermediate representation of a parsed robot, written again without parsing its URDF content."""
+import hashlib
+import os
+import pickle
+import shutil
+import zlib
+
+import urdf2webots.cache
+from urdf2webots.parserURDF import Inertia, Box, Cylinder, Sphere, Capsule, Mesh, CadShape, Geometry, Color, Material, \
+    Visual, Collision, Calibration, Dynamics, Limit, Safety, Link, Joint, IMU, P3D, Camera, RangeFinder, Lidar
+
+# bump when the meaning of the model changes without changing the attributes of its classes
+MODEL_FORMAT = 1
+
+# classes whose instances a model contains, their attributes defining its schema
+MODEL_CLASSES = [Inertia, Box, Cylinder, Sphere, Capsule, Mesh, CadShape, Geometry, Color, Material, Visual, Collision,
+                 Calibration, Dynamics, Limit, Safety, Link, Joint, IMU, P3D, Camera, RangeFinder, Lidar]
+
+schema = None
+
+
+def getSchema():
+    """Return a fingerprint of the names and attributes of the model classes, so that a model of other classes is rejected."""
+    global schema
+    if schema is None:
+        classes = []
+        for modelClass in MODEL_CLASSES:
+            attributes = modelClass.__slots__ if hasattr(modelClass, '__slots__') else sorted(vars(modelClass()))
+            classes.append('%s(%s)' % (modelClass.__name__, ','.join(attributes)))
+        schema = hashlib.sha256(';'.join(classes).encode()).hexdigest()
+    return schema
+
+
+class RobotModel():
+    """
+    Links, joints, sensors and materials of a robot parsed from a URDF content, before the removal of its dummy links.
+
+    The mesh URLs are relative to 'outputDirectory', the directory of the PROTO file or the working directory for Robot
+    node strings, and the meshes and textures reduced while parsing are listed in 'generatedFiles' with their copy in the
+    cache, relocate() moving them to another output. A model is serialized by toBytes() as a compressed pickle tagged with
+    MODEL_FORMAT and the schema of its classes; only the models of trusted sources, like the cache directory, should be
+    loaded as pickles can run code.
+    """
+
+    __slots__ = ('robotName', 'urdfPath', 'outputDirectory', 'meshDirectory', 'textureDirectory', 'cadShapes', 'rootLink',
+                 'links', 'joints', 'imus', 'p3ds', 'cameras', 'rangeFinders', 'lidars', 'namedMaterial', 'geometryReference',
+                 'generatedFiles')
+
+    def __init__(self, robotName, urdfPath, outputDirectory, meshDirectory, textureDirectory, cadShapes, rootLink, links,
+                 joints, context, generatedFiles):
+        """Initialization, the sensors and materials being the ones of the conversion context."""
+        self.robotName = robotName  # name attribute of the <robot> element
+        self.urdfPath = urdfPath
+        self.outputDirectory = outputDirectory
+        self.meshDirectory = meshDirectory  # where the reduced meshes are written
+        self.textureDirectory = textureDirectory  # where the reduced textures are written
+        self.cadShapes = cadShapes  # True if the COLLADA and OBJ meshes are CadShape nodes (since R2022b)
+        self.rootLink = rootLink
+        self.links = links
+        self.joints = joints
+        self.imus = context.imus
+        self.p3ds = context.p3ds
+        self.cameras = context.cameras
+        self.rangeFinders = context.rangeFinders
+        self.lidars = context.lidars
+        self.namedMaterial = context.namedMaterial
+        self.geometryReference = context.geometryReference
+        self.generatedFiles = generatedFiles  # [file, cached file] pairs
+
+    def setContext(self, context):
+        """Set the sensors and materials of a conversion context."""
+        context.imus = self.imus
+        context.p3ds = self.p3ds
+        context.cameras = self.cameras
+        context.rangeFinders = self.rangeFinders
+        context.lidars = self.lidars
+        context.namedMaterial = self.namedMaterial
+        context.geometryReference = self.geometryReference
+
+    def relocate(self, outputDirectory, meshDirectory, textureDirectory):
+        """
+        Move the model to another output, the directories being absolute paths: copy its generated files in the mesh and
+        texture directories of this output, from their previous location or from the cache, and make its mesh URLs and
+        reduced textures relative to the new output directory. Return False if a generated file cannot be copied.
+        """
+        directories = {self.meshDirectory: meshDirectory, self.textureDirectory: textureDirectory}
+        moves = {}  # previous path -> new path of the generated files
+        generatedFiles = []
+        for file, cachedFile in self.generatedFiles:
+            newFile = os.path.join(directories.get(os.path.dirname(file), os.path.dirname(file)), os.path.basename(file))
+            if not os.path.isfile(newFile):
+                try:
+                    os.makedirs(os.path.dirname(newFile), exist_ok=True)
+                    if os.path.isfile(file):
+                        shutil.copyfile(file, newFile)
+                    else:
+                        urdf2webots.cache.copyCachedFile(cachedFile, newFile)
+                except (OSError, TypeError):  # no cached copy
+                    return False
+            moves[os.path.abspath(file)] = newFile
+            generatedFiles.append([newFile, cachedFile])
+        if outputDirectory != self.outputDirectory or any(file != newFile for file, newFile in moves.items()):
+            def move(path):
+                absolutePath = os.path.normpath(os.path.join(self.outputDirectory, path))
+                return os.path.relpath(moves.get(absolutePath, absolutePath), outputDirectory)
+
+            moved = set()  # the geometries and materials can be shared by several visuals and collisions
+            for link in self.links:
+                for item in link.visual + link.collision:
+                    geometry = item.geometry
+                    if geometry.type in ['mesh', 'cadShape'] and id(geometry) not in moved:
+                        moved.add(id(geometry))
+                        url = geometry.shape.url.strip('"')
+                        if url and not os.path.isabs(url):
+                            geometry.shape.url = '"' + os.path.normpath(move(url)) + '"'
+                    material = getattr(item, 'material', None)
+                    if material is not None and material.texture and id(material) not in moved:
+                        moved.add(id(material))
+                        texturePath = os.path.normpath(os.path.join(self.outputDirectory, material.texture))
+                        if not os.path.isabs(material.texture) and texturePath in moves:  # the other ones are kept as is
+                            material.texture = move(material.texture).replace(os.sep, '/')
+        self.outputDirectory = outputDirectory
+        self.meshDirectory = meshDirectory
+        self.textureDirectory = textureDirectory
+        self.generatedFiles = generatedFiles
+        return True
+
+    def toBytes(self):
+        """Return the serialized model."""
+        return zlib.compress(pickle.dumps((MODEL_FORMAT, getSchema(), self), protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def fromBytes(data):
+        """Return a model serialized by toBytes(), raise ValueError if it has another format or schema."""
+        try:
+            modelFormat, modelSchema, model = pickle.loads(zlib.decompress(data))
+        except Exception as e:
+            raise ValueError('invalid robot model: %s' % e)
+        if modelFormat != MODEL_FORMAT or modelSchema != getSchema():
+            raise ValueError('the robot model was serialized by another version of urdf2webots')
+        return model
+
+    def copy(self):
+        """Return a deep copy of the model, the conversions modifying the models they write."""
+        return pickle.loads(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def save(self, path):
+        """Write the serialized model in a file."""
+        with open(path, 'wb') as file:
+            file.write(self.toBytes())
+
+    @staticmethod
+    def load(path):
+        """Return the model serialized in a file."""
+        with open(path, 'rb') as file:
+            return RobotModel.fromBytes(file.read())
@@ -0,0 +1,121 @@
+"""Index of the ROS packages referenced by "package://" URIs."""
+import json
+import os
+import re
+import sys
+import tempfile
+
+quotedUriPattern = re.compile('"package://(.*?)"')
+uriPattern = re.compile('package://([^/"]*)')
+
+
+def findRosPackage(packageName):
+    """Return the directory of a ROS package using the sourced ROS distribution, None if it cannot be found."""
+    if 'ROS_VERSION' not in os.environ:
+        sys.stderr.write('ROS not sourced, package "%s" will not be found.\n' % packageName)
+        return None
+    # the ROS modules are slow to import, they are only imported when a package has to be found
+    if os.environ['ROS_VERSION'] == '1':
+        try:
+            import rospkg
+        except ImportError:
+            sys.stderr.write('Impossible to find location of "%s" package, installing "rospkg" might help.\n'
+                             % packageName)
+            return None
+        try:
+            rospack = rospkg.RosPack()
+            return rospack.get_path(packageName)
+        except rospkg.common.ResourceNotFound:
+            sys.stderr.write('Package "%s" not found.\n' % packageName)
+    else:
+        try:
+            from ament_index_python import PackageNotFoundError
+            from ament_index_python.packages import get_package_share_directory
+        except ImportError:
+            sys.stderr.write('Impossible to find location of "%s" package, installing "ament_index_python" might help.\n'
+                             % packageName)
+            return None
+        try:
+            return get_package_share_directory(packageName)
+        except PackageNotFoundError:
+            sys.stderr.write('Package "%s" not found.\n' % packageName)
+    return None
+
+
+class PackageIndex():
+    """Directories of the ROS packages, each one being looked up only once per ROS environment.
+
+    The index is shared by all the conversions of the process and can be stored in a JSON file to be reused by the next
+    processes. The stored directories which don't exist anymore are looked up again.
+    """
+
+    def __init__(self):
+        """Initialization."""
+        self.packages = {}  # ROS environment -> package name -> directory
+        self.file = None
+
+    def setFile(self, file):
+        """Load the index from a JSON file and store it in this file whenever a new package is found."""
+        self.file = file
+        try:
+            with open(file, 'r') as f:
+                for environment, packages in json.load(f).items():
+                    self.packages.setdefault(environment, {}).update(packages)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def getEnvironment():
+        """Return the variables defining where the ROS packages are looked up."""
+        return '|'.join(os.environ.get(name, '') for name in ['ROS_VERSION', 'ROS_PACKAGE_PATH', 'AMENT_PREFIX_PATH'])
+
+    def find(self, packageName):
+        """Return the directory of a ROS package, None if it cannot be found."""
+        packages = self.packages.setdefault(self.getEnvironment(), {})
+        if packageName in packages:
+            directory = packages[packageName]
+            if directory is None or os.path.isdir(directory):
+                return directory
+        directory = findRosPackage(packageName)
+        packages[packageName] = directory
+        if directory is not None and self.file is not None:
+            self.save()
+        return directory
+
+    def save(self):
+        """Store the packages found in the index file."""
+        packages = {}
+        for environment, directories in self.packages.items():
+            packages[environment] = {name: directory for name, directory in directories.items() if directory is not None}
+        try:
+            directory = os.path.dirname(os.path.abspath(self.file))
+            os.makedirs(directory, exist_ok=True)
+            descriptor, temporaryPath = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(packages, f, indent=2)
+            os.replace(temporaryPath, self.file)
+        except OSError as e:
+            sys.stderr.write('Could not store the package index: %s\n' % e)
+
+
+packageIndex = PackageIndex()
+
+
+def replacePackageUris(content, getPackagePath):
+    """
+    Replace the "package://" URIs of a URDF content by absolute paths in a single pass.
+    'getPackagePath' returns the directory containing a package, it is called once per package referenced in an attribute.
+    """
+    packagePaths = {}
+    for match in quotedUriPattern.findall(content):
+        packageName = match.split('/')[0]
+        if packageName not in packagePaths:
+            packagePaths[packageName] = getPackagePath(packageName)
+
+    def replace(match):
+        packagePath = packagePaths.get(match.group(1))
+        if packagePath is None:
+            return match.group(0)
+        return packagePath + '/' + match.group(1)
+
+    return uriPattern.sub(replace, content)
@@ -1,28 +1,26 @@
 """Import modules."""
 import math
 import os
-import sys
-try:
-    from PIL import Image
-except ImportError as e:
-    if sys.platform == 'linux2':
-        sys.stderr.write("PIL module not found, please install it with:\n")
-        sys.stderr.write("apt-get install python-pip\n")
-        sys.stderr.write("pip install pillow\n")
-    raise e
 
+import urdf2webots.cache
 from urdf2webots.gazebo_materials import materials
-from urdf2webots.math_utils import convertRPYtoEulerAxis, rotateVector, combineRotations, combineTranslations
+from urdf2webots.math_utils import convertRPYtoEulerAxis, rotateVector, combineRotations, combineTranslations, \
+    matrixFromRotation, multiplyMatrix, rotationFromMatrix, convertRPYtoEulerAxisBatch, matricesFromRotations, \
+    rotationsFromMatrices
 
 
-# to pass from external
-robotName = ''
-targetVersion = 'R2025a'
+# minimal number of origins converted with NumPy, the import of NumPy being slower than converting fewer origins
+ORIGIN_BATCH_SIZE = 10000
+
+# minimal number of triangles of a reduced visual mesh
+MIN_REDUCED_TRIANGLES = 12
 
 
 class Inertia():
     """Define inertia object."""
 
+    __slots__ = ('position', 'rotation', 'mass', 'ixx', 'ixy', 'ixz', 'iyy', 'iyz', 'izz')
+
     def __init__(self):
         """Initialization."""
         self.position = [0.0, 0.0, 0.0]
@@ -39,6 +37,8 @@ class Inertia():
 class Box():
     """Define box object."""
 
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self):
         """Initialization."""
         self.x = 0.0
@@ -49,6 +49,8 @@ class Box():
 class Cylinder():
     """Define cylinder object."""
 
+    __slots__ = ('radius', 'height')
+
     def __init__(self):
         """Initialization."""
         self.radius = 0.0
@@ -58,14 +60,29 @@ class Cylinder():
 class Sphere():
     """Define sphere object."""
 
+    __slots__ = ('radius',)
+
+    def __init__(self):
+        """Initialization."""
+        self.radius = 0.0
+
+
+class Capsule():
+    """Define capsule object."""
+
+    __slots__ = ('radius', 'height')
+
     def __init__(self):
         """Initialization."""
         self.radius = 0.0
+        self.height = 0.0
 
 
 class Mesh():
     """Define mesh object."""
 
+    __slots__ = ('url', 'ccw')
+
     def __init__(self):
         """Initialization."""
         self.url = ''
@@ -75,31 +92,79 @@ class Mesh():
 class CadShape():
     """Define CadShape object."""
 
+    __slots__ = ('url', 'ccw')
+
     def __init__(self):
         """Initialization."""
         self.url = ''
         self.ccw = True
 
 
+shapeClasses = {'box': Box, 'cylinder': Cylinder, 'sphere': Sphere, 'capsule': Capsule, 'mesh': Mesh, 'cadShape': CadShape}
+
+
 class Geometry():
-    """Define geometry object."""
+    """Define geometry object.
 
-    reference = {}
+    A geometry holds a single shape, allocated by the first access to one of the box, cylinder, sphere, capsule, mesh or
+    cadShape attributes, which also sets its type. The other attributes return a new shape with the default values.
+    """
+
+    __slots__ = ('type', 'shape', 'name', 'defName')
 
     def __init__(self):
         """Initialization."""
-        self.box = Box()
-        self.cylinder = Cylinder()
-        self.sphere = Sphere()
-        self.mesh = Mesh()
-        self.cadShape = CadShape()
+        self.type = None
+        self.shape = None
         self.name = None
         self.defName = None
 
+    def getShape(self, type):
+        """Return the shape of a type, allocating it if the geometry has no type yet."""
+        if self.type == type:
+            return self.shape
+        if self.type is None:
+            self.type = type
+            self.shape = shapeClasses[type]()
+            return self.shape
+        return shapeClasses[type]()
+
+    @property
+    def box(self):
+        """Return the box of the geometry."""
+        return self.getShape('box')
+
+    @property
+    def cylinder(self):
+        """Return the cylinder of the geometry."""
+        return self.getShape('cylinder')
+
+    @property
+    def sphere(self):
+        """Return the sphere of the geometry."""
+        return self.getShape('sphere')
+
+    @property
+    def capsule(self):
+        """Return the capsule of the geometry."""
+        return self.getShape('capsule')
+
+    @property
+    def mesh(self):
+        """Return the mesh of the geometry."""
+        return self.getShape('mesh')
+
+    @property
+    def cadShape(self):
+        """Return the CadShape of the geometry."""
+        return self.getShape('cadShape')
+
 
 class Color():
     """Define color object."""
 
+    __slots__ = ('red', 'green', 'blue', 'alpha')
+
     def __init__(self, red=0.5, green=0.0, blue=0.0, alpha=1.0):
         """Initialization."""
         self.red = red
@@ -109,35 +174,73 @@ class Color():
 
 
 class Material():
-    """Define material object."""
+    """Define material object.
 
-    namedMaterial = {}
+    The colors are allocated by their first access, getColor() returns the default colors without allocating them.
+    """
+
+    __slots__ = ('colors', 'shininess', 'index_of_refraction', 'texture', 'name', 'defName')
+    defaultColors = {
+        'emission': (0.0, 0.0, 0.0, 1.0),
+        'ambient': (0.0, 0.0, 0.0, 0.0),
+        'diffuse': (0.5, 0.5, 0.5, 1.0),
+        'specular': (0.0, 0.0, 0.0, 1.0)
+    }
+    sharedColors = {name: Color(*values) for name, values in defaultColors.items()}  # must not be modified
 
     def __init__(self):
         """Initialization."""
-        self.emission = Color(0.0, 0.0, 0.0, 1.0)
-        self.ambient = Color(0.0, 0.0, 0.0, 0.0)
-        self.diffuse = Color(0.5, 0.5, 0.5, 1.0)
-        self.specular = Color(0.0, 0.0, 0.0, 1.0)
+        self.colors = None  # color name -> color, only for the allocated colors
         self.shininess = None
         self.index_of_refraction = 1.0
         self.texture = ""
         self.name = None
         self.defName = None
 
-    def parseFromMaterialNode(self, node):
+    def getColor(self, name):
+        """Return a color of the material for reading only, the default colors being shared."""
+        if self.colors is not None and name in self.colors:
+            return self.colors[name]
+        return Material.sharedColors[name]
+
+    def allocateColor(self, name):
+        """Return a color of the material that can be modified."""
+        if self.colors is None:
+            self.colors = {}
+        if name not in self.colors:
+            self.colors[name] = Color(*Material.defaultColors[name])
+        return self.colors[name]
+
+    @property
+    def emission(self):
+        """Return the emission color."""
+        return self.allocateColor('emission')
+
+    @property
+    def ambient(self):
+        """Return the ambient color."""
+        return self.allocateColor('ambient')
+
+    @property
+    def diffuse(self):
+        """Return the diffuse color."""
+        return self.allocateColor('diffuse')
+
+    @property
+    def specular(self):
+        """Return the specular color."""
+        return self.allocateColor('specular')
+
+    def parseFromMaterialNode(self, node, context):
         """Parse a material node."""
         if hasElement(node, 'color'):
             colorElement = node.getElementsByTagName('color')[0]
             colors = colorElement.getAttribute('rgba').split()
-            self.diffuse.r = float(colors[0])
-            self.diffuse.g = float(colors[1])
-            self.diffuse.b = float(colors[2])
             self.diffuse.alpha = float(colors[3])
         if node.hasAttribute('name'):
             self.name = node.getAttribute('name')
-            if self.name not in Material.namedMaterial:
-                Material.namedMaterial[self.name] = self
+            if self.name not in context.namedMaterial:
+                context.namedMaterial[self.name] = self
             else:
                 assert False
 
@@ -145,6 +248,8 @@ class Material():
 class Visual():
     """Define visual object."""
 
+    __slots__ = ('position', 'rotation', 'scale', 'geometry', 'material')
+
     def __init__(self):
         """Initialization."""
         self.position = [0.0, 0.0, 0.0]
@@ -157,6 +262,8 @@ class Visual():
 class Collision():
     """Define collision object."""
 
+    __slots__ = ('position', 'rotation', 'scale', 'geometry')
+
     def __init__(self):
         """Initialization."""
         self.position = [0.0, 0.0, 0.0]
@@ -168,6 +275,8 @@ class Collision():
 class Calibration():
     """Define calibration object."""
 
+    __slots__ = ('limit', 'rising')
+
     def __init__(self):
         """Initialization."""
         self.limit = 0.0
@@ -177,6 +286,8 @@ class Calibration():
 class Dynamics():
     """Define dynamics object."""
 
+    __slots__ = ('damping', 'friction')
+
     def __init__(self):
         """Initialization."""
         self.damping = 0.0
@@ -186,6 +297,8 @@ class Dynamics():
 class Limit():
     """Define joint limit object."""
 
+    __slots__ = ('lower', 'upper', 'effort', 'velocity')
+
     def __init__(self):
         """Initialization."""
         self.lower = 0.0
@@ -197,6 +310,8 @@ class Limit():
 class Safety():
     """Define joint safety object."""
 
+    __slots__ = ('lower', 'upper', 'kPosition', 'kVelocity')
+
     def __init__(self):
         """Initialization."""
         self.lower = 0.0
@@ -208,6 +323,8 @@ class Safety():
 class Link():
     """Define link object."""
 
+    __slots__ = ('name', 'inertia', 'visual', 'collision', 'forceSensor')
+
     def __init__(self):
         """Initialization."""
         self.name = 'default'
@@ -220,6 +337,9 @@ class Link():
 class Joint():
     """Define joint object."""
 
+    __slots__ = ('name', 'type', 'position', 'rotation', 'parent', 'child', 'axis', 'calibration', 'dynamics', 'limit',
+                 'safety')
+
     def __init__(self):
         """Initialization."""
         self.name = 'default'
@@ -235,11 +355,37 @@ class Joint():
         self.safety = Safety()
 
 
+class KinematicTree():
+    """Index the links, joints and sensors of a robot to walk it from the root link."""
+
+    def __init__(self, linkList, jointList, sensorList):
+        """Initialization."""
+        self.links = {}
+        self.childJoints = {}
+        self.sensors = {}
+        for link in linkList:
+            self.links.setdefault(link.name, link)
+        for joint in jointList:
+            self.childJoints.setdefault(joint.parent, []).append(joint)
+        for sensor in sensorList:
+            self.sensors.setdefault(sensor.parentLink, []).append(sensor)
+
+    def getLink(self, name):
+        """Return the link called 'name' or None if it doesn't exist."""
+        return self.links.get(name)
+
+    def getChildJoints(self, linkName):
+        """Return the joints whose parent is the 'linkName' link, in the URDF order."""
+        return self.childJoints.get(linkName, [])
+
+    def getSensors(self, linkName):
+        """Return the sensors attached to the 'linkName' link."""
+        return self.sensors.get(linkName, [])
+
+
 class IMU():
     """Define an IMU sensor."""
 
-    list = []
-
     def __init__(self):
         """Initialization."""
         self.name = 'imu'
@@ -285,8 +431,6 @@ class IMU():
 class P3D():
     """Define P3D (ground truth pose)."""
 
-    list = []
-
     def __init__(self):
         """Initialization."""
         self.name = 'p3d'
@@ -327,8 +471,6 @@ class P3D():
 class Camera():
     """Define a camera sensor."""
 
-    list = []
-
     def __init__(self):
         """Initialization."""
         self.name = 'camera'
@@ -357,8 +499,6 @@ class Camera():
 class RangeFinder():
     """Define a range finder sensor."""
 
-    list = []
-
     def __init__(self):
         """Initialization."""
         self.name = 'rangefinder'
@@ -399,8 +539,6 @@ class RangeFinder():
 class Lidar():
     """Define a lidar sensor."""
 
-    list = []
-
     def __init__(self):
         """Initialization."""
         self.name = 'lidar'
@@ -472,40 +610,153 @@ def hasElement(node, element):
         return False
 
 
-def getPosition(node):
-    """Read position of a phsical or visual object."""
+def getChildElements(node):
+    """Group the direct child elements of a node by tag name, walking its child list only once."""
+    elements = {}
+    for child in node.childNodes:
+        if child.nodeType == child.ELEMENT_NODE:
+            elements.setdefault(child.tagName, []).append(child)
+    return elements
+
+
+def getChildElement(elements, tag):
+    """Return the first 'tag' element of a getChildElements() result, None if there is none."""
+    children = elements.get(tag)
+    return children[0] if children else None
+
+
+class ShapeElements():
+    """Child elements of a visual or collision element."""
+
+    shapeTags = ['box', 'cylinder', 'sphere', 'mesh']
+
+    def __init__(self, node):
+        """Initialization."""
+        elements = getChildElements(node)
+        self.origin = getChildElement(elements, 'origin')
+        self.geometry = getChildElement(elements, 'geometry')
+        self.material = getChildElement(elements, 'material')
+        self.shapeType = None
+        self.shape = None
+        if self.geometry is not None:
+            geometryElements = getChildElements(self.geometry)
+            for shapeType in ShapeElements.shapeTags:
+                if shapeType in geometryElements:
+                    self.shapeType = shapeType
+                    self.shape = geometryElements[shapeType][0]
+                    break
+
+
+class LinkElements():
+    """Child elements of a link element."""
+
+    def __init__(self, node):
+        """Initialization."""
+        elements = getChildElements(node)
+        self.inertial = getChildElement(elements, 'inertial')
+        self.visuals = [ShapeElements(element) for element in elements.get('visual', [])]
+        self.collisions = [ShapeElements(element) for element in elements.get('collision', [])]
+
+
+def getPosition(origin):
+    """Read position of an origin element."""
     position = [0.0, 0.0, 0.0]
-    positionString = node.getElementsByTagName('origin')[0].getAttribute('xyz').split()
+    positionString = origin.getAttribute('xyz').split()
     position[0] = float(positionString[0])
     position[1] = float(positionString[1])
     position[2] = float(positionString[2])
     return position
 
 
-def getRotation(node):
-    """Read rotation of a phsical or visual object."""
-    rotation = [0.0, 0.0, 0.0]
-    if hasElement(node, 'origin'):
-        orientationString = node.getElementsByTagName('origin')[0].getAttribute('rpy').split()
-        rotation[0] = float(orientationString[0])
-        rotation[1] = float(orientationString[1])
-        rotation[2] = float(orientationString[2])
-    return convertRPYtoEulerAxis(rotation)
+def getRPY(origin):
+    """Read the RPY angles of an origin element."""
+    rpy = [0.0, 0.0, 0.0]
+    orientationString = origin.getAttribute('rpy').split()
+    rpy[0] = float(orientationString[0])
+    rpy[1] = float(orientationString[1])
+    rpy[2] = float(orientationString[2])
+    return rpy
+
+
+def getRotation(origin):
+    """Read rotation of an origin element."""
+    return convertRPYtoEulerAxis(getRPY(origin))
+
 
+def setOrigin(item, origin, context=None):
+    """Set the position and rotation of an inertia, visual, collision or joint from its origin element.
 
-def getInertia(node):
+    If the context records the origins, the rotation is only set by convertOrigins().
+    """
+    if origin is not None:
+        if origin.getAttribute('xyz'):
+            item.position = getPosition(origin)
+        if origin.getAttribute('rpy'):
+            if context is not None and context.origins is not None:
+                context.origins.append((item, getRPY(origin)))
+            else:
+                item.rotation = getRotation(origin)
+
+
+def convertOrigins(context):
+    """Set the rotations of all the origins recorded by the context, converting their RPY angles in a single call.
+
+    The origins of the small models are converted one by one, which is faster than importing NumPy.
+    """
+    if context.origins and len(context.origins) >= ORIGIN_BATCH_SIZE:
+        items, rpy = zip(*context.origins)
+        for item, rotation in zip(items, convertRPYtoEulerAxisBatch(rpy).tolist()):
+            item.rotation = rotation
+    elif context.origins:
+        for item, rpy in context.origins:
+            item.rotation = convertRPYtoEulerAxis(rpy)
+    context.origins = None
+
+
+def getWorldPoses(linkList, jointList):
+    """Return the position and rotation of every link in the frame of its root link, the joints being at rest.
+
+    The poses are computed level after level of the kinematic tree, each level in a single batch.
+    """
+    import numpy
+    jointsByParent = {}
+    for joint in jointList:
+        jointsByParent.setdefault(joint.parent, []).append(joint)
+    childList = set(joint.child for joint in jointList)
+    names = [link.name for link in linkList if isRootLink(link.name, childList)]
+    positions = numpy.zeros((len(names), 3))
+    matrices = numpy.tile(numpy.identity(3), (len(names), 1, 1))
+    poses = {}
+    while names:
+        for name, position, rotation in zip(names, positions.tolist(), rotationsFromMatrices(matrices).tolist()):
+            poses[name] = (position, rotation)
+        parents = []
+        joints = []
+        for index, name in enumerate(names):
+            for joint in jointsByParent.get(name, []):
+                if joint.child not in poses:
+                    parents.append(index)
+                    joints.append(joint)
+        if not joints:
+            break
+        parentMatrices = matrices[parents]
+        jointPositions = numpy.array([joint.position for joint in joints], dtype=numpy.float64)
+        positions = positions[parents] + numpy.einsum('nij,nj->ni', parentMatrices, jointPositions)
+        matrices = parentMatrices @ matricesFromRotations([joint.rotation for joint in joints])
+        names = [joint.child for joint in joints]
+    return poses
+
+
+def getInertia(inertialElement, context=None):
     """Parse inertia of a link."""
     inertia = Inertia()
-    inertialElement = node.getElementsByTagName('inertial')[0]
-    if hasElement(inertialElement, 'origin'):
-        if inertialElement.getElementsByTagName('origin')[0].getAttribute('xyz'):
-            inertia.position = getPosition(inertialElement)
-        if inertialElement.getElementsByTagName('origin')[0].getAttribute('rpy'):
-            inertia.rotation = getRotation(inertialElement)
-    if hasElement(inertialElement, 'mass'):
-        inertia.mass = float(inertialElement.getElementsByTagName('mass')[0].getAttribute('value'))
-    if hasElement(inertialElement, 'inertia'):
-        matrixNode = inertialElement.getElementsByTagName('inertia')[0]
+    elements = getChildElements(inertialElement)
+    setOrigin(inertia, getChildElement(elements, 'origin'), context)
+    massElement = getChildElement(elements, 'mass')
+    if massElement is not None:
+        inertia.mass = float(massElement.getAttribute('value'))
+    matrixNode = getChildElement(elements, 'inertia')
+    if matrixNode is not None:
         inertia.ixx = float(matrixNode.getAttribute('ixx'))
         inertia.ixy = float(matrixNode.getAttribute('ixy'))
         inertia.ixz = float(matrixNode.getAttribute('ixz'))
@@ -515,27 +766,55 @@ def getInertia(node):
     return inertia
 
 
-def getVisual(link, node, path, outputDirectory):
+def getMeshKey(path, nodeType, ccw):
+    """Return the key identifying a mesh node, the content of the mesh file if it can be read, its path otherwise.
+
+    The scale is not part of the key as it is applied by the Transform node containing the mesh node, only its sign
+    matters through the 'ccw' field. A CadShape node loads the textures and materials referenced by its file relative to
+    the directory of the file, so identical files of different directories are different CadShape nodes.
+    """
+    contentHash = urdf2webots.cache.hashFile(path)  # memoized by path, size and modification time
+    if contentHash is None:
+        return (os.path.normpath(path), nodeType, ccw)
+    if nodeType == 'CadShape':
+        return (contentHash, os.path.dirname(os.path.abspath(path)), nodeType, ccw)
+    return (contentHash, nodeType, ccw)
+
+
+def getUniqueGeometryName(context, name):
+    """Return a name, from which the DEF name of a mesh node is computed, not used by any other mesh node."""
+    uniqueName = name
+    index = 1
+    while uniqueName in context.geometryNames:
+        index += 1
+        uniqueName = '%s_%d' % (name, index)
+    context.geometryNames.add(uniqueName)
+    return uniqueName
+
+
+def getTexturePath(texture, path, outputDirectory):
+    """Return the path of a texture file relative to the URDF file or to the output file, None if it cannot be found."""
+    for directory in [path, outputDirectory]:
+        texturePath = os.path.join(directory, texture)
+        if os.path.isfile(texturePath):
+            return texturePath
+    return None
+
+
+def getVisual(context, link, visualElements, path, outputDirectory):
     """Parse visual data of a link."""
-    for index in range(0, len(node.getElementsByTagName('visual'))):
+    for elements in visualElements:
         visual = Visual()
-        visualElement = node.getElementsByTagName('visual')[index]
-        if hasElement(visualElement, 'origin'):
-            if visualElement.getElementsByTagName('origin')[0].getAttribute('xyz'):
-                visual.position = getPosition(visualElement)
-            if visualElement.getElementsByTagName('origin')[0].getAttribute('rpy'):
-                visual.rotation = getRotation(visualElement)
-        elif hasElement(visualElement.getElementsByTagName('geometry')[0], 'cylinder'):
-            visual.rotation = getRotation(visualElement)
-
-        geometryElement = visualElement.getElementsByTagName('geometry')[0]
-
-        if hasElement(visualElement, 'material'):
-            material = visualElement.getElementsByTagName('material')[0]
-            if material.hasAttribute('name') and material.getAttribute('name') in Material.namedMaterial:
-                visual.material = Material.namedMaterial[material.getAttribute('name')]
-            elif hasElement(material, 'color'):
-                colorElement = material.getElementsByTagName('color')[0].getAttribute('rgba').split()
+        setOrigin(visual, elements.origin, context)
+
+        if elements.material is not None:
+            material = elements.material
+            materialElements = getChildElements(material)
+            colorElement = getChildElement(materialElements, 'color')
+            if material.hasAttribute('name') and material.getAttribute('name') in context.namedMaterial:
+                visual.material = context.namedMaterial[material.getAttribute('name')]
+            elif colorElement is not None:
+                colorElement = colorElement.getAttribute('rgba').split()
                 visual.material.diffuse.red = float(colorElement[0])
                 visual.material.diffuse.green = float(colorElement[1])
                 visual.material.diffuse.blue = float(colorElement[2])
@@ -544,8 +823,8 @@ def getVisual(link, node, path, outputDirectory):
                     if material.getAttribute('name'):
                         visual.material.name = material.getAttribute('name')
                     else:
-                        visual.material.name = node.getAttribute('name') + '_material'
-                    Material.namedMaterial[visual.material.name] = visual.material
+                        visual.material.name = link.name + '_material'
+                    context.namedMaterial[visual.material.name] = visual.material
             elif material.firstChild and material.firstChild.nodeValue in materials:
                 materialName = material.firstChild.nodeValue
                 visual.material.diffuse.red = float(materials[materialName]['diffuse'][0])
@@ -561,126 +840,115 @@ def getVisual(link, node, path, outputDirectory):
                 visual.material.specular.blue = float(materials[materialName]['specular'][2])
                 visual.material.specular.alpha = float(materials[materialName]['specular'][3])
                 visual.material.name = materialName
-                Material.namedMaterial[materialName] = visual.material
-            if hasElement(material, 'texture'):
-                visual.material.texture = material.getElementsByTagName('texture')[0].getAttribute('filename')
-                if os.path.splitext(visual.material.texture)[1] == '.tiff' \
-                   or os.path.splitext(visual.material.texture)[1] == '.tif':
-                    for dirname, dirnames, filenames in os.walk('.'):
-                        for filename in filenames:
-                            if filename == str(visual.material.texture.split('/')[-1]):
-                                print('try to translate image ' + filename)
-                                try:
-                                    tifImage = Image.open(os.path.join(dirname, filename))
-                                    tifImage.save(os.path.splitext(os.path.join('./' + robotName + '_' + 'textures',
-                                                                                filename))[0] + '.png')
-                                    visual.material.texture = (robotName + '_' + 'textures/' +
-                                                               os.path.splitext(filename)[0] + '.png')
-                                except IOError:
-                                    visual.material.texture = ""
-                                    print('failed to open ' + os.path.join(dirname, filename))
-
-        if hasElement(geometryElement, 'box'):
-            visual.geometry.box.x = float(geometryElement.getElementsByTagName('box')[0].getAttribute('size').split()[0])
-            visual.geometry.box.y = float(geometryElement.getElementsByTagName('box')[0].getAttribute('size').split()[1])
-            visual.geometry.box.z = float(geometryElement.getElementsByTagName('box')[0].getAttribute('size').split()[2])
+                context.namedMaterial[materialName] = visual.material
+            if context.materialReferences is not None and material.getAttribute('name'):
+                context.materialReferences.append((visual, material.getAttribute('name')))
+            textureElement = getChildElement(materialElements, 'texture')
+            if textureElement is not None:
+                visual.material.texture = textureElement.getAttribute('filename')
+                if context.textures.isReducing():
+                    source = getTexturePath(visual.material.texture, path, outputDirectory)
+                    if source is None:
+                        print('Texture "%s" kept: the file cannot be found' % visual.material.texture)
+                    else:
+                        with context.stats.phase('textures'):
+                            context.textures.reduce(visual.material, source)
+                elif os.path.splitext(visual.material.texture)[1] in ['.tiff', '.tif']:
+                    context.stats.count('tiffTextures')
+                    with context.stats.phase('textures'):
+                        context.textures.translate(visual.material, context.robotName)
+
+        shape = elements.shape
+        if elements.shapeType == 'box':
+            size = shape.getAttribute('size').split()
+            visual.geometry.box.x = float(size[0])
+            visual.geometry.box.y = float(size[1])
+            visual.geometry.box.z = float(size[2])
             link.visual.append(visual)
-        elif hasElement(geometryElement, 'cylinder'):
-            visual.geometry.cylinder.radius = float(geometryElement.getElementsByTagName('cylinder')[0].getAttribute('radius'))
-            visual.geometry.cylinder.height = float(geometryElement.getElementsByTagName('cylinder')[0].getAttribute('length'))
+        elif elements.shapeType == 'cylinder':
+            visual.geometry.cylinder.radius = float(shape.getAttribute('radius'))
+            visual.geometry.cylinder.height = float(shape.getAttribute('length'))
             link.visual.append(visual)
-        elif hasElement(geometryElement, 'sphere'):
-            visual.geometry.sphere.radius = float(geometryElement.getElementsByTagName('sphere')[0].getAttribute('radius'))
+        elif elements.shapeType == 'sphere':
+            visual.geometry.sphere.radius = float(shape.getAttribute('radius'))
             link.visual.append(visual)
-        elif hasElement(geometryElement, 'mesh'):
-            meshfile = geometryElement.getElementsByTagName('mesh')[0].getAttribute('filename')
+        elif elements.shapeType == 'mesh':
+            meshfile = shape.getAttribute('filename')
             if not os.path.isabs(meshfile):
                 # Use the path relative to the output file
                 meshfile = os.path.normpath(os.path.relpath(os.path.join(path, meshfile), outputDirectory))
+            meshPath = os.path.join(outputDirectory, meshfile)
             # hack for gazebo mesh database
             if meshfile.count('package'):
                 idx0 = meshfile.find('package://')
                 meshfile = meshfile[idx0 + len('package://'):]
-            if geometryElement.getElementsByTagName('mesh')[0].getAttribute('scale'):
-                meshScale = geometryElement.getElementsByTagName('mesh')[0].getAttribute('scale').split()
+            extension = os.path.splitext(meshfile)[1].lower()
+            isCadShape = extension in ['.dae', '.obj'] and context.targetVersion >= 'R2022b'
+            meshShape = visual.geometry.cadShape if isCadShape else visual.geometry.mesh
+            if shape.getAttribute('scale'):
+                meshScale = shape.getAttribute('scale').split()
                 visual.scale[0] = float(meshScale[0])
                 visual.scale[1] = float(meshScale[1])
                 visual.scale[2] = float(meshScale[2])
                 if visual.scale[0] * visual.scale[1] * visual.scale[2] < 0.0:
-                    extension = os.path.splitext(meshfile)[1].lower()
-                    if extension in ['.dae', '.obj'] and targetVersion >= 'R2022b':
-                        visual.geometry.cadShape.ccw = False
-                    else:
-                        visual.geometry.mesh.ccw = False
-            extension = os.path.splitext(meshfile)[1].lower()
+                    meshShape.ccw = False
             if extension in ['.dae', '.obj', '.stl']:
                 name = os.path.splitext(os.path.basename(meshfile))[0]
-                if extension in ['.dae', '.obj'] and targetVersion >= 'R2022b':
+                if isCadShape:
                     name += '_visual'
-                if not visual.geometry.cadShape.ccw:
-                    name += '_cw'
-                if not visual.geometry.mesh.ccw:
+                if not meshShape.ccw:
                     name += '_cw'
-                if name in Geometry.reference:
-                    visual.geometry = Geometry.reference[name]
+                key = getMeshKey(meshPath, 'CadShape' if isCadShape else 'Mesh', meshShape.ccw)
+                if key in context.geometryReference:
+                    visual.geometry = context.geometryReference[key]
                 else:
-                    if extension in ['.dae', '.obj'] and targetVersion >= 'R2022b':
-                        visual.geometry.cadShape.url = '"' + meshfile + '"'
-                    else:
-                        visual.geometry.mesh.url = '"' + meshfile + '"'
-                    visual.geometry.name = name
-                    Geometry.reference[name] = visual.geometry
+                    meshShape.url = '"' + meshfile + '"'
+                    visual.geometry.name = getUniqueGeometryName(context, name)
+                    context.geometryReference[key] = visual.geometry
                 link.visual.append(visual)
             else:
                 print('Unsupported format: \"' + extension + '\"')
 
 
-def getCollision(link, node, path, outputDirectory):
+def getCollision(context, link, collisionElements, path, outputDirectory):
     """Parse collision of a link."""
-    for index in range(0, len(node.getElementsByTagName('collision'))):
+    for elements in collisionElements:
         collision = Collision()
-        collisionElement = node.getElementsByTagName('collision')[index]
-        if hasElement(collisionElement, 'origin'):
-            if collisionElement.getElementsByTagName('origin')[0].getAttribute('xyz'):
-                collision.position = getPosition(collisionElement)
-            if collisionElement.getElementsByTagName('origin')[0].getAttribute('rpy'):
-                collision.rotation = getRotation(collisionElement)
-        elif hasElement(collisionElement.getElementsByTagName('geometry')[0], 'cylinder'):
-            collision.rotation = getRotation(collisionElement)
-
-        geometryElement = collisionElement.getElementsByTagName('geometry')[0]
-        if hasElement(geometryElement, 'box'):
-            size = geometryElement.getElementsByTagName('box')[0].getAttribute('size').split()
+        setOrigin(collision, elements.origin, context)
+
+        shape = elements.shape
+        if elements.shapeType == 'box':
+            size = shape.getAttribute('size').split()
             collision.geometry.box.x = float(size[0])
             collision.geometry.box.y = float(size[1])
             collision.geometry.box.z = float(size[2])
             link.collision.append(collision)
-        elif hasElement(geometryElement, 'cylinder'):
-            element = geometryElement.getElementsByTagName('cylinder')[0]
-            collision.geometry.cylinder.radius = float(element.getAttribute('radius'))
-            collision.geometry.cylinder.height = float(element.getAttribute('length'))
+        elif elements.shapeType == 'cylinder':
+            collision.geometry.cylinder.radius = float(shape.getAttribute('radius'))
+            collision.geometry.cylinder.height = float(shape.getAttribute('length'))
             link.collision.append(collision)
-        elif hasElement(geometryElement, 'sphere'):
-            collision.geometry.sphere.radius = float(geometryElement.getElementsByTagName('sphere')[0].getAttribute('radius'))
+        elif elements.shapeType == 'sphere':
+            collision.geometry.sphere.radius = float(shape.getAttribute('radius'))
             link.collision.append(collision)
-        elif hasElement(geometryElement, 'mesh'):
-            meshfile = geometryElement.getElementsByTagName('mesh')[0].getAttribute('filename')
+        elif elements.shapeType == 'mesh':
+            meshfile = shape.getAttribute('filename')
             if not os.path.isabs(meshfile):
                 # Use the path relative to the output file
                 meshfile = os.path.normpath(os.path.relpath(os.path.join(path, meshfile), outputDirectory))
             extension = os.path.splitext(meshfile)[1].lower()
-            if geometryElement.getElementsByTagName('mesh')[0].getAttribute('scale'):
-                meshScale = geometryElement.getElementsByTagName('mesh')[0].getAttribute('scale').split()
+            if shape.getAttribute('scale'):
+                meshScale = shape.getAttribute('scale').split()
                 collision.scale[0] = float(meshScale[0])
                 collision.scale[1] = float(meshScale[1])
                 collision.scale[2] = float(meshScale[2])
-                if (targetVersion >= 'R2023b' and collision.scale[0] != 1.0 and collision.scale[1] != 1.0
+                if (context.targetVersion >= 'R2023b' and collision.scale[0] != 1.0 and collision.scale[1] != 1.0
                         and collision.scale[2] != 1.0):
                     print('\033[1;33mWarning: BoundingObjects (collisions tags) cannot be scaled in version R2023b and above!'
                           ' Please create a separate model.\033[0m')
                 if collision.scale[0] * collision.scale[1] * collision.scale[2] < 0.0:
                     if extension in ['.dae', '.obj', '.stl']:
                         collision.geometry.mesh.ccw = False
+            meshPath = os.path.join(outputDirectory, meshfile)
             # hack for gazebo mesh database
             if meshfile.count('package'):
                 idx0 = meshfile.find('package://')
@@ -690,32 +958,32 @@ def getCollision(link, node, path, outputDirectory):
                 name = os.path.splitext(os.path.basename(meshfile))[0]
                 if not collision.geometry.mesh.ccw:
                     name += '_cw'
-                if name in Geometry.reference:
-                    collision.geometry = Geometry.reference[name]
+                key = getMeshKey(meshPath, 'Mesh', collision.geometry.mesh.ccw)
+                if key in context.geometryReference:
+                    collision.geometry = context.geometryReference[key]
                 else:
                     if extension in ['.dae', '.obj', '.stl']:
                         collision.geometry.mesh.url = '"' + meshfile + '"'
-                    collision.geometry.name = name
-                    Geometry.reference[name] = collision.geometry
+                    collision.geometry.name = getUniqueGeometryName(context, name)
+                    context.geometryReference[key] = collision.geometry
                 link.collision.append(collision)
             else:
                 print('Unsupported mesh format for collision: \"' + extension + '\"')
 
 
-def getAxis(node):
+def getAxis(axisElement):
     """Parse rotation axis of a joint."""
     axis = [0.0, 0.0, 0.0]
-    axisElement = node.getElementsByTagName('axis')[0].getAttribute('xyz').split()
-    axis[0] = float(axisElement[0])
-    axis[1] = float(axisElement[1])
-    axis[2] = float(axisElement[2])
+    axisString = axisElement.getAttribute('xyz').split()
+    axis[0] = float(axisString[0])
+    axis[1] = float(axisString[1])
+    axis[2] = float(axisString[2])
     return axis
 
 
-def getCalibration(node):
+def getCalibration(calibrationElement):
     """Get the URDF calibration tag."""
     calibration = Calibration()
-    calibrationElement = node.getElementsByTagName('calibration')[0]
     if hasElement(calibrationElement, 'rising'):
         calibration.limit = calibrationElement.getAttribute('rising')
         calibration.rising = True
@@ -725,10 +993,9 @@ def getCalibration(node):
     return calibration
 
 
-def getDynamics(node):
+def getDynamics(dynamicsElement):
     """Parse dynamics parameters of a joint."""
     dynamics = Dynamics()
-    dynamicsElement = node.getElementsByTagName('dynamics')[0]
     if dynamicsElement.getAttribute('damping'):
         dynamics.damping = float(dynamicsElement.getAttribute('damping'))
     if dynamicsElement.getAttribute('friction'):
@@ -736,10 +1003,9 @@ def getDynamics(node):
     return dynamics
 
 
-def getLimit(node):
+def getLimit(limitElement):
     """Get limits of a joint."""
     limit = Limit()
-    limitElement = node.getElementsByTagName('limit')[0]
     if limitElement.getAttribute('lower'):
         limit.lower = float(limitElement.getAttribute('lower'))
     if limitElement.getAttribute('upper'):
@@ -750,65 +1016,206 @@ def getLimit(node):
     return limit
 
 
-def getSafety(node):
+def getSafety(safetyElement):
     """Get safety controller of a joint."""
     safety = Safety()
-    if node.getElementsByTagName('safety_controller')[0].getAttribute('soft_lower_limit'):
-        safety.lower = float(node.getElementsByTagName('safety_controller')[0].getAttribute('soft_lower_limit'))
-    if node.getElementsByTagName('safety_controller')[0].getAttribute('soft_upper_limit'):
-        safety.upper = float(node.getElementsByTagName('safety_controller')[0].getAttribute('soft_upper_limit'))
-    if node.getElementsByTagName('safety_controller')[0].getAttribute('k_position'):
-        safety.kPosition = float(node.getElementsByTagName('safety_controller')[0].getAttribute('k_position'))
-    safety.kVelocity = float(node.getElementsByTagName('safety_controller')[0].getAttribute('k_velocity'))
+    if safetyElement.getAttribute('soft_lower_limit'):
+        safety.lower = float(safetyElement.getAttribute('soft_lower_limit'))
+    if safetyElement.getAttribute('soft_upper_limit'):
+        safety.upper = float(safetyElement.getAttribute('soft_upper_limit'))
+    if safetyElement.getAttribute('k_position'):
+        safety.kPosition = float(safetyElement.getAttribute('k_position'))
+    safety.kVelocity = float(safetyElement.getAttribute('k_velocity'))
     return safety
 
 
-def getLink(node, path, outputDirectory):
+def getLink(context, node, path, outputDirectory):
     """Parse a link."""
     link = Link()
     link.name = node.getAttribute('name')
-    if hasElement(node, 'inertial'):
-        link.inertia = getInertia(node)
-    if hasElement(node, 'visual'):
-        getVisual(link, node, path, outputDirectory)
-    if hasElement(node, 'collision'):
-        getCollision(link, node, path, outputDirectory)
-    if not any([hasElement(node, 'inertial'), hasElement(node, 'visual'), hasElement(node, 'collision')]):
+    elements = LinkElements(node)
+    if elements.inertial is not None:
+        link.inertia = getInertia(elements.inertial, context)
+    if elements.visuals:
+        getVisual(context, link, elements.visuals, path, outputDirectory)
+    if elements.collisions:
+        getCollision(context, link, elements.collisions, path, outputDirectory)
+    if elements.inertial is None and not elements.visuals and not elements.collisions:
         link.inertia.mass = None
     return link
 
 
-def getJoint(node):
+def getMaterial(context, node):
+    """Parse a material defined at the robot level, unless a material with the same name already exists."""
+    if not node.hasAttribute('name') or node.getAttribute('name') not in context.namedMaterial:
+        material = Material()
+        material.parseFromMaterialNode(node, context)
+
+
+def getJoint(node, context=None):
     """Parse a joint."""
     joint = Joint()
     joint.name = node.getAttribute('name')
     joint.type = node.getAttribute('type')
-    if hasElement(node, 'origin'):
-        if node.getElementsByTagName('origin')[0].getAttribute('xyz'):
-            joint.position = getPosition(node)
-        if node.getElementsByTagName('origin')[0].getAttribute('rpy'):
-            joint.rotation = getRotation(node)
-    joint.parent = node.getElementsByTagName('parent')[0].getAttribute('link')
-    joint.child = node.getElementsByTagName('child')[0].getAttribute('link')
-    if hasElement(node, 'axis'):
-        joint.axis = getAxis(node)
-    if hasElement(node, 'calibration'):
-        joint.calibration = getCalibration(node)
-    if hasElement(node, 'dynamics'):
-        joint.dynamics = getDynamics(node)
-    if hasElement(node, 'limit'):
-        joint.limit = getLimit(node)
-    if hasElement(node, 'safety_controller'):
-        joint.safety = getSafety(node)
+    elements = getChildElements(node)
+    setOrigin(joint, getChildElement(elements, 'origin'), context)
+    joint.parent = getChildElement(elements, 'parent').getAttribute('link')
+    joint.child = getChildElement(elements, 'child').getAttribute('link')
+    axisElement = getChildElement(elements, 'axis')
+    if axisElement is not None:
+        joint.axis = getAxis(axisElement)
+    calibrationElement = getChildElement(elements, 'calibration')
+    if calibrationElement is not None:
+        joint.calibration = getCalibration(calibrationElement)
+    dynamicsElement = getChildElement(elements, 'dynamics')
+    if dynamicsElement is not None:
+        joint.dynamics = getDynamics(dynamicsElement)
+    limitElement = getChildElement(elements, 'limit')
+    if limitElement is not None:
+        joint.limit = getLimit(limitElement)
+    safetyElement = getChildElement(elements, 'safety_controller')
+    if safetyElement is not None:
+        joint.safety = getSafety(safetyElement)
     return joint
 
 
+def fitCollisionPrimitives(linkList, outputDirectory, tolerance=None, linkTolerances=None):
+    """
+    Replace the collision meshes by the enclosing box, cylinder, sphere or capsule of smallest volume.
+
+    A mesh is replaced if the volume of the primitive exceeds the one of the mesh by at most 'tolerance' (relative), which
+    can be overridden for some links by 'linkTolerances'. Return the fitting report, one entry per collision mesh.
+    """
+    from urdf2webots.mesh_utils import readMesh, fitPrimitive
+    report = []
+    fits = {}  # (mesh path, scale) -> fitted primitive
+    for link in linkList:
+        linkTolerance = linkTolerances.get(link.name, tolerance) if linkTolerances else tolerance
+        if linkTolerance is None:
+            continue
+        for collision in link.collision:
+            if not collision.geometry.mesh.url:
+                continue
+            meshPath = os.path.join(outputDirectory, collision.geometry.mesh.url.strip('"'))
+            entry = {'link': link.name, 'mesh': collision.geometry.mesh.url.strip('"'), 'primitive': None, 'error': None,
+                     'replaced': False}
+            report.append(entry)
+            key = (meshPath, tuple(collision.scale))
+            if key not in fits:
+                try:
+                    vertices, triangles = readMesh(meshPath)
+                    fits[key] = fitPrimitive(vertices * collision.scale, triangles)
+                except Exception as e:
+                    fits[key] = '%s: %s' % (type(e).__name__, e)
+            fit = fits[key]
+            if fit is None or isinstance(fit, str):
+                entry['reason'] = fit if fit is not None else 'not a closed mesh'
+                print('Collision mesh "%s" of link "%s" kept: %s' % (entry['mesh'], link.name, entry['reason']))
+                continue
+            entry['primitive'] = fit['type']
+            entry['error'] = fit['error']
+            if fit['error'] > linkTolerance:
+                print('Collision mesh "%s" of link "%s" kept: the best %s has a volume error of %.1f%%' %
+                      (entry['mesh'], link.name, fit['type'], 100.0 * fit['error']))
+                continue
+            entry['replaced'] = True
+            print('Collision mesh "%s" of link "%s" replaced by a %s, volume error of %.1f%%' %
+                  (entry['mesh'], link.name, fit['type'], 100.0 * fit['error']))
+            geometry = Geometry()
+            if fit['type'] == 'box':
+                geometry.box.x, geometry.box.y, geometry.box.z = fit['size']
+            elif fit['type'] == 'cylinder':
+                geometry.cylinder.radius = fit['radius']
+                geometry.cylinder.height = fit['height']
+            elif fit['type'] == 'sphere':
+                geometry.sphere.radius = fit['radius']
+            else:
+                geometry.capsule.radius = fit['radius']
+                geometry.capsule.height = fit['height']
+            collision.geometry = geometry
+            collision.position = combineTranslations(collision.position,
+                                                     rotateVector(fit['center'].tolist(), collision.rotation))
+            collision.rotation = [float(value) for value in rotationFromMatrix(
+                multiplyMatrix(matrixFromRotation(collision.rotation), fit['rotation'].flatten().tolist()))]
+            collision.scale = [1.0, 1.0, 1.0]
+    return report
+
+
+def reduceVisualMeshes(context, linkList, outputDirectory, meshDirectory, meshBudget=None, robotBudget=None,
+                       cacheDirectory=None):
+    """
+    Replace the visual STL and OBJ meshes having too many triangles by reduced copies written in 'meshDirectory'.
+
+    A mesh is reduced to at most 'meshBudget' triangles and, if 'robotBudget' is set, to its share of the triangles of the
+    robot, each mesh being reduced in proportion to the triangles it renders. The reduced meshes are stored in
+    cacheDirectory by content hash and triangle count so that the next conversions don't reduce them again. The collision
+    meshes are kept as they are. Return the reduction report, one entry per visual mesh file.
+    """
+    from urdf2webots.mesh_utils import readMesh, writeReducedMesh
+    report = []
+    meshes = {}  # id of the geometry -> report entry, vertices, triangles and the visuals using it
+    for link in linkList:
+        for visual in link.visual:
+            geometry = visual.geometry
+            if geometry.type not in ['mesh', 'cadShape']:
+                continue
+            if id(geometry) in meshes:
+                meshes[id(geometry)][3].append(visual)
+                continue
+            url = geometry.shape.url.strip('"')
+            entry = {'mesh': url, 'triangles': None, 'target': None, 'reducedTriangles': None, 'file': None,
+                     'cachedFile': None}
+            report.append(entry)
+            vertices = triangles = None
+            if geometry.type == 'cadShape':
+                entry['reason'] = 'CadShape nodes keep the materials of their file'
+            elif os.path.splitext(url)[1].lower() not in ['.stl', '.obj']:
+                entry['reason'] = 'only STL and OBJ meshes are reduced'
+            else:
+                try:
+                    vertices, triangles = readMesh(os.path.join(outputDirectory, url))
+                    entry['triangles'] = len(triangles)
+                except Exception as e:
+                    entry['reason'] = '%s: %s' % (type(e).__name__, e)
+            meshes[id(geometry)] = (entry, vertices, triangles, [visual])
+
+    renderedTriangles = sum(entry['triangles'] * len(visuals) for entry, _, _, visuals in meshes.values()
+                            if entry['triangles'])
+    for entry, vertices, triangles, visuals in meshes.values():
+        if entry['triangles'] is None:
+            print('Visual mesh "%s" kept: %s' % (entry['mesh'], entry['reason']))
+            continue
+        target = entry['triangles']
+        if meshBudget is not None:
+            target = min(target, meshBudget)
+        if robotBudget is not None and renderedTriangles > robotBudget:
+            target = min(target, max(MIN_REDUCED_TRIANGLES, entry['triangles'] * robotBudget // renderedTriangles))
+        if target >= entry['triangles']:
+            continue
+        entry['target'] = target
+        sourceHash = urdf2webots.cache.hashFile(os.path.join(outputDirectory, entry['mesh']))
+        name = '%s_%s_%d.stl' % (os.path.splitext(os.path.basename(entry['mesh']))[0], sourceHash[:8], target)
+        entry['file'] = os.path.join(meshDirectory, name)
+        if cacheDirectory is not None:
+            entry['cachedFile'] = os.path.join(cacheDirectory, '%s_%d.stl' % (sourceHash, target))
+        os.makedirs(meshDirectory, exist_ok=True)
+        entry['reducedTriangles'] = writeReducedMesh(vertices, triangles, target, entry['file'], entry['cachedFile'])
+        print('Visual mesh "%s" reduced from %d to %d triangles' %
+              (entry['mesh'], entry['triangles'], entry['reducedTriangles']))
+        # the geometry can also be the one of collisions, the visuals get a new one
+        oldGeometry = visuals[0].geometry
+        geometry = Geometry()
+        geometry.mesh.url = '"' + os.path.relpath(entry['file'], outputDirectory) + '"'
+        geometry.mesh.ccw = oldGeometry.mesh.ccw
+        geometry.name = getUniqueGeometryName(context, os.path.splitext(name)[0])
+        for visual in visuals:
+            visual.geometry = geometry
+    return report
+
+
 def isRootLink(link, childList):
     """Check if a link is root link."""
-    for child in childList:
-        if link == child:
-            return False
-    return True
+    return link not in childList
 
 
 def removeDummyLinksAndStaticBaseFlag(linkList, jointList, sensorList, toolSlot):
@@ -884,7 +1291,94 @@ def removeDummyLinksAndStaticBaseFlag(linkList, jointList, sensorList, toolSlot)
     return staticBase
 
 
-def parseGazeboElement(element, parentLink, linkList):
+def combinePoses(position, rotation, framePosition, frameRotation):
+    """Return the pose, given relatively to a frame, expressed in the parent of this frame."""
+    combinedPosition = combineTranslations(framePosition, rotateVector(position, frameRotation))
+    combinedRotation = rotationFromMatrix(multiplyMatrix(matrixFromRotation(frameRotation), matrixFromRotation(rotation)))
+    return combinedPosition, [float(value) for value in combinedRotation]
+
+
+def getInertiaMatrix(inertia, frameRotation):
+    """Return the inertia matrix of a link, around its center of mass, in the parent frame of the link."""
+    import numpy
+    inertiaMatrix = numpy.array([[inertia.ixx, inertia.ixy, inertia.ixz],
+                                 [inertia.ixy, inertia.iyy, inertia.iyz],
+                                 [inertia.ixz, inertia.iyz, inertia.izz]])
+    if inertia.rotation[3] != 0.0:
+        # same convention as the writer for the rotated inertia matrices
+        R = numpy.array(matrixFromRotation(inertia.rotation)).reshape(3, 3)
+        inertiaMatrix = R.T @ inertiaMatrix @ R
+    frame = numpy.array(matrixFromRotation(frameRotation)).reshape(3, 3)
+    return frame @ inertiaMatrix @ frame.T
+
+
+def mergeFixedLinks(linkList, jointList, sensorList, toolSlot):
+    """
+    Merge the links attached by a fixed joint into their parent link, return the number of merged links.
+
+    The masses, centers of mass and inertia matrices are combined, the latter being shifted with the parallel axis
+    theorem, and the visuals, collisions and child joints of the merged links are moved into the frame of their parent.
+    Only the links attached to a parent with a mass are merged, the links referenced by sensors, carrying a force sensor
+    or the tool slot are kept.
+    """
+    import numpy
+    links = {link.name: link for link in linkList}
+    parentJoints = {joint.child: joint for joint in jointList}
+    keptLinks = set(sensor.parentLink for sensor in sensorList)
+    keptLinks.add(toolSlot)
+
+    def getDepth(name):
+        depth = 0
+        while name in parentJoints and depth <= len(jointList):
+            name = parentJoints[name].parent
+            depth += 1
+        return depth
+
+    # merge the deepest links first so that the links merged into a merged link follow it
+    mergedLinks = set()
+    fixedJoints = [joint for joint in jointList if joint.type == 'fixed']
+    fixedJoints.sort(key=lambda joint: getDepth(joint.child), reverse=True)
+    for joint in fixedJoints:
+        parent = links.get(joint.parent)
+        child = links.get(joint.child)
+        if parent is None or child is None or parent.inertia.mass is None or child.name in keptLinks or \
+                child.forceSensor or parent.forceSensor:
+            continue
+        for item in child.visual + child.collision:
+            item.position, item.rotation = combinePoses(item.position, item.rotation, joint.position, joint.rotation)
+        parent.visual.extend(child.visual)
+        parent.collision.extend(child.collision)
+        for childJoint in jointList:
+            if childJoint.parent == child.name:
+                childJoint.parent = parent.name
+                childJoint.position, childJoint.rotation = combinePoses(childJoint.position, childJoint.rotation,
+                                                                        joint.position, joint.rotation)
+        if child.inertia.mass:
+            parentInertia = parent.inertia
+            childPosition = combineTranslations(joint.position, rotateVector(child.inertia.position, joint.rotation))
+            mass = parentInertia.mass + child.inertia.mass
+            centerOfMass = (parentInertia.mass * numpy.array(parentInertia.position) +
+                            child.inertia.mass * numpy.array(childPosition)) / mass
+            inertiaMatrix = numpy.zeros((3, 3))
+            for itemMass, itemPosition, itemMatrix in [
+                    (parentInertia.mass, parentInertia.position, getInertiaMatrix(parentInertia, [0.0, 0.0, 1.0, 0.0])),
+                    (child.inertia.mass, childPosition, getInertiaMatrix(child.inertia, joint.rotation))]:
+                offset = numpy.array(itemPosition) - centerOfMass
+                inertiaMatrix += itemMatrix + itemMass * (numpy.dot(offset, offset) * numpy.identity(3) -
+                                                          numpy.outer(offset, offset))
+            parentInertia.mass = mass
+            parentInertia.position = centerOfMass.tolist()
+            parentInertia.rotation = [0.0, 0.0, 1.0, 0.0]
+            parentInertia.ixx, parentInertia.ixy, parentInertia.ixz = inertiaMatrix[0].tolist()
+            parentInertia.iyy, parentInertia.iyz = inertiaMatrix[1, 1:].tolist()
+            parentInertia.izz = float(inertiaMatrix[2, 2])
+        jointList.remove(joint)
+        mergedLinks.add(child.name)
+    linkList[:] = [link for link in linkList if link.name not in mergedLinks]
+    return len(mergedLinks)
+
+
+def parseGazeboElement(context, element, parentLink, linkList):
     """Parse a Gazebo element."""
     if element.hasAttribute("reference") and any([link.name == element.getAttribute('reference') for link in linkList]):
         parentLink = element.getAttribute("reference")
@@ -896,7 +1390,7 @@ def parseGazeboElement(element, parentLink, linkList):
                 imu.name = plugin.getElementsByTagName('topicName')[0].firstChild.nodeValue
             if hasElement(plugin, 'gaussianNoise'):
                 imu.gaussianNoise = float(plugin.getElementsByTagName('gaussianNoise')[0].firstChild.nodeValue)
-            IMU.list.append(imu)
+            context.imus.append(imu)
         elif plugin.hasAttribute('filename') and plugin.getAttribute('filename').startswith('libgazebo_ros_f3d'):
             if hasElement(plugin, "bodyName"):
                 name = plugin.getElementsByTagName('bodyName')[0].firstChild.nodeValue
@@ -913,7 +1407,7 @@ def parseGazeboElement(element, parentLink, linkList):
                 print('\033[1;33mWarning: URDF parser cannot handle \"xyzOffsets\" from p3d!\033[0m')
             if hasElement(plugin, "rpyOffsets"):
                 print('\033[1;33mWarning: URDF parser cannot handle \"rpyOffsets\" from p3d!\033[0m')
-            P3D.list.append(p3d)
+            context.p3ds.append(p3d)
     for sensorElement in element.getElementsByTagName('sensor'):
         if sensorElement.getAttribute('type') == 'camera':
             camera = Camera()
@@ -937,7 +1431,7 @@ def parseGazeboElement(element, parentLink, linkList):
                 noiseElement = sensorElement.getElementsByTagName('noise')[0]
                 if hasElement(noiseElement, 'stddev'):
                     camera.noise = float(noiseElement.getElementsByTagName('stddev')[0].firstChild.nodeValue)
-            Camera.list.append(camera)
+            context.cameras.append(camera)
         elif sensorElement.getAttribute('type') == 'depth':
             rangefinder = RangeFinder()
             rangefinder.parentLink = parentLink
@@ -979,7 +1473,7 @@ def parseGazeboElement(element, parentLink, linkList):
                 rangefinder.near = rangefinder.minRange
             elif not rangefinder.minRange and rangefinder.near > 0.01:
                 rangefinder.minRange = rangefinder.near
-            RangeFinder.list.append(rangefinder)
+            context.rangeFinders.append(rangefinder)
         elif sensorElement.getAttribute('type') == 'ray' or sensorElement.getAttribute('type') == 'gpu_ray':
             lidar = Lidar()
             lidar.parentLink = parentLink
@@ -1033,4 +1527,4 @@ def parseGazeboElement(element, parentLink, linkList):
                     lidar.near = lidar.minRange
                 elif not lidar.minRange and lidar.near > 0.01:
                     lidar.minRange = lidar.near
-            Lidar.list.append(lidar)
+            context.lidars.append(lidar)
@@ -0,0 +1,254 @@
+"""Long-running conversion server answering the conversion requests of other processes over HTTP."""
+import collections
+import concurrent.futures
+import contextlib
+import http.server
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+
+import urdf2webots.importer
+import urdf2webots.packages
+
+# arguments of convertUrdfContent() that a request can set, 'input' being the URDF content, none of them choosing where
+# the files are written as the requests may come from any process or web page of the host
+REQUEST_ARGUMENTS = ['input', 'robotName', 'normal', 'boxCollision', 'toolSlot', 'initTranslation', 'initRotation',
+                     'initPos', 'linkToDef', 'jointToDef', 'targetVersion', 'parser', 'collisionTolerance',
+                     'linkCollisionTolerances', 'mergeFixedLinks', 'meshTriangleBudget', 'robotTriangleBudget',
+                     'textureMaxSize', 'textureFormat']
+
+DEFAULT_ROBOT_NAME = 'robot'
+
+THROUGHPUT_PERIOD = 60.0  # seconds
+
+
+def initializeWorker(cacheDir, outputDirectory=None):
+    """Write the generated files in the output directory and share the package index of the cache directory."""
+    if outputDirectory:
+        os.makedirs(outputDirectory, exist_ok=True)
+        os.chdir(outputDirectory)
+    if cacheDir:
+        urdf2webots.packages.packageIndex.setFile(os.path.join(cacheDir, 'packages', 'index.json'))
+
+
+def convertRequest(request, cacheDir=None, cacheMaxSize=None):
+    """Run a conversion request in a worker and report its outcome instead of raising."""
+    report = {'success': False, 'time': 0.0, 'error': None}
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        unknownArguments = sorted(set(request) - set(REQUEST_ARGUMENTS))
+        if unknownArguments:
+            raise ValueError('unknown arguments: %s' % ', '.join(unknownArguments))
+        if not request.get('input'):
+            raise ValueError('the "input" URDF content of a request is mandatory')
+        # a Robot node string is always returned, its meshes and textures being written in the output directory
+        robotName = request.get('robotName') or DEFAULT_ROBOT_NAME
+        if not isinstance(robotName, str) or robotName in ['.', '..'] or os.path.basename(robotName) != robotName:
+            raise ValueError('the "robotName" of a request cannot be a path')
+        with contextlib.redirect_stdout(log):
+            report['robotString'] = urdf2webots.importer.convertUrdfContent(
+                cacheDir=cacheDir, cacheMaxSize=cacheMaxSize, **dict(request, robotName=robotName))
+        report['success'] = True
+    except SystemExit as e:
+        report['error'] = str(e.code)
+    except Exception as e:
+        report['error'] = '%s: %s' % (type(e).__name__, e)
+    report['time'] = time.perf_counter() - start
+    report['log'] = log.getvalue()
+    return report
+
+
+class ServerStats():
+    """Health and throughput of a conversion server, updated by the threads handling the requests."""
+
+    def __init__(self, workers):
+        """Initialization."""
+        self.workers = workers
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.inFlight = 0
+        self.conversionTime = 0.0  # seconds spent in the workers
+        self.completions = collections.deque()  # completion times of the last THROUGHPUT_PERIOD seconds
+
+    def begin(self):
+        """Record a new request."""
+        with self.lock:
+            self.requests += 1
+            self.inFlight += 1
+
+    def end(self, report):
+        """Record the report of a request."""
+        now = time.monotonic()
+        with self.lock:
+            self.inFlight -= 1
+            if report['success']:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.conversionTime += report['time']
+            self.completions.append(now)
+            while self.completions[0] < now - THROUGHPUT_PERIOD:
+                self.completions.popleft()
+
+    def getHealth(self):
+        """Return the state of the server."""
+        return {'status': 'ok', 'pid': os.getpid(), 'workers': self.workers, 'uptime': time.monotonic() - self.start}
+
+    def getReport(self):
+        """Return the numbers of requests, their average conversion time and the throughput in requests per second."""
+        now = time.monotonic()
+        with self.lock:
+            while self.completions and self.completions[0] < now - THROUGHPUT_PERIOD:
+                self.completions.popleft()
+            uptime = now - self.start
+            completed = self.succeeded + self.failed
+            return {
+                'uptime': uptime,
+                'workers': self.workers,
+                'requests': self.requests,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'inFlight': self.inFlight,
+                'averageTime': self.conversionTime / completed if completed else 0.0,
+                'throughput': completed / uptime if uptime > 0 else 0.0,
+                'recentThroughput': len(self.completions) / min(uptime, THROUGHPUT_PERIOD) if uptime > 0 else 0.0
+            }
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answer the HTTP requests of a conversion server: POST /convert, GET /health and GET /stats."""
+
+    protocol_version = 'HTTP/1.1'  # keep the connections alive between requests
+
+    def sendJson(self, status, content):
+        """Send a JSON response."""
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Report the health or the throughput of the server."""
+        if self.path == '/health':
+            self.sendJson(200, self.server.conversionServer.stats.getHealth())
+        elif self.path == '/stats':
+            self.sendJson(200, self.server.conversionServer.stats.getReport())
+        else:
+            self.sendJson(404, {'error': 'unknown path "%s"' % self.path})
+
+    def do_POST(self):
+        """Convert the URDF content of a JSON request, the other entries being the arguments of convertUrdfContent()."""
+        if self.path != '/convert':
+            self.sendJson(404, {'error': 'unknown path "%s"' % self.path})
+            return
+        # the web pages can only post JSON content to another origin after a CORS preflight request, which is not answered
+        if self.headers.get('Content-Type', '').split(';')[0].strip().lower() != 'application/json':
+            self.sendJson(415, {'success': False, 'error': 'the content type of a request has to be "application/json"'})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if not isinstance(request, dict):
+                raise ValueError('the request has to be a JSON object')
+        except ValueError as e:
+            self.sendJson(400, {'success': False, 'error': 'invalid request: %s' % e})
+            return
+        self.sendJson(200, self.server.conversionServer.convert(request))
+
+    def log_message(self, format, *args):
+        """Don't log the requests, there can be hundreds per second."""
+        pass
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server listening on a Unix domain socket."""
+
+    daemon_threads = True
+
+    def get_request(self):
+        """Accept a connection, giving an address that BaseHTTPRequestHandler can use."""
+        request, _ = super().get_request()
+        return request, ('local', 0)
+
+
+class ConversionServer():
+    """
+    Convert the URDF contents received over HTTP in a pool of long-running worker processes.
+
+    The address is either "host:port", port 0 choosing a free port, or "unix:path" for a Unix domain socket. The workers
+    keep their modules, package index and file hashes from one request to the next, and the conversions are cached in
+    cacheDir if it is set. The requests cannot choose where files are written: the conversions return Robot node strings
+    and their reduced meshes and textures are written in outputDirectory, the current directory by default.
+    """
+
+    def __init__(self, address='127.0.0.1:8765', workers=None, cacheDir=None, cacheMaxSize=None, outputDirectory=None):
+        """Initialization."""
+        self.workers = workers or os.cpu_count() or 1
+        self.cacheDir = os.path.abspath(cacheDir) if cacheDir else None  # the workers change their current directory
+        self.outputDirectory = os.path.abspath(outputDirectory) if outputDirectory else None
+        self.cacheMaxSize = cacheMaxSize
+        self.stats = ServerStats(self.workers)
+        self.socketPath = None
+        if address.startswith('unix:'):
+            self.socketPath = address[len('unix:'):]
+            if os.path.exists(self.socketPath):
+                os.remove(self.socketPath)  # left by a previous server
+            self.httpServer = ThreadingUnixHTTPServer(self.socketPath, RequestHandler)
+        else:
+            host, _, port = address.rpartition(':')
+            self.httpServer = http.server.ThreadingHTTPServer((host or '127.0.0.1', int(port)), RequestHandler)
+            self.httpServer.daemon_threads = True
+        self.httpServer.conversionServer = self
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=initializeWorker,
+                                                               initargs=(self.cacheDir, self.outputDirectory))
+
+    def getAddress(self):
+        """Return the address the server is listening on."""
+        if self.socketPath is not None:
+            return 'unix:' + self.socketPath
+        return '%s:%d' % self.httpServer.server_address[:2]
+
+    def convert(self, request):
+        """Convert a request in a worker and return its report."""
+        self.stats.begin()
+        try:
+            report = self.executor.submit(convertRequest, request, self.cacheDir, self.cacheMaxSize).result()
+        except Exception as e:  # the worker process died
+            report = {'success': False, 'time': 0.0, 'error': '%s: %s' % (type(e).__name__, e), 'log': ''}
+        self.stats.end(report)
+        return report
+
+    def serveForever(self):
+        """Answer the requests until shutdown() is called or the process is interrupted."""
+        try:
+            self.httpServer.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def shutdown(self):
+        """Stop serveForever(), to be called from another thread."""
+        self.httpServer.shutdown()
+
+    def close(self):
+        """Stop the workers and release the socket."""
+        self.httpServer.server_close()
+        self.executor.shutdown()
+        if self.socketPath is not None and os.path.exists(self.socketPath):
+            os.remove(self.socketPath)
+
+
+def serve(address='127.0.0.1:8765', workers=None, cacheDir=None, cacheMaxSize=None, outputDirectory=None):
+    """Run a conversion server until interrupted, see ConversionServer."""
+    server = ConversionServer(address, workers, cacheDir, cacheMaxSize, outputDirectory)
+    print('Serving conversions on %s with %d workers, press Ctrl+C to stop.' % (server.getAddress(), server.workers))
+    server.serveForever()
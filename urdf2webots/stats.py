@@ -0,0 +1,95 @@
+"""Instrumentation of the conversions."""
+import contextlib
+import functools
+import json
+import time
+
+
+class ConversionStats():
+    """Wall time, number of calls and number of items of the phases of a conversion.
+
+    Phases can be nested, the time of a phase includes the time of its nested phases while its self time doesn't. The
+    optional callback is called with the name and duration of each phase when it ends. If 'profile' is set, the whole
+    conversion runs in cProfile. An instance records a single conversion at a time.
+    """
+
+    def __init__(self, profile=False, callback=None):
+        """Initialization."""
+        self.profile = profile
+        self.callback = callback
+        self.phases = {}
+        self.counts = {}
+        self.total = 0.0
+        self.outputFile = None
+        self.profiler = None
+        self.stack = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measure the phase running while the context is active."""
+        start = time.perf_counter()
+        self.stack.append(0.0)  # time spent in the nested phases
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            nestedDuration = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += duration
+            phase = self.phases.setdefault(name, {'time': 0.0, 'selfTime': 0.0, 'calls': 0})
+            phase['time'] += duration
+            phase['selfTime'] += duration - nestedDuration
+            phase['calls'] += 1
+            if self.callback is not None:
+                self.callback(name, duration)
+
+    def count(self, name, number=1):
+        """Add items to a counter."""
+        self.counts[name] = self.counts.get(name, 0) + number
+
+    def getReport(self, functions=30):
+        """Return the results as a dictionary, with the 'functions' slowest functions if cProfile was used."""
+        report = {
+            'total': self.total,
+            'phases': self.phases,
+            'counts': self.counts
+        }
+        if self.profiler is not None:
+            import pstats  # only needed when profiling, like cProfile
+            profile = pstats.Stats(self.profiler)
+            entries = sorted(profile.stats.items(), key=lambda item: item[1][3], reverse=True)[:functions]
+            report['functions'] = [{
+                'function': '%s:%d(%s)' % key,
+                'calls': value[1],
+                'totalTime': value[2],
+                'cumulativeTime': value[3]
+            } for key, value in entries]
+        return report
+
+    def write(self, path):
+        """Write the results in a JSON file and, if cProfile was used, its raw statistics in a '.prof' file next to it."""
+        with open(path, 'w') as file:
+            json.dump(self.getReport(), file, indent=2)
+        if self.profiler is not None:
+            self.profiler.dump_stats(path.rsplit('.', 1)[0] + '.prof')
+
+
+def instrumented(function):
+    """Measure the total duration of a conversion function called with a 'stats' keyword argument."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        stats = kwargs.get('stats')
+        if stats is None:
+            return function(*args, **kwargs)
+        if stats.profile:
+            import cProfile
+            stats.profiler = cProfile.Profile()
+            stats.profiler.enable()
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats.total += time.perf_counter() - start
+            if stats.profiler is not None:
+                stats.profiler.disable()
+    return wrapper
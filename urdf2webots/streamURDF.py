@@ -0,0 +1,134 @@
+"""Incremental URDF parser based on xml.etree.ElementTree.iterparse."""
+import xml.etree.ElementTree as ET
+
+from urdf2webots.parserURDF import getJoint, getLink, getMaterial
+
+
+class NodeList(list):
+    """List of elements exposing the 'length' attribute of minidom node lists."""
+
+    @property
+    def length(self):
+        """Number of elements."""
+        return len(self)
+
+
+class TextNode():
+    """Text content of an element."""
+
+    TEXT_NODE = 3
+    nodeType = TEXT_NODE
+
+    def __init__(self, value):
+        """Initialization."""
+        self.nodeValue = value
+
+
+class Element():
+    """Expose an ElementTree element through the subset of the minidom API used by parserURDF."""
+
+    ELEMENT_NODE = 1
+    nodeType = ELEMENT_NODE
+    nodeValue = None
+
+    def __init__(self, element, resolveUri=None):
+        """Initialization."""
+        self.element = element
+        self.resolveUri = resolveUri
+        self.tagName = element.tag
+        self.localName = element.tag.rsplit('}', 1)[-1]
+
+    def getAttribute(self, name):
+        """Return the value of an attribute, an empty string if it is not set."""
+        value = self.element.get(name, '')
+        if self.resolveUri is not None and value.startswith('package://'):
+            value = self.resolveUri(value)
+        return value
+
+    def hasAttribute(self, name):
+        """Check if an attribute is set."""
+        return name in self.element.attrib
+
+    @property
+    def childNodes(self):
+        """Child elements."""
+        return NodeList(Element(child, self.resolveUri) for child in self.element)
+
+    @property
+    def firstChild(self):
+        """Text content or first child element."""
+        if self.element.text is not None:
+            return TextNode(self.element.text)
+        for child in self.element:
+            return Element(child, self.resolveUri)
+        return None
+
+    def getElementsByTagName(self, tag):
+        """Return all the descendant elements called 'tag'."""
+        return NodeList(Element(element, self.resolveUri) for element in self.element.iter(tag)
+                        if element is not self.element)
+
+
+class RobotParser():
+    """Parse a URDF document top-level element by top-level element, dropping each one once it has been consumed.
+
+    Only the <gazebo> elements are kept until the end of the document because they refer to links that may be defined
+    after them. Visuals referring to a top-level material defined later in the document are updated once it is parsed.
+    """
+
+    def __init__(self, context, source, resolveUri=None):
+        """Initialization, read the document until the start of its root element."""
+        self.context = context
+        self.events = ET.iterparse(source, events=('start', 'end'))
+        self.resolveUri = resolveUri
+        self.robot = None
+        for event, element in self.events:
+            if Element(element).localName == 'robot':
+                self.robot = element
+            break
+
+    def getRobotElement(self):
+        """Return the root <robot> element (without any child), None if the document is not a URDF."""
+        return Element(self.robot, self.resolveUri) if self.robot is not None else None
+
+    def parse(self, path, outputDirectory):
+        """Return the links, joints and <gazebo> elements of the robot."""
+        linkList = []
+        jointList = []
+        gazeboElements = []
+        robotMaterials = {}
+        namedMaterial = self.context.namedMaterial
+        stats = self.context.stats
+        self.context.materialReferences = []
+        depth = 1
+        for event, element in self.events:
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            node = Element(element, self.resolveUri)
+            if node.localName == 'link':
+                with stats.phase('links'):
+                    linkList.append(getLink(self.context, node, path, outputDirectory))
+            elif node.localName == 'joint':
+                with stats.phase('joints'):
+                    jointList.append(getJoint(node, self.context))
+            elif node.localName == 'material':
+                name = node.getAttribute('name')
+                if name not in robotMaterials:
+                    # top-level materials take precedence over the named materials defined in the visuals
+                    with stats.phase('materials'):
+                        namedMaterial.pop(name, None)
+                        getMaterial(self.context, node)
+                    robotMaterials[name] = namedMaterial.get(name)
+            elif node.localName == 'gazebo':
+                gazeboElements.append(node)
+            # the consumed elements are not needed anymore
+            del self.robot[:]
+        for visual, name in self.context.materialReferences:
+            if robotMaterials.get(name) is not None:
+                visual.material = robotMaterials[name]
+        self.context.materialReferences = None
+        return linkList, jointList, gazeboElements
@@ -0,0 +1,83 @@
+"""Robot node templates, converted once and instantiated many times with their own name, pose and joint positions."""
+import re
+import sys
+
+import urdf2webots.importer
+from urdf2webots.writeRobot import getEndpointRotation, getHingePositionLine, getRotationLine
+
+slotPattern = re.compile('\x00(\\d+)\x00')  # see writeRobot.SLOT_MARKER
+
+
+def renderSlot(slot, value):
+    """Return the text of a template slot for a value, a joint position for the slots of the hinge joints."""
+    if slot['type'] == 'position':
+        return getHingePositionLine(slot['indentation'], value)
+    if slot['type'] == 'endpointRotation':
+        return getRotationLine(slot['indentation'], getEndpointRotation(slot['axis'], slot['rotation'], value))
+    return value
+
+
+class RobotTemplate():
+    """
+    Robot node string whose name, translation, rotation and initial joint positions are set by each instance.
+
+    The string is split at the slots recorded by the writer, the text of each slot being rendered once with its default
+    value. An instance only renders the slots it changes, the joints given an initial position, and joins the parts.
+    """
+
+    __slots__ = ('parts', 'slots', 'fieldSlots', 'jointSlots')
+
+    def __init__(self, robotString, slots):
+        """Initialization."""
+        self.parts = slotPattern.split(robotString)
+        self.slots = slots
+        # the slots are written in the order they are recorded, the odd parts are their indices
+        self.parts[1::2] = [renderSlot(slot, slot['default']) for slot in slots]
+        self.fieldSlots = {'name': [], 'translation': [], 'rotation': []}  # field -> indices of its slots
+        self.jointSlots = []  # indices of the slots of each hinge joint, in the order of the initial positions
+        for index, slot in enumerate(slots):
+            if slot['type'] in self.fieldSlots:
+                self.fieldSlots[slot['type']].append(index)
+            else:
+                while len(self.jointSlots) <= slot['joint']:
+                    self.jointSlots.append([])
+                self.jointSlots[slot['joint']].append(index)
+
+    def getJointCount(self):
+        """Return the number of hinge joints whose initial position can be set."""
+        return len(self.jointSlots)
+
+    def instantiate(self, name, translation=None, rotation=None, initPos=None):
+        """
+        Return the Robot node string of an instance.
+        'translation' and 'rotation' are strings of 3 and 4 values or sequences of numbers, the template values being used
+        if they are not set. 'initPos' sets the initial positions of the first hinge joints like in convertUrdfContent().
+        """
+        parts = self.parts.copy()
+        for field, value, size in [('name', name, None), ('translation', translation, 3), ('rotation', rotation, 4)]:
+            if value is None:
+                continue
+            if size is not None:
+                if not isinstance(value, str):
+                    value = ' '.join(str(number) for number in value)
+                if len(value.split()) != size:
+                    sys.exit('--%s argument is not valid. It has to be of Type = str and contain %d values.' % (field, size))
+            for index in self.fieldSlots[field]:
+                parts[2 * index + 1] = value
+        if initPos is not None:
+            for position, indices in zip(urdf2webots.importer.parseInitPos(initPos), self.jointSlots):
+                for index in indices:
+                    parts[2 * index + 1] = renderSlot(self.slots[index], position)
+        return ''.join(parts)
+
+
+def compileRobotTemplate(input, robotName='robot', initTranslation='0 0 0', initRotation='0 0 1 0', **arguments):
+    """
+    Convert a URDF content once into a RobotTemplate.
+    'robotName', 'initTranslation' and 'initRotation' are the default values of the instances, the other arguments are the
+    ones of convertUrdfContent(), the conversion cache being unused.
+    """
+    slots = []
+    robotString = urdf2webots.importer.convertUrdfContent(input, robotName=robotName, initTranslation=initTranslation,
+                                                          initRotation=initRotation, templateSlots=slots, **arguments)
+    return RobotTemplate(robotString, slots)
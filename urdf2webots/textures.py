@@ -0,0 +1,224 @@
+"""Translation of the TIFF textures, which Webots doesn't support, into PNG images and reduction of the textures."""
+import math
+import os
+import shutil
+import sys
+import tempfile
+
+import urdf2webots.cache
+
+JPEG_QUALITY = 90
+TEXTURE_FORMATS = ['auto', 'png', 'jpeg']
+
+
+def importImage():
+    """Return the Image module of PIL, only imported when a texture has to be converted."""
+    try:
+        from PIL import Image
+    except ImportError as e:
+        if sys.platform == 'linux2':
+            sys.stderr.write("PIL module not found, please install it with:\n")
+            sys.stderr.write("apt-get install python-pip\n")
+            sys.stderr.write("pip install pillow\n")
+        raise e
+    return Image
+
+
+def convertImage(source, destination, cacheDirectory=None):
+    """Convert an image into a PNG file, copying the previous conversion of the same image if it is in the cache."""
+    cachedFile = None
+    if cacheDirectory is not None:
+        sourceHash = urdf2webots.cache.hashFile(source)  # memoized by path, size and modification time
+        if sourceHash is not None:
+            cachedFile = os.path.join(cacheDirectory, sourceHash + '.png')
+            if os.path.isfile(cachedFile):
+                urdf2webots.cache.copyCachedFile(cachedFile, destination)
+                return
+    importImage().open(source).save(destination)
+    if cachedFile is not None:
+        try:
+            os.makedirs(cacheDirectory, exist_ok=True)
+            descriptor, temporaryPath = tempfile.mkstemp(dir=cacheDirectory, suffix='.tmp')
+            os.close(descriptor)
+            shutil.copyfile(destination, temporaryPath)
+            os.replace(temporaryPath, cachedFile)
+        except OSError:
+            pass
+
+
+def getTextureSize(size, maxSize):
+    """Return the power of two closest to an image size, at most the largest power of two not exceeding maxSize."""
+    power = 1 << max(0, round(math.log2(max(size, 1))))
+    return min(power, 1 << int(math.log2(maxSize)))
+
+
+def hasTransparency(image):
+    """Check if the pixels of an image can be transparent."""
+    return image.mode in ['RGBA', 'LA', 'PA', 'RGBa', 'La'] or 'transparency' in image.info
+
+
+def getCachedName(sourceHash, maxSize, imageFormat):
+    """Return the name without extension of a reduced image in the cache."""
+    return '%s_%d_%s' % (sourceHash, maxSize or 0, imageFormat or 'auto')
+
+
+def reduceImage(source, directory, name, maxSize=None, imageFormat=None, cacheDirectory=None):
+    """
+    Write an image resized to powers of two of at most maxSize pixels and re-encoded as a compressed PNG or JPEG file in
+    'directory', 'name' being its file name without extension, and return its path. With the default imageFormat 'auto',
+    the images having transparency are written as PNG files and the others as JPEG files. If cacheDirectory is set, the
+    reduced image is copied from there, and marked as recently used, if it was already reduced with the same parameters,
+    and stored there otherwise.
+    """
+    cachedName = None
+    if cacheDirectory is not None:
+        sourceHash = urdf2webots.cache.hashFile(source)  # memoized by path, size and modification time
+        if sourceHash is not None:
+            cachedName = getCachedName(sourceHash, maxSize, imageFormat)
+            for extension in ['.png', '.jpg']:
+                cachedFile = os.path.join(cacheDirectory, cachedName + extension)
+                if os.path.isfile(cachedFile):
+                    destination = os.path.join(directory, name + extension)
+                    urdf2webots.cache.copyCachedFile(cachedFile, destination)
+                    return destination
+    image = importImage().open(source)
+    if imageFormat == 'png' or (imageFormat in [None, 'auto'] and hasTransparency(image)):
+        extension = '.png'
+        if image.mode not in ['1', 'L', 'LA', 'P', 'RGB', 'RGBA']:
+            image = image.convert('RGBA' if hasTransparency(image) else 'RGB')
+    else:
+        extension = '.jpg'
+        if image.mode not in ['L', 'RGB']:
+            image = image.convert('RGB')
+    if maxSize:
+        size = (getTextureSize(image.width, maxSize), getTextureSize(image.height, maxSize))
+        if size != image.size:
+            image = image.resize(size, importImage().LANCZOS)
+    destination = os.path.join(directory, name + extension)
+    if extension == '.png':
+        image.save(destination, optimize=True)
+    else:
+        image.save(destination, quality=JPEG_QUALITY, optimize=True)
+    if cachedName is not None:
+        try:
+            os.makedirs(cacheDirectory, exist_ok=True)
+            descriptor, temporaryPath = tempfile.mkstemp(dir=cacheDirectory, suffix='.tmp')
+            os.close(descriptor)
+            shutil.copyfile(destination, temporaryPath)
+            os.replace(temporaryPath, os.path.join(cacheDirectory, cachedName + extension))
+        except OSError:
+            pass
+    return destination
+
+
+class TextureTranslator():
+    """
+    Convert the TIFF textures of a conversion into PNG images in the background.
+
+    The files found below the current directory are indexed by name once, on the first TIFF texture. Each image is
+    converted on a thread pool and the textures of the materials are set once all the conversions are completed by
+    wait(). If cacheDirectory is set, the converted images are stored there by content hash so that the next conversions
+    don't decode them again.
+
+    If maxSize or imageFormat is set, all the textures are reduced by reduce() instead, see reduceImage(). The identical
+    images are reduced once, into a file named after their content hash in the textures directory of the conversion.
+    """
+
+    def __init__(self, cacheDirectory=None, root='.', workers=None, maxSize=None, imageFormat=None):
+        """Initialization."""
+        self.cacheDirectory = cacheDirectory
+        self.root = root
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.maxSize = maxSize
+        self.imageFormat = imageFormat
+        self.directory = None  # directory of the reduced textures, set by setOutput()
+        self.outputDirectory = None  # directory the texture URLs are relative to
+        self.files = []  # (reduced texture, cached file) pairs, the cached file being None without cache
+        self.index = None  # file name -> paths, in os.walk order
+        self.executor = None
+        self.conversions = {}  # destination or content hash -> future
+        self.pending = []  # (material, source, texture, future), texture being None for the reduced textures
+
+    def isReducing(self):
+        """Check if the textures are reduced."""
+        return self.maxSize is not None or self.imageFormat is not None
+
+    def setOutput(self, directory, outputDirectory):
+        """Set the directory of the reduced textures and the one their URLs are relative to."""
+        self.directory = directory
+        self.outputDirectory = outputDirectory
+
+    def submit(self, function, *args):
+        """Run a conversion on the thread pool and return its future."""
+        if self.executor is None:
+            import concurrent.futures
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        return self.executor.submit(function, *args)
+
+    def getIndex(self):
+        """Return the paths of the files below the root directory by file name."""
+        if self.index is None:
+            self.index = {}
+            for dirname, dirnames, filenames in os.walk(self.root):
+                for filename in filenames:
+                    self.index.setdefault(filename, []).append(os.path.join(dirname, filename))
+        return self.index
+
+    def translate(self, material, robotName):
+        """Convert the TIFF texture of a material, its texture is replaced by the PNG image once wait() is called."""
+        filename = str(material.texture.split('/')[-1])
+        paths = self.getIndex().get(filename)
+        if not paths:
+            return
+        # all the files with this name are converted into the same image, the last one wins
+        source = paths[-1]
+        print('try to translate image ' + filename)
+        destination = os.path.splitext(os.path.join('./' + robotName + '_' + 'textures', filename))[0] + '.png'
+        if destination not in self.conversions:
+            self.conversions[destination] = self.submit(convertImage, source, destination, self.cacheDirectory)
+        texture = robotName + '_' + 'textures/' + os.path.splitext(filename)[0] + '.png'
+        self.pending.append((material, source, texture, self.conversions[destination]))
+
+    def reduce(self, material, source):
+        """Reduce the texture of a material, its texture is replaced by the reduced image once wait() is called."""
+        sourceHash = urdf2webots.cache.hashFile(source)  # memoized by path, size and modification time
+        if sourceHash is None:
+            print('Texture "%s" kept: the file cannot be read' % material.texture)
+            return
+        if sourceHash not in self.conversions:
+            name = '%s_%s' % (os.path.splitext(os.path.basename(source))[0], sourceHash[:8])
+            os.makedirs(self.directory, exist_ok=True)
+            self.conversions[sourceHash] = self.submit(reduceImage, source, self.directory, name, self.maxSize,
+                                                       self.imageFormat, self.cacheDirectory)
+        self.pending.append((material, source, None, self.conversions[sourceHash]))
+
+    def wait(self):
+        """Wait for the conversions and set the textures of the materials, empty if the image could not be converted."""
+        for material, source, texture, future in self.pending:
+            try:
+                result = future.result()
+                if texture is None:
+                    texture = os.path.relpath(result, self.outputDirectory).replace(os.sep, '/')
+                material.texture = texture
+            except Exception:  # an unreadable, corrupt or too large image only loses its texture
+                if texture is None:
+                    print('Texture "%s" kept: failed to reduce %s' % (material.texture, source))
+                    continue
+                material.texture = ""
+                print('failed to open ' + source)
+        if self.isReducing():
+            for sourceHash, future in self.conversions.items():
+                if future.exception() is not None:
+                    continue
+                file = future.result()
+                cachedFile = None
+                if self.cacheDirectory is not None:
+                    cachedFile = os.path.join(self.cacheDirectory, getCachedName(sourceHash, self.maxSize, self.imageFormat) +
+                                              os.path.splitext(file)[1])
+                self.files.append((file, cachedFile))
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.executor = None
+        self.index = None
+        self.conversions = {}
+        self.pending = []
@@ -0,0 +1,236 @@
+"""Incremental conversion of a URDF file rewriting only the subtrees of the PROTO file that changed."""
+import copy
+import re
+
+import urdf2webots.emitter
+import urdf2webots.writeRobot
+
+usePattern = re.compile(r'\bUSE (\S+)')
+
+
+def getSignature(value):
+    """Return a comparable snapshot of a parsed value, ignoring the DEF names assigned by the writer."""
+    if isinstance(value, (list, tuple)):
+        return tuple(getSignature(item) for item in value)
+    if isinstance(value, dict):
+        return tuple((key, getSignature(value[key])) for key in sorted(value))
+    if hasattr(value, '__slots__'):
+        return (type(value).__name__,) + tuple((key, getSignature(getattr(value, key))) for key in sorted(value.__slots__)
+                                               if key != 'defName')
+    if hasattr(value, '__dict__'):
+        return (type(value).__name__,) + tuple((key, getSignature(item)) for key, item in sorted(vars(value).items())
+                                               if key != 'defName')
+    return value
+
+
+class Watcher():
+    """
+    Keep the last conversion of a URDF file to update its PROTO file incrementally.
+
+    The links and joints of each new model are compared to the previous ones. When only some of them changed, the
+    subtrees of the joints containing them are written again and spliced into the previous PROTO file. The whole file
+    is written again when the structure of the robot, the global options or the nodes owning a DEF change.
+    """
+
+    def __init__(self):
+        """Initialization."""
+        self.output = None
+        self.outputFile = None
+        self.spans = None
+        self.definitions = None
+        self.signatures = None
+        self.pendingSignatures = None
+        self.incremental = False
+        self.changedNodes = []
+        self.updatedJoints = []
+        self.reason = 'initial conversion'
+
+    def update(self, context, rootLink, tree, outputFile, options):
+        """Update the PROTO file from a new model, return False if it has to be written completely instead."""
+        self.incremental = False
+        self.changedNodes = []
+        self.updatedJoints = []
+        self.pendingSignatures = self.getSignatures(context, rootLink, tree, outputFile, options)
+        if self.signatures is None:
+            self.reason = 'initial conversion'
+            return False
+        if context.initPos is not None:
+            self.reason = 'initial joint positions are set'
+            return False
+        if self.pendingSignatures['global'] != self.signatures['global']:
+            self.reason = 'robot options changed'
+            return False
+        if self.pendingSignatures['topology'] != self.signatures['topology']:
+            self.reason = 'robot structure changed'
+            return False
+
+        parentJoints = {}
+        for joint in tree.childJoints.values():
+            for childJoint in joint:
+                parentJoints[childJoint.child] = childJoint
+        changedJoints = set()
+        for kind in ['links', 'joints']:
+            for name, signature in self.pendingSignatures[kind].items():
+                if self.signatures[kind].get(name) != signature:
+                    self.changedNodes.append(name)
+                    if kind == 'joints':
+                        changedJoints.add(name)
+                    elif name in parentJoints:
+                        changedJoints.add(parentJoints[name].name)
+                    else:
+                        self.reason = 'root link changed'
+                        return False
+        if not self.changedNodes:
+            self.incremental = True
+            return True
+
+        # only rewrite the outermost changed subtrees
+        joints = {}
+        for jointList in tree.childJoints.values():
+            for joint in jointList:
+                joints[joint.name] = joint
+        outermostJoints = set(changedJoints)
+        for name in changedJoints:
+            link = joints[name].parent
+            while link in parentJoints:
+                if parentJoints[link].name in changedJoints:
+                    outermostJoints.discard(name)
+                    break
+                link = parentJoints[link].parent
+        changedJoints = outermostJoints
+        if any(name not in self.spans for name in changedJoints):
+            self.reason = 'changed joint not written'
+            return False
+
+        # the writer only changes the DEF names of the model and the per-write state of the context, restore them in case
+        # the model has to be written completely
+        writeContext = copy.copy(context)
+        defNames = self.getDefNames(context, tree)
+        replacements = []
+        try:
+            for name in sorted(changedJoints, key=lambda name: self.spans[name][0]):
+                replacement = self.writeSubtree(writeContext, tree, joints[name], options)
+                if replacement is None:
+                    self.reason = 'DEF nodes moved'
+                    return False
+                replacements.append(replacement)
+        finally:
+            for item, defName in defNames:
+                item.defName = defName
+        self.splice(replacements)
+        self.signatures = self.pendingSignatures
+        self.incremental = True
+        self.updatedJoints = [replacement[0] for replacement in replacements]
+        with open(self.outputFile, 'w') as protoFile:
+            protoFile.write(self.output)
+        return True
+
+    def getReport(self):
+        """Describe the last update."""
+        if not self.incremental:
+            return 'PROTO file written completely (%s).' % self.reason
+        if not self.changedNodes:
+            return 'No link or joint changed.'
+        return 'Changed: %s, rewritten subtrees of: %s.' % (', '.join(self.changedNodes), ', '.join(self.updatedJoints))
+
+    def record(self, context, output, outputFile):
+        """Keep the result of a complete conversion."""
+        self.output = output
+        self.outputFile = outputFile
+        self.spans = context.spans
+        self.definitions = context.definitions
+        self.signatures = self.pendingSignatures
+
+    def getSignatures(self, context, rootLink, tree, outputFile, options):
+        """Return the snapshots of the model compared from one conversion to the next one."""
+        topology = {}
+        for name, joints in tree.childJoints.items():
+            topology[name] = [(joint.name, joint.type, joint.child) for joint in joints]
+        return {
+            'global': getSignature([rootLink.name, context.robotName, context.staticBase, outputFile, options]),
+            'topology': getSignature([sorted(tree.links), topology]),
+            'links': {name: getSignature([link, tree.getSensors(name)]) for name, link in tree.links.items()},
+            'joints': {joint.name: getSignature(joint) for joints in tree.childJoints.values() for joint in joints}
+        }
+
+    def getDefNames(self, context, tree):
+        """Return the geometries and materials of the model with their DEF name."""
+        items = {}
+        for item in list(context.namedMaterial.values()) + list(context.geometryReference.values()):
+            items[id(item)] = item
+        for link in tree.links.values():
+            for element in link.visual + link.collision:
+                for item in [element.geometry, getattr(element, 'material', None)]:
+                    if item is not None:
+                        items[id(item)] = item
+        return [(item, item.defName) for item in items.values()]
+
+    def writeSubtree(self, context, tree, joint, options):
+        """Write the subtree of a joint, return None if its DEF nodes don't match the ones of the previous output."""
+        start, end, level = self.spans[joint.name]
+        # the named materials and meshes defined outside of the subtree are used in it, the other ones are defined in it
+        for item in list(context.namedMaterial.values()) + list(context.geometryReference.values()):
+            item.defName = None
+            if item.name is not None:
+                defName = urdf2webots.writeRobot.computeDefName(item.name)
+                offset = self.definitions.get(defName)
+                if offset is not None and not start <= offset < end:
+                    item.defName = defName
+        context.spans = {}
+        context.definitions = {}
+        output = urdf2webots.emitter.Emitter()
+        urdf2webots.writeRobot.URDFJoint(context, output, joint, level, tree, options['boxCollision'], options['normal'])
+        text = output.getvalue()
+        context.spans[joint.name] = (0, len(text), level)
+
+        previousDefinitions = set(name for name, offset in self.definitions.items() if start <= offset < end)
+        if set(context.definitions) != previousDefinitions:
+            return None
+        for name in usePattern.findall(text):
+            if name not in context.definitions and not self.definitions.get(name, end) < start:
+                return None
+        return joint.name, start, end, text, context.spans, context.definitions
+
+    def splice(self, replacements):
+        """Replace the spans of the previous output and move the recorded offsets accordingly."""
+        chunks = []
+        position = 0
+        shifts = []  # (start and end of the replaced span, cumulated shift after it)
+        shift = 0
+        spans = {}
+        definitions = {}
+        for name, start, end, text, newSpans, newDefinitions in replacements:
+            chunks.append(self.output[position:start])
+            newStart = start + shift
+            chunks.append(text)
+            position = end
+            for spanName, (spanStart, spanEnd, level) in newSpans.items():
+                spans[spanName] = (spanStart + newStart, spanEnd + newStart, level)
+            for defName, offset in newDefinitions.items():
+                definitions[defName] = offset + newStart
+            shift += len(text) - (end - start)
+            shifts.append((start, end, shift))
+        chunks.append(self.output[position:])
+
+        def move(offset):
+            moved = offset
+            for start, end, cumulatedShift in shifts:
+                if offset >= end:
+                    moved = offset + cumulatedShift
+                elif offset >= start:
+                    return None  # inside a replaced span
+            return moved
+
+        for spanName, (spanStart, spanEnd, level) in self.spans.items():
+            if spanName not in spans:
+                newStart = move(spanStart)
+                if newStart is not None:
+                    spans[spanName] = (newStart, move(spanEnd - 1) + 1, level)
+        for defName, offset in self.definitions.items():
+            if defName not in definitions:
+                newOffset = move(offset)
+                if newOffset is not None:
+                    definitions[defName] = newOffset
+        self.output = ''.join(chunks)
+        self.spans = spans
+        self.definitions = definitions
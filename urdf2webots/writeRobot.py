@@ -1,19 +1,12 @@
 """Import modules."""
 
 import math
-import numpy as np
 
+from urdf2webots.emitter import indents
 from urdf2webots.math_utils import rotateVector, matrixFromRotation, multiplyMatrix, rotationFromMatrix
 
-isProto = True
-toolSlot = None
-staticBase = False
-robotName = ''
-initPos = None
-linkToDef = False
-jointToDef = False
-indexSolid = 0
-targetVersion = 'R2025a'
+# marker written in place of the values of a template slot, see template.RobotTemplate
+SLOT_MARKER = '\x00%d\x00'
 
 
 class RGB():
@@ -45,9 +38,37 @@ def RGBA2RGB(RGBA_color, RGB_background=RGB()):
     return new_color
 
 
-def header(robotFile, srcFile=None, protoName=None, tags=[]):
+def writeSlot(context, robotFile, slot):
+    """Record a slot of a Robot node template and write its marker."""
+    robotFile.write(SLOT_MARKER % len(context.templateSlots))
+    context.templateSlots.append(slot)
+
+
+def getRotationLine(indentation, rotation):
+    """Return the rotation field of a node, empty for a null rotation."""
+    if rotation[3] == 0.0:
+        return ''
+    return indentation + 'rotation %lf %lf %lf %lf\n' % (rotation[0], rotation[1], rotation[2], rotation[3])
+
+
+def getHingePositionLine(indentation, position):
+    """Return the position field of hinge joint parameters, empty for a null or unset position."""
+    if position is None or position == 0.0:
+        return ''
+    return indentation + 'position %lf\n' % position
+
+
+def getEndpointRotation(axis, rotation, position):
+    """Return the rotation of the end point of a hinge joint at a position, None meaning no position."""
+    if position is None:
+        return rotation
+    return rotationFromMatrix(multiplyMatrix(matrixFromRotation([axis[0], axis[1], axis[2], position]),
+                                             matrixFromRotation(rotation)))
+
+
+def header(context, robotFile, srcFile=None, protoName=None, tags=[]):
     """Specify VRML file header."""
-    robotFile.write('#VRML_SIM %s utf8\n' % targetVersion)
+    robotFile.write('#VRML_SIM %s utf8\n' % context.targetVersion)
     robotFile.write('# license: Apache License 2.0\n')
     robotFile.write('# license url: http://www.apache.org/licenses/LICENSE-2.0\n')
     if tags:
@@ -61,7 +82,7 @@ def header(robotFile, srcFile=None, protoName=None, tags=[]):
     robotFile.write('\n')
 
 
-def declaration(robotFile, robotName, initTranslation, initRotation):
+def declaration(context, robotFile, robotName, initTranslation, initRotation):
     """Prototype declaration."""
     spaces = ' ' * max(1, len(robotName) - 2)
     robotFile.write('PROTO ' + robotName + ' [\n')
@@ -74,164 +95,192 @@ def declaration(robotFile, robotName, initTranslation, initRotation):
     robotFile.write('  field  SFBool      supervisor      FALSE ' + spaces + '# Is `Robot.supervisor`.\n')
     robotFile.write('  field  SFBool      synchronization TRUE  ' + spaces + '# Is `Robot.synchronization`.\n')
     robotFile.write('  field  SFBool      selfCollision   FALSE ' + spaces + '# Is `Robot.selfCollision`.\n')
-    if staticBase:
+    if context.staticBase:
         robotFile.write('  field  SFBool      staticBase      TRUE  ' + spaces + '# Defines if the robot base should ' +
                         'be pinned to the static environment.\n')
-    if toolSlot:
+    if context.toolSlot:
         robotFile.write('  field  MFNode      toolSlot        []    ' + spaces +
                         '# Extend the robot with new nodes at the end of the arm.\n')
     robotFile.write(']\n')
     robotFile.write('{\n')
 
 
-def URDFLink(robotFile, link, level, parentList,
-             childList, linkList, jointList, sensorList, jointPosition=[0.0, 0.0, 0.0],
+def runWriter(writer):
+    """Run a writer generator and the writers it yields, depth first, with an explicit stack instead of recursion."""
+    stack = [writer]
+    while stack:
+        try:
+            child = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            continue
+        stack.append(child)
+
+
+def URDFLink(context, robotFile, link, level, tree, jointPosition=[0.0, 0.0, 0.0],
              jointRotation=[0.0, 0.0, 1.0, 0.0], boxCollision=False, normal=False,
              dummy=False, robot=False, endpoint=False, initTranslation='', initRotation=''):
-    """Write a link iteratively."""
-    indent = '  '
+    """Write a link and its subtree, whatever its depth."""
+    runWriter(linkWriter(context, robotFile, link, level, tree, jointPosition, jointRotation, boxCollision, normal,
+                         dummy, robot, endpoint, initTranslation, initRotation))
+
+
+def linkWriter(context, robotFile, link, level, tree, jointPosition=[0.0, 0.0, 0.0],
+               jointRotation=[0.0, 0.0, 1.0, 0.0], boxCollision=False, normal=False,
+               dummy=False, robot=False, endpoint=False, initTranslation='', initRotation='', rotationSlot=None):
+    """Write a link, yielding the writers of its child joints, rotationSlot replacing its rotation in a template."""
     haveChild = False
-    if not isProto:
+    if not context.isProto:
         defaultSolidName = ''
     if robot:
-        robotFile.write(level * indent + 'Robot {\n')
-        if isProto:
-            robotFile.write((level + 1) * indent + 'translation IS translation\n')
-            robotFile.write((level + 1) * indent + 'rotation IS rotation\n')
-            robotFile.write((level + 1) * indent + 'controller IS controller\n')
-            robotFile.write((level + 1) * indent + 'controllerArgs IS controllerArgs\n')
-            robotFile.write((level + 1) * indent + 'customData IS customData\n')
-            robotFile.write((level + 1) * indent + 'supervisor IS supervisor\n')
-            robotFile.write((level + 1) * indent + 'synchronization IS synchronization\n')
-            robotFile.write((level + 1) * indent + 'selfCollision IS selfCollision\n')
+        robotFile.write(indents[level] + 'Robot {\n')
+        if context.isProto:
+            robotFile.write(indents[level + 1] + 'translation IS translation\n')
+            robotFile.write(indents[level + 1] + 'rotation IS rotation\n')
+            robotFile.write(indents[level + 1] + 'controller IS controller\n')
+            robotFile.write(indents[level + 1] + 'controllerArgs IS controllerArgs\n')
+            robotFile.write(indents[level + 1] + 'customData IS customData\n')
+            robotFile.write(indents[level + 1] + 'supervisor IS supervisor\n')
+            robotFile.write(indents[level + 1] + 'synchronization IS synchronization\n')
+            robotFile.write(indents[level + 1] + 'selfCollision IS selfCollision\n')
+        elif context.templateSlots is not None:
+            robotFile.write(indents[level + 1] + 'translation ')
+            writeSlot(context, robotFile, {'type': 'translation', 'default': initTranslation})
+            robotFile.write('\n' + indents[level + 1] + 'rotation ')
+            writeSlot(context, robotFile, {'type': 'rotation', 'default': initRotation})
+            robotFile.write('\n')
         else:
-            robotFile.write((level + 1) * indent + 'translation ' + initTranslation + '\n')
-            robotFile.write((level + 1) * indent + 'rotation ' + initRotation + '\n')
+            robotFile.write(indents[level + 1] + 'translation ' + initTranslation + '\n')
+            robotFile.write(indents[level + 1] + 'rotation ' + initRotation + '\n')
     else:
         if link.forceSensor:
-            robotFile.write((' ' if endpoint else level * indent) + ('DEF ' +
-                            link.name + ' ' if linkToDef else '') + 'TouchSensor {\n')
-            robotFile.write((level + 1) * indent + 'type "force-3d"\n')
-            robotFile.write((level + 1) * indent + 'lookupTable []\n')
+            robotFile.write((' ' if endpoint else indents[level]) + ('DEF ' +
+                            link.name + ' ' if context.linkToDef else '') + 'TouchSensor {\n')
+            robotFile.write(indents[level + 1] + 'type "force-3d"\n')
+            robotFile.write(indents[level + 1] + 'lookupTable []\n')
         else:
-            robotFile.write((' ' if endpoint else level * indent) + ('DEF ' +
-                            link.name + ' ' if linkToDef else '') + 'Solid {\n')
-            if not isProto:
+            robotFile.write((' ' if endpoint else indents[level]) + ('DEF ' +
+                            link.name + ' ' if context.linkToDef else '') + 'Solid {\n')
+            if not context.isProto:
                 # need a unique name for every solid node for the robot string
-                global indexSolid
-                defaultSolidName = 'solid' + str(indexSolid)
-                indexSolid += 1
+                defaultSolidName = 'solid' + str(context.indexSolid)
+                context.indexSolid += 1
 
         if jointPosition != [0.0, 0.0, 0.0]:
-            robotFile.write((level + 1) * indent + 'translation %lf %lf %lf\n' % (jointPosition[0],
-                                                                                  jointPosition[1],
-                                                                                  jointPosition[2]))
-        if jointRotation[3] != 0.0:
-            robotFile.write((level + 1) * indent + 'rotation %lf %lf %lf %lf\n' % (jointRotation[0],
-                                                                                   jointRotation[1],
-                                                                                   jointRotation[2],
-                                                                                   jointRotation[3]))
+            robotFile.write(indents[level + 1] + 'translation %lf %lf %lf\n' % (jointPosition[0],
+                                                                                jointPosition[1],
+                                                                                jointPosition[2]))
+        if rotationSlot is not None:
+            writeSlot(context, robotFile, rotationSlot)
+        else:
+            robotFile.write(getRotationLine(indents[level + 1], jointRotation))
     if not dummy:  # dummy: case when link not defined but referenced (e.g. Atlas robot)
         # 1: export Shapes
         if link.visual:
             if not haveChild:
                 haveChild = True
-                robotFile.write((level + 1) * indent + 'children [\n')
-            URDFShape(robotFile, link, level + 2, normal)
+                robotFile.write(indents[level + 1] + 'children [\n')
+            URDFShape(context, robotFile, link, level + 2, normal)
         # 2: export Sensors
-        for sensor in sensorList:
-            if sensor.parentLink == link.name:
-                if not haveChild:
-                    haveChild = True
-                    robotFile.write((level + 1) * indent + 'children [\n')
-                if hasattr(sensor, 'isImager') and sensor.isImager:
-                    if (targetVersion >= 'R2023b'):
-                        robotFile.write((level + 2) * indent + 'Pose {\n')
-                    else:
-                        robotFile.write((level + 2) * indent + 'Transform {\n')
-                    robotFile.write((level + 3) * indent + 'translation 0 0 0\n')
-                    robotFile.write((level + 3) * indent + 'rotation 0.577350 -0.577350 0.577350 2.094395\n')
-                    robotFile.write((level + 3) * indent + 'children [\n')
-                    sensor.export(robotFile, level + 4)
-                    robotFile.write((level + 3) * indent + ']\n')
-                    robotFile.write((level + 2) * indent + '}\n')
+        for sensor in tree.getSensors(link.name):
+            if not haveChild:
+                haveChild = True
+                robotFile.write(indents[level + 1] + 'children [\n')
+            if hasattr(sensor, 'isImager') and sensor.isImager:
+                if (context.targetVersion >= 'R2023b'):
+                    robotFile.write(indents[level + 2] + 'Pose {\n')
                 else:
-                    sensor.export(robotFile, level + 2)
+                    robotFile.write(indents[level + 2] + 'Transform {\n')
+                robotFile.write(indents[level + 3] + 'translation 0 0 0\n')
+                robotFile.write(indents[level + 3] + 'rotation 0.577350 -0.577350 0.577350 2.094395\n')
+                robotFile.write(indents[level + 3] + 'children [\n')
+                sensor.export(robotFile, level + 4)
+                robotFile.write(indents[level + 3] + ']\n')
+                robotFile.write(indents[level + 2] + '}\n')
+            else:
+                sensor.export(robotFile, level + 2)
         # 3: export Joints
-        for joint in jointList:
-            if joint.parent == link.name:
-                if not haveChild:
-                    haveChild = True
-                    robotFile.write((level + 1) * indent + 'children [\n')
-                URDFJoint(robotFile, joint, level + 2, parentList, childList,
-                          linkList, jointList, sensorList, boxCollision, normal)
+        for joint in tree.getChildJoints(link.name):
+            if not haveChild:
+                haveChild = True
+                robotFile.write(indents[level + 1] + 'children [\n')
+            start = robotFile.tell() if context.spans is not None else None
+            yield jointWriter(context, robotFile, joint, level + 2, tree, boxCollision, normal)
+            if start is not None:
+                context.spans[joint.name] = (start, robotFile.tell(), level + 2)
         # 4: export ToolSlot if specified
-        if link.name == toolSlot:
+        if link.name == context.toolSlot:
             if not haveChild:
-                robotFile.write((level + 1) * indent + 'children [\n')
-            robotFile.write((level + 2) * indent + 'Group {\n')
-            robotFile.write((level + 3) * indent + 'children IS toolSlot\n')
-            robotFile.write((level + 2) * indent + '}\n')
-            robotFile.write((level + 1) * indent + ']\n')
+                robotFile.write(indents[level + 1] + 'children [\n')
+            robotFile.write(indents[level + 2] + 'Group {\n')
+            robotFile.write(indents[level + 3] + 'children IS toolSlot\n')
+            robotFile.write(indents[level + 2] + '}\n')
+            robotFile.write(indents[level + 1] + ']\n')
             # add dummy physics and bounding object, so tools don't fall off
             if link.inertia.mass is None:
-                robotFile.write((level + 1) * indent + 'physics Physics {\n')
-                robotFile.write((level + 1) * indent + '}\n')
-                robotFile.write((level + 1) * indent + 'boundingObject Box {\n')
-                robotFile.write((level + 2) * indent + 'size 0.01 0.01 0.01\n')
-                robotFile.write((level + 1) * indent + '}\n')
+                robotFile.write(indents[level + 1] + 'physics Physics {\n')
+                robotFile.write(indents[level + 1] + '}\n')
+                robotFile.write(indents[level + 1] + 'boundingObject Box {\n')
+                robotFile.write(indents[level + 2] + 'size 0.01 0.01 0.01\n')
+                robotFile.write(indents[level + 1] + '}\n')
         elif haveChild:
-            robotFile.write((level + 1) * indent + ']\n')
-        if isProto:
+            robotFile.write(indents[level + 1] + ']\n')
+        if context.isProto:
             if level == 1:
-                robotFile.write((level + 1) * indent + 'name IS name\n')
+                robotFile.write(indents[level + 1] + 'name IS name\n')
             else:
-                robotFile.write((level + 1) * indent + 'name "' + link.name + '"\n')
+                robotFile.write(indents[level + 1] + 'name "' + link.name + '"\n')
         elif defaultSolidName:
-            robotFile.write((level + 1) * indent + 'name "' + defaultSolidName + '"\n')
+            robotFile.write(indents[level + 1] + 'name "' + defaultSolidName + '"\n')
 
         if link.collision:
-            URDFBoundingObject(robotFile, link, level + 1, boxCollision)
+            URDFBoundingObject(context, robotFile, link, level + 1, boxCollision)
         if link.inertia.mass is not None:
-            if isProto:
-                if level > 1 or not staticBase:
+            if context.isProto:
+                if level > 1 or not context.staticBase:
                     writeLinkPhysics(robotFile, link, level)
             else:
-                if level != 0 or not staticBase:
+                if level != 0 or not context.staticBase:
                     writeLinkPhysics(robotFile, link, level)
         elif link.collision:
-            if isProto:
-                if level > 1 or not staticBase:
-                    robotFile.write((level + 1) * indent + 'physics Physics {\n')
-                    robotFile.write((level + 1) * indent + '}\n')
+            if context.isProto:
+                if level > 1 or not context.staticBase:
+                    robotFile.write(indents[level + 1] + 'physics Physics {\n')
+                    robotFile.write(indents[level + 1] + '}\n')
             else:
-                if level != 0 or not staticBase:
-                    robotFile.write((level + 1) * indent + 'physics Physics {\n')
-                    robotFile.write((level + 1) * indent + '}\n')
-    if not isProto:
+                if level != 0 or not context.staticBase:
+                    robotFile.write(indents[level + 1] + 'physics Physics {\n')
+                    robotFile.write(indents[level + 1] + '}\n')
+    if not context.isProto:
         if robot:
-            robotFile.write((level + 1) * indent + 'name "' + robotName + '"\n')
-            robotFile.write((level + 1) * indent + 'controller "<extern>"\n')
-    robotFile.write(level * indent + '}\n')
+            if context.templateSlots is not None:
+                robotFile.write(indents[level + 1] + 'name "')
+                writeSlot(context, robotFile, {'type': 'name', 'default': context.robotName})
+                robotFile.write('"\n')
+            else:
+                robotFile.write(indents[level + 1] + 'name "' + context.robotName + '"\n')
+            robotFile.write(indents[level + 1] + 'controller "<extern>"\n')
+    robotFile.write(indents[level] + '}\n')
+    robotFile.checkpoint()
 
 
 def writeLinkPhysics(robotFile, link, level):
     """Write a Webots Physics node."""
-    indent = '  '
 
-    robotFile.write((level + 1) * indent + 'physics Physics {\n')
-    robotFile.write((level + 2) * indent + 'density -1\n')
-    robotFile.write((level + 2) * indent + 'mass %lf\n' % link.inertia.mass)
+    robotFile.write(indents[level + 1] + 'physics Physics {\n')
+    robotFile.write(indents[level + 2] + 'density -1\n')
+    robotFile.write(indents[level + 2] + 'mass %lf\n' % link.inertia.mass)
     if (link.inertia.position[0] != 0.0 and link.inertia.position[1] != 0.0 and link.inertia.position[2] != 0 or
         (link.inertia.ixx > 0.0 or link.inertia.iyy > 0.0 or link.inertia.izz > 0.0 or link.inertia.ixy > 0.0 or
          link.inertia.ixz > 0.0 or link.inertia.ixy > 0.0)):
-        robotFile.write((level + 2) * indent + 'centerOfMass [ %lf %lf %lf ]\n' % (link.inertia.position[0],
-                                                                                   link.inertia.position[1],
-                                                                                   link.inertia.position[2]))
+        robotFile.write(indents[level + 2] + 'centerOfMass [ %lf %lf %lf ]\n' % (link.inertia.position[0],
+                                                                                 link.inertia.position[1],
+                                                                                 link.inertia.position[2]))
     if link.inertia.ixx > 0.0 and link.inertia.iyy > 0.0 and link.inertia.izz > 0.0:
         i = link.inertia
         inertiaMatrix = [i.ixx, i.ixy, i.ixz, i.ixy, i.iyy, i.iyz, i.ixz, i.iyz, i.izz]
         if link.inertia.rotation[-1] != 0.0:
+            import numpy as np
             rotationMatrix = matrixFromRotation(link.inertia.rotation)
             I_mat = np.array(inertiaMatrix).reshape(3, 3)
             R = np.array(rotationMatrix).reshape(3, 3)
@@ -241,102 +290,111 @@ def writeLinkPhysics(robotFile, link, level):
             inertiaMatrix = np.dot(np.dot(R_t, I_mat), R).reshape(9)
         if (inertiaMatrix[0] != 1.0 or inertiaMatrix[4] != 1.0 or inertiaMatrix[8] != 1.0 or
                 inertiaMatrix[1] != 0.0 or inertiaMatrix[2] != 0.0 or inertiaMatrix[5] != 0.0):
-            robotFile.write((level + 2) * indent + 'inertiaMatrix [\n')
+            robotFile.write(indents[level + 2] + 'inertiaMatrix [\n')
             # principals moments of inertia (diagonal)
-            robotFile.write((level + 3) * indent + '%e %e %e\n' % (inertiaMatrix[0], inertiaMatrix[4], inertiaMatrix[8]))
+            robotFile.write(indents[level + 3] + '%e %e %e\n' % (inertiaMatrix[0], inertiaMatrix[4], inertiaMatrix[8]))
             # products of inertia
-            robotFile.write((level + 3) * indent + '%e %e %e\n' % (inertiaMatrix[1], inertiaMatrix[2], inertiaMatrix[5]))
-            robotFile.write((level + 2) * indent + ']\n')
-    robotFile.write((level + 1) * indent + '}\n')
+            robotFile.write(indents[level + 3] + '%e %e %e\n' % (inertiaMatrix[1], inertiaMatrix[2], inertiaMatrix[5]))
+            robotFile.write(indents[level + 2] + ']\n')
+    robotFile.write(indents[level + 1] + '}\n')
 
 
-def URDFBoundingObject(robotFile, link, level, boxCollision):
+def URDFBoundingObject(context, robotFile, link, level, boxCollision):
     """Write an boundingObject."""
-    indent = '  '
     boundingLevel = level
-    robotFile.write(level * indent + 'boundingObject ')
+    robotFile.write(indents[level] + 'boundingObject ')
     hasGroup = len(link.collision) > 1
     if hasGroup:
         robotFile.write('Group {\n')
-        robotFile.write((level + 1) * indent + 'children [\n')
+        robotFile.write(indents[level + 1] + 'children [\n')
         boundingLevel = level + 2
 
     for boundingObject in link.collision:
-        initialIndent = boundingLevel * indent if hasGroup else ''
+        initialIndent = indents[boundingLevel] if hasGroup else ''
         if not boxCollision and (boundingObject.position != [0.0, 0.0, 0.0] or boundingObject.rotation[3] != 0.0
-                                 or (targetVersion < 'R2023b' and boundingObject.scale != [1.0, 1.0, 1.0])):
-            if (targetVersion >= 'R2023b'):
+                                 or (context.targetVersion < 'R2023b' and boundingObject.scale != [1.0, 1.0, 1.0])):
+            if (context.targetVersion >= 'R2023b'):
                 robotFile.write(initialIndent + 'Pose {\n')
             else:
                 robotFile.write(initialIndent + 'Transform {\n')
             if boundingObject.position != [0.0, 0.0, 0.0]:
-                robotFile.write((boundingLevel + 1) * indent + 'translation %lf %lf %lf\n' % (boundingObject.position[0],
-                                                                                              boundingObject.position[1],
-                                                                                              boundingObject.position[2]))
+                robotFile.write(indents[boundingLevel + 1] + 'translation %lf %lf %lf\n' % (boundingObject.position[0],
+                                                                                            boundingObject.position[1],
+                                                                                            boundingObject.position[2]))
             if boundingObject.rotation[3] != 0.0:
-                robotFile.write((boundingLevel + 1) * indent + 'rotation %lf %lf %lf %lf\n' % (boundingObject.rotation[0],
-                                                                                               boundingObject.rotation[1],
-                                                                                               boundingObject.rotation[2],
-                                                                                               boundingObject.rotation[3]))
-            if boundingObject.scale != [1.0, 1.0, 1.0] and targetVersion < 'R2023b':
-                robotFile.write((boundingLevel + 1) * indent + 'scale %lf %lf %lf\n' % (boundingObject.scale[0],
-                                                                                        boundingObject.scale[1],
-                                                                                        boundingObject.scale[2]))
-            robotFile.write((boundingLevel + 1) * indent + 'children [\n')
+                robotFile.write(indents[boundingLevel + 1] + 'rotation %lf %lf %lf %lf\n' % (boundingObject.rotation[0],
+                                                                                             boundingObject.rotation[1],
+                                                                                             boundingObject.rotation[2],
+                                                                                             boundingObject.rotation[3]))
+            if boundingObject.scale != [1.0, 1.0, 1.0] and context.targetVersion < 'R2023b':
+                robotFile.write(indents[boundingLevel + 1] + 'scale %lf %lf %lf\n' % (boundingObject.scale[0],
+                                                                                      boundingObject.scale[1],
+                                                                                      boundingObject.scale[2]))
+            robotFile.write(indents[boundingLevel + 1] + 'children [\n')
             boundingLevel = boundingLevel + 2
             hasGroup = True
-            initialIndent = boundingLevel * indent
+            initialIndent = indents[boundingLevel]
 
-        if boundingObject.geometry.box.x != 0:
+        if boundingObject.geometry.type == 'box' and boundingObject.geometry.box.x != 0:
             robotFile.write(initialIndent + 'Box {\n')
             if boundingObject.geometry.box != [2.0, 2.0, 2.0]:
-                robotFile.write((boundingLevel + 1) * indent + ' size %lf %lf %lf\n' % (boundingObject.geometry.box.x,
-                                                                                        boundingObject.geometry.box.y,
-                                                                                        boundingObject.geometry.box.z))
-            robotFile.write(boundingLevel * indent + '}\n')
+                robotFile.write(indents[boundingLevel + 1] + ' size %lf %lf %lf\n' % (boundingObject.geometry.box.x,
+                                                                                      boundingObject.geometry.box.y,
+                                                                                      boundingObject.geometry.box.z))
+            robotFile.write(indents[boundingLevel] + '}\n')
 
-        elif boundingObject.geometry.cylinder.radius != 0 and boundingObject.geometry.cylinder.height != 0:
+        elif (boundingObject.geometry.type == 'cylinder' and boundingObject.geometry.cylinder.radius != 0 and
+              boundingObject.geometry.cylinder.height != 0):
             robotFile.write(initialIndent + 'Cylinder {\n')
             if boundingObject.geometry.cylinder.radius != 1.0:
-                robotFile.write((boundingLevel + 1) * indent + 'radius ' + str(boundingObject.geometry.cylinder.radius) + '\n')
+                robotFile.write(indents[boundingLevel + 1] + 'radius ' + str(boundingObject.geometry.cylinder.radius) + '\n')
             if boundingObject.geometry.cylinder.height != 2.0:
-                robotFile.write((boundingLevel + 1) * indent + 'height ' + str(boundingObject.geometry.cylinder.height) + '\n')
-            robotFile.write(boundingLevel * indent + '}\n')
+                robotFile.write(indents[boundingLevel + 1] + 'height ' + str(boundingObject.geometry.cylinder.height) + '\n')
+            robotFile.write(indents[boundingLevel] + '}\n')
 
-        elif boundingObject.geometry.sphere.radius != 0:
+        elif boundingObject.geometry.type == 'sphere' and boundingObject.geometry.sphere.radius != 0:
             robotFile.write(initialIndent + 'Sphere {\n')
             if boundingObject.geometry.sphere.radius != 1.0:
-                robotFile.write((boundingLevel + 1) * indent + 'radius ' + str(boundingObject.geometry.sphere.radius) + '\n')
-            robotFile.write(boundingLevel * indent + '}\n')
-
-        elif boundingObject.geometry.mesh.url:
+                robotFile.write(indents[boundingLevel + 1] + 'radius ' + str(boundingObject.geometry.sphere.radius) + '\n')
+            robotFile.write(indents[boundingLevel] + '}\n')
+
+        elif boundingObject.geometry.type == 'capsule' and boundingObject.geometry.capsule.radius != 0:
+            robotFile.write(initialIndent + 'Capsule {\n')
+            if boundingObject.geometry.capsule.radius != 1.0:
+                robotFile.write(indents[boundingLevel + 1] + 'radius ' + str(boundingObject.geometry.capsule.radius) + '\n')
+            if boundingObject.geometry.capsule.height != 2.0:
+                robotFile.write(indents[boundingLevel + 1] + 'height ' + str(boundingObject.geometry.capsule.height) + '\n')
+            robotFile.write(indents[boundingLevel] + '}\n')
+
+        elif boundingObject.geometry.type == 'mesh' and boundingObject.geometry.mesh.url:
             if boundingObject.geometry.defName is not None:
                 robotFile.write(initialIndent + 'USE %s\n' % boundingObject.geometry.defName)
             else:
                 if boundingObject.geometry.name is not None:
                     boundingObject.geometry.defName = computeDefName(boundingObject.geometry.name)
                 if boundingObject.geometry.defName is not None:
+                    recordDefinition(context, robotFile, boundingObject.geometry.defName)
                     robotFile.write(initialIndent + 'DEF %s Mesh {\n' % boundingObject.geometry.defName)
                 else:
                     robotFile.write(initialIndent + 'Mesh {\n')
 
-                robotFile.write((boundingLevel + 1) * indent + 'url ' + str(boundingObject.geometry.mesh.url) + '\n')
+                robotFile.write(indents[boundingLevel + 1] + 'url ' + str(boundingObject.geometry.mesh.url) + '\n')
                 if not boundingObject.geometry.mesh.ccw:
-                    robotFile.write((boundingLevel + 1) * indent + 'ccw FALSE\n')
-                robotFile.write(boundingLevel * indent + '}\n')
+                    robotFile.write(indents[boundingLevel + 1] + 'ccw FALSE\n')
+                robotFile.write(indents[boundingLevel] + '}\n')
 
         else:
             robotFile.write(initialIndent + 'Box{\n')
-            robotFile.write((boundingLevel + 1) * indent + ' size 0.01 0.01 0.01\n')
-            robotFile.write(boundingLevel * indent + '}\n')
+            robotFile.write(indents[boundingLevel + 1] + ' size 0.01 0.01 0.01\n')
+            robotFile.write(indents[boundingLevel] + '}\n')
 
         if boundingLevel == level + 4:
-            robotFile.write((level + 3) * indent + ']\n')
-            robotFile.write((level + 2) * indent + '}\n')
+            robotFile.write(indents[level + 3] + ']\n')
+            robotFile.write(indents[level + 2] + '}\n')
             boundingLevel = level + 2
     if boundingLevel == level + 2:
-        robotFile.write((level + 1) * indent + ']\n')
-        robotFile.write(level * indent + '}\n')
+        robotFile.write(indents[level + 1] + ']\n')
+        robotFile.write(indents[level] + '}\n')
 
 
 def computeDefName(name):
@@ -347,156 +405,167 @@ def computeDefName(name):
     return defName
 
 
-def URDFVisual(robotFile, visualNode, level, normal=False):
+def recordDefinition(context, robotFile, defName):
+    """Remember where a DEF node is written, when the spans of the joints are recorded."""
+    if context.spans is not None:
+        context.definitions.setdefault(defName, robotFile.tell())
+
+
+def URDFVisual(context, robotFile, visualNode, level, normal=False):
     """Write a Visual."""
-    indent = '  '
     shapeLevel = level
 
-    if visualNode.geometry.cadShape.url and targetVersion >= 'R2022b':
+    if visualNode.geometry.type == 'cadShape' and visualNode.geometry.cadShape.url and context.targetVersion >= 'R2022b':
         if visualNode.geometry.defName is not None:
-            robotFile.write(shapeLevel * indent + 'USE %s\n' % visualNode.geometry.defName)
+            robotFile.write(indents[shapeLevel] + 'USE %s\n' % visualNode.geometry.defName)
         else:
             if visualNode.geometry.name is not None:
                 visualNode.geometry.defName = computeDefName(visualNode.geometry.name)
             if visualNode.geometry.defName is not None:
-                robotFile.write(shapeLevel * indent + 'DEF %s CadShape {\n' % visualNode.geometry.defName)
+                recordDefinition(context, robotFile, visualNode.geometry.defName)
+                robotFile.write(indents[shapeLevel] + 'DEF %s CadShape {\n' % visualNode.geometry.defName)
             else:
-                robotFile.write(shapeLevel * indent + 'CadShape {\n')
+                robotFile.write(indents[shapeLevel] + 'CadShape {\n')
 
-            robotFile.write((shapeLevel + 1) * indent + 'url ' + str(visualNode.geometry.cadShape.url) + '\n')
+            robotFile.write(indents[shapeLevel + 1] + 'url ' + str(visualNode.geometry.cadShape.url) + '\n')
             if not visualNode.geometry.cadShape.ccw:
-                robotFile.write((shapeLevel + 1) * indent + 'ccw FALSE\n')
+                robotFile.write(indents[shapeLevel + 1] + 'ccw FALSE\n')
 
-            robotFile.write(shapeLevel * indent + '}\n')
+            robotFile.write(indents[shapeLevel] + '}\n')
     else:
-        robotFile.write(shapeLevel * indent + 'Shape {\n')
+        robotFile.write(indents[shapeLevel] + 'Shape {\n')
 
         if visualNode.material.defName is not None:
-            robotFile.write((shapeLevel + 1) * indent + 'appearance USE %s\n' % visualNode.material.defName)
+            robotFile.write(indents[shapeLevel + 1] + 'appearance USE %s\n' % visualNode.material.defName)
         else:
             if visualNode.material.name is not None:
                 visualNode.material.defName = computeDefName(visualNode.material.name)
             if visualNode.material.defName is not None:
-                robotFile.write((shapeLevel + 1) * indent + 'appearance DEF %s PBRAppearance {\n' % visualNode.material.defName)
+                recordDefinition(context, robotFile, visualNode.material.defName)
+                robotFile.write(indents[shapeLevel + 1] + 'appearance DEF %s PBRAppearance {\n' % visualNode.material.defName)
             else:
-                robotFile.write((shapeLevel + 1) * indent + 'appearance PBRAppearance {\n')
-            ambientColor = RGBA2RGB(visualNode.material.ambient)
-            diffuseColor = RGBA2RGB(visualNode.material.diffuse, RGB_background=ambientColor)
-            emissiveColor = RGBA2RGB(visualNode.material.emission, RGB_background=ambientColor)
-            roughness = 1.0 - visualNode.material.specular.alpha * (visualNode.material.specular.red +
-                                                                    visualNode.material.specular.green +
-                                                                    visualNode.material.specular.blue) / 3.0
+                robotFile.write(indents[shapeLevel + 1] + 'appearance PBRAppearance {\n')
+            ambientColor = RGBA2RGB(visualNode.material.getColor('ambient'))
+            diffuseColor = RGBA2RGB(visualNode.material.getColor('diffuse'), RGB_background=ambientColor)
+            emissiveColor = RGBA2RGB(visualNode.material.getColor('emission'), RGB_background=ambientColor)
+            specularColor = visualNode.material.getColor('specular')
+            roughness = 1.0 - specularColor.alpha * (specularColor.red + specularColor.green + specularColor.blue) / 3.0
             if visualNode.material.shininess:
                 roughness *= (1.0 - 0.5 * visualNode.material.shininess)
             if diffuseColor != [1.0, 1.0, 1.0]:
-                robotFile.write((shapeLevel + 2) * indent + 'baseColor %lf %lf %lf\n' % (diffuseColor.red,
-                                                                                         diffuseColor.green,
-                                                                                         diffuseColor.blue))
-            if visualNode.material.diffuse.alpha != 1.0:
-                robotFile.write((shapeLevel + 2) * indent + 'transparency %lf\n' % (1.0 - visualNode.material.diffuse.alpha))
+                robotFile.write(indents[shapeLevel + 2] + 'baseColor %lf %lf %lf\n' % (diffuseColor.red,
+                                                                                       diffuseColor.green,
+                                                                                       diffuseColor.blue))
+            if visualNode.material.getColor('diffuse').alpha != 1.0:
+                robotFile.write(indents[shapeLevel + 2] + 'transparency %lf\n' %
+                                (1.0 - visualNode.material.getColor('diffuse').alpha))
             if roughness != 0.0:
-                robotFile.write((shapeLevel + 2) * indent + 'roughness %lf\n' % roughness)
-            robotFile.write((shapeLevel + 2) * indent + 'metalness 0\n')
+                robotFile.write(indents[shapeLevel + 2] + 'roughness %lf\n' % roughness)
+            robotFile.write(indents[shapeLevel + 2] + 'metalness 0\n')
             if emissiveColor != [0.0, 0.0, 0.0]:
-                robotFile.write((shapeLevel + 2) * indent + 'emissiveColor %lf %lf %lf\n' % (emissiveColor.red,
-                                                                                             emissiveColor.green,
-                                                                                             emissiveColor.blue))
+                robotFile.write(indents[shapeLevel + 2] + 'emissiveColor %lf %lf %lf\n' % (emissiveColor.red,
+                                                                                           emissiveColor.green,
+                                                                                           emissiveColor.blue))
             if visualNode.material.texture != "":
-                robotFile.write((shapeLevel + 2) * indent + 'baseColorMap ImageTexture {\n')
-                robotFile.write((shapeLevel + 3) * indent + 'url "' + visualNode.material.texture + '"\n')
-                robotFile.write((shapeLevel + 2) * indent + '}\n')
-            robotFile.write((shapeLevel + 1) * indent + '}\n')
+                robotFile.write(indents[shapeLevel + 2] + 'baseColorMap ImageTexture {\n')
+                robotFile.write(indents[shapeLevel + 3] + 'url "' + visualNode.material.texture + '"\n')
+                robotFile.write(indents[shapeLevel + 2] + '}\n')
+            robotFile.write(indents[shapeLevel + 1] + '}\n')
 
-        if visualNode.geometry.box.x != 0:
-            robotFile.write((shapeLevel + 1) * indent + 'geometry Box {\n')
+        if visualNode.geometry.type == 'box' and visualNode.geometry.box.x != 0:
+            robotFile.write(indents[shapeLevel + 1] + 'geometry Box {\n')
             if visualNode.geometry.box != [2.0, 2.0, 2.0]:
-                robotFile.write((shapeLevel + 2) * indent + ' size %lf %lf %lf\n' % (visualNode.geometry.box.x,
-                                                                                     visualNode.geometry.box.y,
-                                                                                     visualNode.geometry.box.z))
-            robotFile.write((shapeLevel + 1) * indent + '}\n')
+                robotFile.write(indents[shapeLevel + 2] + ' size %lf %lf %lf\n' % (visualNode.geometry.box.x,
+                                                                                   visualNode.geometry.box.y,
+                                                                                   visualNode.geometry.box.z))
+            robotFile.write(indents[shapeLevel + 1] + '}\n')
 
-        elif visualNode.geometry.cylinder.radius != 0:
-            robotFile.write((shapeLevel + 1) * indent + 'geometry Cylinder {\n')
+        elif visualNode.geometry.type == 'cylinder' and visualNode.geometry.cylinder.radius != 0:
+            robotFile.write(indents[shapeLevel + 1] + 'geometry Cylinder {\n')
             if visualNode.geometry.cylinder.radius != 1.0:
-                robotFile.write((shapeLevel + 2) * indent + 'radius ' + str(visualNode.geometry.cylinder.radius) + '\n')
+                robotFile.write(indents[shapeLevel + 2] + 'radius ' + str(visualNode.geometry.cylinder.radius) + '\n')
             if visualNode.geometry.cylinder.height != 2.0:
-                robotFile.write((shapeLevel + 2) * indent + 'height ' + str(visualNode.geometry.cylinder.height) + '\n')
-            robotFile.write((shapeLevel + 1) * indent + '}\n')
+                robotFile.write(indents[shapeLevel + 2] + 'height ' + str(visualNode.geometry.cylinder.height) + '\n')
+            robotFile.write(indents[shapeLevel + 1] + '}\n')
 
-        elif visualNode.geometry.sphere.radius != 0:
-            robotFile.write((shapeLevel + 1) * indent + 'geometry Sphere {\n')
+        elif visualNode.geometry.type == 'sphere' and visualNode.geometry.sphere.radius != 0:
+            robotFile.write(indents[shapeLevel + 1] + 'geometry Sphere {\n')
             if visualNode.geometry.sphere.radius != 1.0:
-                robotFile.write((shapeLevel + 2) * indent + 'radius ' + str(visualNode.geometry.sphere.radius) + '\n')
-            robotFile.write((shapeLevel + 1) * indent + '}\n')
+                robotFile.write(indents[shapeLevel + 2] + 'radius ' + str(visualNode.geometry.sphere.radius) + '\n')
+            robotFile.write(indents[shapeLevel + 1] + '}\n')
 
-        elif visualNode.geometry.mesh.url:
+        elif visualNode.geometry.type == 'mesh' and visualNode.geometry.mesh.url:
             if visualNode.geometry.defName is not None:
-                robotFile.write((shapeLevel + 1) * indent + 'geometry USE %s\n' % visualNode.geometry.defName)
+                robotFile.write(indents[shapeLevel + 1] + 'geometry USE %s\n' % visualNode.geometry.defName)
             else:
                 if visualNode.geometry.name is not None:
                     visualNode.geometry.defName = computeDefName(visualNode.geometry.name)
                 if visualNode.geometry.defName is not None:
-                    robotFile.write((shapeLevel + 1) * indent + 'geometry DEF %s Mesh {\n' % visualNode.geometry.defName)
+                    recordDefinition(context, robotFile, visualNode.geometry.defName)
+                    robotFile.write(indents[shapeLevel + 1] + 'geometry DEF %s Mesh {\n' % visualNode.geometry.defName)
                 else:
-                    robotFile.write((shapeLevel + 1) * indent + 'geometry Mesh {\n')
+                    robotFile.write(indents[shapeLevel + 1] + 'geometry Mesh {\n')
 
-                robotFile.write((shapeLevel + 2) * indent + 'url ' + str(visualNode.geometry.mesh.url) + '\n')
-                if not visualNode.geometry.mesh.ccw or not visualNode.geometry.cadShape.ccw:
-                    robotFile.write((shapeLevel + 2) * indent + 'ccw FALSE\n')
-                robotFile.write((shapeLevel + 1) * indent + '}\n')
+                robotFile.write(indents[shapeLevel + 2] + 'url ' + str(visualNode.geometry.mesh.url) + '\n')
+                if not visualNode.geometry.mesh.ccw:
+                    robotFile.write(indents[shapeLevel + 2] + 'ccw FALSE\n')
+                robotFile.write(indents[shapeLevel + 1] + '}\n')
 
-        robotFile.write(shapeLevel * indent + '}\n')
+        robotFile.write(indents[shapeLevel] + '}\n')
 
 
-def URDFShape(robotFile, link, level, normal=False):
+def URDFShape(context, robotFile, link, level, normal=False):
     """Write a Shape."""
-    indent = '  '
     shapeLevel = level
     transform = False
 
     for visualNode in link.visual:
         if visualNode.position != [0.0, 0.0, 0.0] or visualNode.rotation[3] != 0.0 or visualNode.scale != [1.0, 1.0, 1.0]:
             if (visualNode.scale != [1.0, 1.0, 1.0]):
-                robotFile.write(shapeLevel * indent + 'Transform {\n')
+                robotFile.write(indents[shapeLevel] + 'Transform {\n')
             else:
-                robotFile.write(shapeLevel * indent + 'Pose {\n')
+                robotFile.write(indents[shapeLevel] + 'Pose {\n')
             if visualNode.position != [0.0, 0.0, 0.0]:
-                robotFile.write((shapeLevel + 1) * indent + 'translation %lf %lf %lf\n' % (visualNode.position[0],
-                                                                                           visualNode.position[1],
-                                                                                           visualNode.position[2]))
+                robotFile.write(indents[shapeLevel + 1] + 'translation %lf %lf %lf\n' % (visualNode.position[0],
+                                                                                         visualNode.position[1],
+                                                                                         visualNode.position[2]))
             if visualNode.rotation[3] != 0.0:
-                robotFile.write((shapeLevel + 1) * indent + 'rotation %lf %lf %lf %lf\n' % (visualNode.rotation[0],
-                                                                                            visualNode.rotation[1],
-                                                                                            visualNode.rotation[2],
-                                                                                            visualNode.rotation[3]))
+                robotFile.write(indents[shapeLevel + 1] + 'rotation %lf %lf %lf %lf\n' % (visualNode.rotation[0],
+                                                                                          visualNode.rotation[1],
+                                                                                          visualNode.rotation[2],
+                                                                                          visualNode.rotation[3]))
             if visualNode.scale != [1.0, 1.0, 1.0]:
-                robotFile.write((shapeLevel + 1) * indent + 'scale %lf %lf %lf\n' % (visualNode.scale[0],
-                                                                                     visualNode.scale[1],
-                                                                                     visualNode.scale[2]))
-            robotFile.write((shapeLevel + 1) * indent + 'children [\n')
+                robotFile.write(indents[shapeLevel + 1] + 'scale %lf %lf %lf\n' % (visualNode.scale[0],
+                                                                                   visualNode.scale[1],
+                                                                                   visualNode.scale[2]))
+            robotFile.write(indents[shapeLevel + 1] + 'children [\n')
             shapeLevel += 2
             transform = True
-        URDFVisual(robotFile, visualNode, shapeLevel, normal)
+        URDFVisual(context, robotFile, visualNode, shapeLevel, normal)
         if transform:
-            robotFile.write((shapeLevel - 1) * indent + ']\n')
-            robotFile.write((shapeLevel - 2) * indent + '}\n')
+            robotFile.write(indents[shapeLevel - 1] + ']\n')
+            robotFile.write(indents[shapeLevel - 2] + '}\n')
             shapeLevel -= 2
 
 
-def URDFJoint(robotFile, joint, level, parentList, childList, linkList, jointList,
-              sensorList, boxCollision, normal):
-    """Write a Joint iteratively."""
-    indent = '  '
+def URDFJoint(context, robotFile, joint, level, tree, boxCollision, normal):
+    """Write a joint and the subtree of its child link, whatever its depth."""
+    runWriter(jointWriter(context, robotFile, joint, level, tree, boxCollision, normal))
+
+
+def jointWriter(context, robotFile, joint, level, tree, boxCollision, normal):
+    """Write a joint, yielding the writer of its child link."""
     if not joint.axis:
         joint.axis = [1, 0, 0]
     axis = joint.axis
     endpointRotation = joint.rotation
     endpointPosition = joint.position
+    rotationSlot = None
     if joint.rotation[3] != 0.0 and axis:
         axis = rotateVector(axis, joint.rotation)
     if joint.type == 'revolute' or joint.type == 'continuous':
-        robotFile.write(level * indent + ('DEF ' + joint.name + ' ' if jointToDef else '') + 'HingeJoint {\n')
-        robotFile.write((level + 1) * indent + 'jointParameters HingeJointParameters {\n')
+        robotFile.write(indents[level] + ('DEF ' + joint.name + ' ' if context.jointToDef else '') + 'HingeJoint {\n')
+        robotFile.write(indents[level + 1] + 'jointParameters HingeJointParameters {\n')
         position = None
         if joint.limit.lower > 0.0:
             # if 0 is not in the range, set the position to be the middle of the range
@@ -508,32 +577,35 @@ def URDFJoint(robotFile, joint, level, parentList, childList, linkList, jointLis
             position = joint.limit.upper
             if joint.limit.upper >= joint.limit.lower:
                 position = (joint.limit.upper - joint.limit.lower) / 2.0 + joint.limit.lower
-        if initPos is not None:
-            if len(initPos) > 0:
-                position = initPos[0]
-                del initPos[0]
-        if position is not None:
-            if position != 0.0:
-                robotFile.write((level + 2) * indent + 'position %lf\n' % position)
-            mat1 = matrixFromRotation(endpointRotation)
-            mat2 = matrixFromRotation([axis[0], axis[1], axis[2], position])
-            mat3 = multiplyMatrix(mat2, mat1)
-            endpointRotation = rotationFromMatrix(mat3)
+        if context.initPos is not None:
+            if len(context.initPos) > 0:
+                position = context.initPos[0]
+                del context.initPos[0]
+        if context.templateSlots is not None:
+            # the initial position of the joint is set by each instance of the template
+            writeSlot(context, robotFile, {'type': 'position', 'joint': context.templateJoints, 'default': position,
+                                           'indentation': indents[level + 2]})
+            rotationSlot = {'type': 'endpointRotation', 'joint': context.templateJoints, 'default': position,
+                            'axis': axis, 'rotation': endpointRotation, 'indentation': indents[level + 2]}
+            context.templateJoints += 1
+        else:
+            robotFile.write(getHingePositionLine(indents[level + 2], position))
+            endpointRotation = getEndpointRotation(axis, endpointRotation, position)
         if axis != [1.0, 0.0, 0.0]:
-            robotFile.write((level + 2) * indent + 'axis %lf %lf %lf\n' % (axis[0], axis[1], axis[2]))
+            robotFile.write(indents[level + 2] + 'axis %lf %lf %lf\n' % (axis[0], axis[1], axis[2]))
         if joint.position != [0.0, 0.0, 0.0]:
-            robotFile.write((level + 2) * indent + 'anchor %lf %lf %lf\n' %
+            robotFile.write(indents[level + 2] + 'anchor %lf %lf %lf\n' %
                             (joint.position[0], joint.position[1], joint.position[2]))
         if joint.dynamics.damping != 0.0:
-            robotFile.write((level + 2) * indent + 'dampingConstant ' + str(joint.dynamics.damping) + '\n')
+            robotFile.write(indents[level + 2] + 'dampingConstant ' + str(joint.dynamics.damping) + '\n')
         if joint.dynamics.friction != 0.0:
-            robotFile.write((level + 2) * indent + 'staticFriction ' + str(joint.dynamics.friction) + '\n')
-        robotFile.write((level + 1) * indent + '}\n')
-        robotFile.write((level + 1) * indent + 'device [\n')
-        robotFile.write((level + 2) * indent + 'RotationalMotor {\n')
+            robotFile.write(indents[level + 2] + 'staticFriction ' + str(joint.dynamics.friction) + '\n')
+        robotFile.write(indents[level + 1] + '}\n')
+        robotFile.write(indents[level + 1] + 'device [\n')
+        robotFile.write(indents[level + 2] + 'RotationalMotor {\n')
     elif joint.type == 'prismatic':
-        robotFile.write(level * indent + ('DEF ' + joint.name + ' ' if jointToDef else '') + 'SliderJoint {\n')
-        robotFile.write((level + 1) * indent + 'jointParameters JointParameters {\n')
+        robotFile.write(indents[level] + ('DEF ' + joint.name + ' ' if context.jointToDef else '') + 'SliderJoint {\n')
+        robotFile.write(indents[level + 1] + 'jointParameters JointParameters {\n')
         position = None
         if joint.limit.lower > 0.0:
             # if 0 is not in the range, set the position to be the middle of the range
@@ -541,64 +613,58 @@ def URDFJoint(robotFile, joint, level, parentList, childList, linkList, jointLis
             if joint.limit.upper >= joint.limit.lower:
                 position = (joint.limit.upper - joint.limit.lower) / 2.0 + joint.limit.lower
             if position != 0.0:
-                robotFile.write((level + 2) * indent + 'position %lf\n' % position)
+                robotFile.write(indents[level + 2] + 'position %lf\n' % position)
             length = math.sqrt(axis[0] * axis[0] + axis[1] * axis[1] + axis[2] * axis[2])
             if length > 0:
                 endpointPosition[0] += axis[0] / length * position
                 endpointPosition[0] += axis[1] / length * position
                 endpointPosition[0] += axis[2] / length * position
         if axis != [1.0, 0.0, 0.0]:
-            robotFile.write((level + 2) * indent + 'axis %lf %lf %lf\n' % (axis[0], axis[1], axis[2]))
+            robotFile.write(indents[level + 2] + 'axis %lf %lf %lf\n' % (axis[0], axis[1], axis[2]))
         if joint.dynamics.damping != 0.0:
-            robotFile.write((level + 2) * indent + 'dampingConstant ' + str(joint.dynamics.damping) + '\n')
+            robotFile.write(indents[level + 2] + 'dampingConstant ' + str(joint.dynamics.damping) + '\n')
         if joint.dynamics.friction != 0.0:
-            robotFile.write((level + 2) * indent + 'staticFriction ' + str(joint.dynamics.friction) + '\n')
-        robotFile.write((level + 1) * indent + '}\n')
-        robotFile.write((level + 1) * indent + 'device [\n')
-        robotFile.write((level + 2) * indent + 'LinearMotor {\n')
+            robotFile.write(indents[level + 2] + 'staticFriction ' + str(joint.dynamics.friction) + '\n')
+        robotFile.write(indents[level + 1] + '}\n')
+        robotFile.write(indents[level + 1] + 'device [\n')
+        robotFile.write(indents[level + 2] + 'LinearMotor {\n')
     elif joint.type == 'fixed':
-        for childLink in linkList:
-            if childLink.name == joint.child:
-                URDFLink(robotFile, childLink, level, parentList, childList,
-                         linkList, jointList, sensorList, joint.position, joint.rotation,
-                         boxCollision, normal)
+        childLink = tree.getLink(joint.child)
+        if childLink is not None:
+            yield linkWriter(context, robotFile, childLink, level, tree, joint.position, joint.rotation, boxCollision,
+                             normal)
         return
 
     elif joint.type == 'floating' or joint.type == 'planar':
         print(joint.type + ' is not a supported joint type in Webots')
         return
 
-    robotFile.write((level + 3) * indent + 'name "' + joint.name + '"\n')
+    robotFile.write(indents[level + 3] + 'name "' + joint.name + '"\n')
     if joint.limit.velocity != 0.0:
-        robotFile.write((level + 3) * indent + 'maxVelocity ' + str(joint.limit.velocity) + '\n')
+        robotFile.write(indents[level + 3] + 'maxVelocity ' + str(joint.limit.velocity) + '\n')
     if joint.limit.lower != 0.0:
-        robotFile.write((level + 3) * indent + 'minPosition ' + str(joint.limit.lower) + '\n')
+        robotFile.write(indents[level + 3] + 'minPosition ' + str(joint.limit.lower) + '\n')
     if joint.limit.upper != 0.0:
-        robotFile.write((level + 3) * indent + 'maxPosition ' + str(joint.limit.upper) + '\n')
+        robotFile.write(indents[level + 3] + 'maxPosition ' + str(joint.limit.upper) + '\n')
     if joint.limit.effort != 0.0:
         if joint.type == 'prismatic':
-            robotFile.write((level + 3) * indent + 'maxForce ' + str(joint.limit.effort) + '\n')
+            robotFile.write(indents[level + 3] + 'maxForce ' + str(joint.limit.effort) + '\n')
         else:
-            robotFile.write((level + 3) * indent + 'maxTorque ' + str(joint.limit.effort) + '\n')
-    robotFile.write((level + 2) * indent + '}\n')
-    robotFile.write((level + 2) * indent + 'PositionSensor {\n')
-    robotFile.write((level + 3) * indent + 'name "' + joint.name + '_sensor"\n')
-    robotFile.write((level + 2) * indent + '}\n')
-    robotFile.write((level + 1) * indent + ']\n')
-
-    robotFile.write((level + 1) * indent + 'endPoint')
-    found_link = False
-    for childLink in linkList:
-        if childLink.name == joint.child:
-            URDFLink(robotFile, childLink, level + 1, parentList, childList,
-                     linkList, jointList, sensorList, endpointPosition, endpointRotation,
-                     boxCollision, normal, endpoint=True)
-            assert not found_link
-            found_link = True
+            robotFile.write(indents[level + 3] + 'maxTorque ' + str(joint.limit.effort) + '\n')
+    robotFile.write(indents[level + 2] + '}\n')
+    robotFile.write(indents[level + 2] + 'PositionSensor {\n')
+    robotFile.write(indents[level + 3] + 'name "' + joint.name + '_sensor"\n')
+    robotFile.write(indents[level + 2] + '}\n')
+    robotFile.write(indents[level + 1] + ']\n')
+
+    robotFile.write(indents[level + 1] + 'endPoint')
+    childLink = tree.getLink(joint.child)
+    if childLink is not None:
+        yield linkWriter(context, robotFile, childLink, level + 1, tree, endpointPosition, endpointRotation,
+                         boxCollision, normal, endpoint=True, rotationSlot=rotationSlot)
     # case that non-existing link cited, set dummy flag
-    if not found_link and joint.child:
-        URDFLink(robotFile, joint.child, level + 1, parentList, childList,
-                 linkList, jointList, sensorList, endpointPosition, endpointRotation,
-                 boxCollision, normal, dummy=True)
+    elif joint.child:
+        yield linkWriter(context, robotFile, joint.child, level + 1, tree, endpointPosition, endpointRotation,
+                         boxCollision, normal, dummy=True, rotationSlot=rotationSlot)
         print('warning: link ' + joint.child + ' is dummy!')
-    robotFile.write(level * indent + '}\n')
+    robotFile.write(indents[level] + '}\n')